@@ -0,0 +1,97 @@
+from typing import Any, Dict, Iterator, List, Optional
+
+
+DUPLICATE_SEPARATOR = "_____"
+
+
+class BomNode:
+    """
+    One row of a parts list.
+
+    :param key: Unique key of the row in the parsed dict, e.g. "P001_____1".
+    :param part_number: Part number of the row, without the duplicate suffix.
+    :param occurrence: 0 for the first row of a part number, 1 for the second, ...
+    :param data: The parsed row, as returned by `create_dict_from_excel_new`.
+    """
+
+    __slots__ = ("key", "part_number", "occurrence", "data", "parent", "children")
+
+    def __init__(self, key: str, part_number: str, occurrence: int, data: Dict[str, Any]):
+        self.key = key
+        self.part_number = part_number
+        self.occurrence = occurrence
+        self.data = data
+        self.parent: Optional["BomNode"] = None
+        self.children: List["BomNode"] = []
+
+    @property
+    def assy_for(self) -> str:
+        return self.data.get("assy_for") or ""
+
+    def __repr__(self):
+        return f"BomNode({self.key!r}, parent={self.parent.key if self.parent else None!r})"
+
+
+class BomTree:
+    """
+    The assembly structure of a parts list, built once from the parsed sheet.
+
+    Nodes keep sheet order. Each node knows its part number without the `_____N`
+    duplicate suffix and its parent assembly, so later stages need no string parsing.
+
+    :param parts: The dict returned by `create_dict_from_excel_new`.
+    """
+
+    __slots__ = ("nodes", "_by_part_number")
+
+    def __init__(self, parts: Dict[str, Dict[str, Any]]):
+        self.nodes: List[BomNode] = []
+        self._by_part_number: Dict[str, List[BomNode]] = {}
+
+        pending: List[BomNode] = []
+        for idx, (key, data) in enumerate(parts.items(), start=1):
+            # same fallback name the parser gives rows without a part number.
+            part_number = data.get("part_number") or f"Tool-{idx}"
+            occurrences = self._by_part_number.setdefault(part_number, [])
+            node = BomNode(key, part_number, len(occurrences), data)
+
+            # the parent is the closest row above with that part number ...
+            above = self._by_part_number.get(node.assy_for)
+            if above:
+                self._link(node, above[-1])
+            elif node.assy_for:
+                pending.append(node)
+
+            occurrences.append(node)
+            self.nodes.append(node)
+
+        # ... or, for assemblies listed below their parts, the first one below.
+        for node in pending:
+            parent = self.first(node.assy_for)
+            if parent is not None:
+                self._link(node, parent)
+
+    @staticmethod
+    def _link(node: BomNode, parent: BomNode) -> None:
+        node.parent = parent
+        parent.children.append(node)
+
+    def __iter__(self) -> Iterator[BomNode]:
+        return iter(self.nodes)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def roots(self) -> List[BomNode]:
+        """Rows without an 'assy_for' value, i.e. the RFQ line items."""
+        return [node for node in self.nodes if not node.assy_for]
+
+    def occurrences(self, part_number: str) -> int:
+        """Number of rows with this part number."""
+        return len(self._by_part_number.get(part_number, ()))
+
+    def first(self, part_number: str) -> Optional[BomNode]:
+        """The first row with this part number, or None."""
+        nodes = self._by_part_number.get(part_number)
+        return nodes[0] if nodes else None
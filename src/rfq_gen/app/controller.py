@@ -1,144 +1,354 @@
-import re
 import os
-from typing import Dict, Any
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, TypeVar
 from base_logger import getlogger
-from mie_trak_api import request_for_quote, quote, item, router
-from app.gui.utils import transfer_file_to_folder
+from app.bom_tree import BomNode, BomTree
+from mie_trak_api import request_for_quote, quote, item, router, utils
+from mie_trak_api.utils import unit_of_work
+from app.gui.utils import destination_of, transfer_files
 
 
 LOGGER = getlogger("Controller")
 
+# Per-part pipelines run at once by `generate_rfq`. With 1 (the default) the whole RFQ
+# is a single transaction. More is an opt-in that trades that for speed: parts commit
+# on their own, and a failed RFQ only takes their quotes back (see `run_pipelines`).
+# Never more than the connection pool has slots (`DB_POOL_SIZE`).
+PART_WORKERS = max(1, int(os.getenv("RFQ_GEN_WORKERS", "1")))
+
+T = TypeVar("T")
+
 
 def create_rfq(
-    quote_pk_dict,
-    item_pk_dict,
+    quote_pk_by_node: Dict[str, int],
+    item_pk_by_node: Dict[str, int],
     rfq_pk,
-    info_dict: Dict[str, Dict[str, Any]],
-    parent_quote_fk=None,
+    bom_tree: BomTree,
     i=1,
 ):
     """
     Creates RFQ line items and quote assemblies based on the provided parts and associated data.
-    This function analyzes the given parts dictionary (info_dict) to create line items for RFQ,
-    handle assemblies, and link sub-assemblies or child parts appropriately.
+    Every root of the BOM tree becomes a line item, and every part below it is added
+    to the BOM of its line item's quote, under the quote assembly of its parent node.
 
-    :param quote_pk_dict: Dictionary mapping part numbers to their corresponding Quote PKs.
-    :type quote_pk_dict: dict
-    :param item_pk_dict: Dictionary mapping part numbers to their corresponding Item PKs.
-    :type item_pk_dict: dict
+    Quotes and items are looked up by node key, so rows that repeat a part number keep
+    their own quote.
+
+    :param quote_pk_by_node: QuotePK of every part, by node key.
+    :type quote_pk_by_node: dict
+    :param item_pk_by_node: ItemPK of every part, by node key.
+    :type item_pk_by_node: dict
     :param rfq_pk: The primary key of the RFQ where line items are being added.
     :type rfq_pk: int
-    :param info_dict: Dictionary containing part numbers as keys and associated data as values.
-    :type info_dict: Dict[str, Dict[str, Any]]
-    :param parent_quote_fk: Optional parent Quote FK for nested assemblies.
-    :type parent_quote_fk: int, optional
+    :param bom_tree: The parts list, in sheet order.
+    :type bom_tree: BomTree
     :param i: Starting index for RFQ line items, defaults to 1.
     :type i: int, optional
-    :raises ValueError: If necessary main part or quote data is missing for assembly creation.
-    :raises KeyError: If required parent assembly information is not found when expected.
+    :raises ValueError: If a part is an assembly for a row that does not lead up to a line item.
     """
+    LOGGER.info("Starting RFQ line item and assembly creation.")
 
-    main_part_number = None
-    main_quote_pk = None
+    for node in bom_tree:
+        if node.assy_for and _line_item_of(node) is None:
+            raise ValueError("Data from excel sheet is not proper bruh.")
 
-    LOGGER.info("Starting RFQ line item and assembly creation.")
+    for root in bom_tree.roots:
+        LOGGER.info(f"Creating RFQ line item for part: {root.part_number}")
+        quote_pk = quote_pk_by_node.get(root.key)
+        request_for_quote.create_rfq_line_item_with_qty(
+            item_pk_by_node.get(root.key),
+            rfq_pk,
+            i,
+            quote_pk,
+            quantity=root.data.get("quantity_required"),
+        )
+        i += 1
+        LOGGER.info(
+            f"Line item created for part {root.part_number}, linked to QuotePK {quote_pk}"
+        )
 
-    parent_quote_assembly_pk_dict = {}
-    for new_key, value in info_dict.items():
-        if re.search(r"_____\d+$", new_key) is None:
-            key = new_key
-        else:
-            key = new_key.split("_____")[0]
-
-        part_number = key
-        assy_for = value.get("assy_for", None)
-        quote_pk = quote_pk_dict.get(part_number)
-        item_pk = item_pk_dict.get(part_number)
-
-        if not assy_for:
-            LOGGER.info(f"Creating RFQ line item for part: {part_number}")
-            request_for_quote.create_rfq_line_item_with_qty(
-                item_pk,
-                rfq_pk,
-                i,
-                quote_pk,
-                quantity=value.get("quantity_required"),
+        _create_assembly_quotes(root, quote_pk, None, quote_pk_by_node)
+
+
+def _line_item_of(node: BomNode) -> Optional[BomNode]:
+    """The root a node hangs from, or None if its parents never reach one (a cycle)."""
+    seen = set()
+    while node.parent is not None:
+        if node.key in seen:
+            return None
+        seen.add(node.key)
+        node = node.parent
+
+    return None if node.assy_for else node
+
+
+def _create_assembly_quotes(
+    parent: BomNode,
+    main_quote_pk: int,
+    parent_quote_assembly_pk: Optional[int],
+    quote_pk_by_node: Dict[str, int],
+) -> None:
+    """
+    Adds the parts below `parent` to the BOM of their line item's quote, depth first.
+
+    :param parent_quote_assembly_pk: The QuoteAssembly row of `parent`, or None if
+        `parent` is the line item itself.
+    """
+    for node in parent.children:
+        if node.data.get("hardware_or_supplies"):
+            continue  # hardware and tooling are BOM lines, added by `add_supply_to_bom`.
+
+        if parent_quote_assembly_pk is None:
+            LOGGER.info(
+                f"Handling assembly for part: {node.part_number}, assembly for: {parent.part_number}"
+            )
+            quote_assembly_pk = quote.create_assy_quote(
+                quote_pk_by_node[node.key],
+                main_quote_pk,
+                node.data.get("quantity_required", ""),
             )
-            i += 1
-            main_quote_pk = quote_pk
-            main_part_number = part_number
             LOGGER.info(
-                f"Line item created for part {part_number}, linked to QuotePK {quote_pk}"
+                f"Assembly quote created for part {node.part_number}, linked to main QuotePK {main_quote_pk}"
+            )
+        else:
+            quote_assembly_pk = quote.create_assy_quote(
+                quote_pk_by_node[node.key],
+                main_quote_pk,
+                node.data.get("quantity_required", 1),
+                parent_quote_fk=quote_pk_by_node[parent.key],
+                parent_quote_asembly=parent_quote_assembly_pk,
             )
-
-        elif assy_for and not value.get("hardware_or_supplies"):
             LOGGER.info(
-                f"Handling assembly for part: {part_number}, assembly for: {assy_for}"
+                f"Sub-assembly quote created for part {node.part_number}, parent assembly: {parent.part_number}"
             )
-            if not main_part_number or not main_quote_pk:
-                raise ValueError("Data from excel sheet is not proper bruh.")
-
-            if assy_for == main_part_number:
-                quote_fk = main_quote_pk
-                parent_quote_assembly_pk = quote.create_assy_quote(
-                    quote_pk, quote_fk, value.get("quantity_required", "")
-                )
-                parent_quote_assembly_pk_dict[part_number] = parent_quote_assembly_pk
-                LOGGER.info(
-                    f"Assembly quote created for part {part_number}, linked to main QuotePK {quote_fk}"
-                )
-
-            else:
-                parent_quote_fk = quote_pk_dict[assy_for]
-                if assy_for not in parent_quote_assembly_pk_dict:
-                    raise KeyError(
-                        f"Key '{assy_for}' not found in parent_quote_assembly_pk_dict"
-                    )
-                parent_quote_assembly_pk_new = parent_quote_assembly_pk_dict[assy_for]
-                parent_quote_assembly_pk = quote.create_assy_quote(
-                    quote_pk,
-                    main_quote_pk,
-                    value.get("quantity_required", 1),
-                    parent_quote_fk=parent_quote_fk,
-                    parent_quote_asembly=parent_quote_assembly_pk_new,
-                )
-                parent_quote_assembly_pk_dict[part_number] = parent_quote_assembly_pk
-                LOGGER.info(
-                    f"Sub-assembly quote created for part {part_number}, parent assembly: {assy_for}"
-                )
+
+        _create_assembly_quotes(node, main_quote_pk, quote_assembly_pk, quote_pk_by_node)
+
+
+def run_pipelines(tasks: List[Callable[[], T]], workers: int = PART_WORKERS) -> List[T]:
+    """
+    Runs independent per-part pipelines on a bounded thread pool and returns their
+    results in the order of `tasks`.
+
+    Each task runs in its own `unit_of_work`, on a pooled connection of its worker
+    thread. With a single worker the tasks run in order on the calling thread, so
+    inside an enclosing `unit_of_work` they share its transaction.
+
+    With more workers every part commits on its own: anything the tasks read (e.g.
+    shared items) must be committed before, and a failure part-way leaves the parts
+    already done in place; the caller can take their quotes back with
+    `discard_quotes`. On the first failure the tasks not yet started are cancelled,
+    the running ones finish, and the error is raised.
+
+    :param tasks: Callables without arguments, one per part.
+    :param workers: Most tasks run at once; capped by `part_workers`.
+    :return: The result of every task, in order.
+    """
+    workers = part_workers(workers)
+
+    def run(task: Callable[[], T]) -> T:
+        with unit_of_work():
+            return task()
+
+    if workers <= 1 or len(tasks) <= 1:
+        return [run(task) for task in tasks]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rfq-part") as pool:
+        futures = [pool.submit(run, task) for task in tasks]
+        _, pending = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in pending:
+            future.cancel()
+
+        return [future.result() for future in futures]
+
+
+def part_workers(workers: Optional[int] = None) -> int:
+    """
+    `workers` (by default `PART_WORKERS`), capped by the slots of the connection pool:
+    every worker holds a connection while its part runs, so more would only wait for
+    a slot and time out.
+    """
+    workers = PART_WORKERS if workers is None else workers
+    size = utils.POOL.size
+    if workers > size:
+        LOGGER.warning(f"{workers} workers is above DB_POOL_SIZE={size}; using {size}.")
+    return min(workers, size)
+
+
+def discard_quotes(quote_pks: List[int]) -> None:
+    """
+    Deletes the quotes that part pipelines committed on their own when the RFQ they
+    belong to fails afterwards. Nothing else references them yet, since the RFQ's
+    lines and BOMs are written in its last transaction.
+
+    The part items are kept: once committed, other sessions may already use them.
+
+    :param quote_pks: QuotePKs of the committed parts.
+    :raises RuntimeError: If the quotes could not be deleted, naming them.
+    """
+    if not quote_pks:
+        return
+
+    LOGGER.warning(f"Discarding {len(quote_pks)} quotes of a failed RFQ.")
+    try:
+        with unit_of_work():
+            quote.delete_quotes(quote_pks)
+    except Exception as err:
+        LOGGER.error(f"Could not discard quotes {quote_pks} of a failed RFQ: {err}")
+        raise RuntimeError(
+            f"The RFQ failed and the quotes of its finished parts could not be removed; "
+            f"delete QuotePKs {quote_pks} in MIE Trak.\n{err}"
+        ) from err
+
+
+def finish_code_item(code: str) -> Dict[str, Any]:
+    """Item attributes of one finish code (one line of a part's finish column)."""
+    return {
+        "PartNumber": code[:100],
+        "Description": code[
+            :490
+        ],  # TODO: Fix this as its crossing the limit, add this to the comments.
+        "Inventoriable": 0,
+        "ItemTypeFK": 5,
+        "CertificationsRequiredBySupplier": 1,
+        "CanNotCreateWorkOrder": 1,
+        "CanNotInvoice": 1,
+        "PurchaseGeneralLedgerAccountFK": 125,
+        "SalesCogsAccountFK": 125,
+        "CalculationTypeFK": 17,
+        "Comment": code,
+    }
+
+
+def tooling_item(part_number: str, description: Optional[str]) -> Dict[str, Any]:
+    """Item attributes of a "Tooling" row, added to the BOM of its assembly."""
+    return {
+        "PartNumber": part_number,
+        "Description": description,
+        "ItemTypeFK": 7,
+        "MpsItem": 0,
+        "Purchase": 0,
+        "ForecastOnMRP": 0,
+        "MpsOnMRP": 0,
+        "ServiceItem": 0,
+        "ShipLoose": 0,
+        "BulkShip": 0,
+        "CanNotCreateWorkOrder": 1,
+        "CanNotInvoice": 1,
+        "ManufacturedItem": 1,
+    }
+
+
+def create_tooling_items(bom_tree: BomTree) -> None:
+    """
+    Gets or creates the "05-N" tooling item of every hardware row, each in its own
+    short transaction.
+
+    Call it before the RFQ's transaction opens, inside the `item.memoized_items`
+    block: the tooling number lock and the guarded insert are held until
+    commit, so allocating inside the RFQ would block every other session creating
+    tooling until the whole RFQ commits. Later calls are answered by the memo.
+    Tooling items created here are kept if the RFQ then fails; a retry finds them
+    by description.
+
+    :param bom_tree: The parts list.
+    """
+    for node in bom_tree:
+        description = node.data.get("description")
+        if node.data.get("hardware_or_supplies") == "Hardware" and description is not None:
+            item.check_and_create_tooling(description)
+
+
+def resolve_shared_items(bom_tree: BomTree) -> Dict[str, int]:
+    """
+    Gets or creates the finish code and tooling items of every part up front.
+
+    Meant for the active `item.memoized_items` block: the per-part pipelines then
+    find these items in the memo, instead of parallel pipelines racing to create the
+    same item twice. Hardware is left to `create_tooling_items`.
+
+    :param bom_tree: The parts list.
+    :return: ItemPK of every non-blank finish code, to hand to `create_finish_routers`.
+    """
+    shared_items = []
+    finish_codes = []
+    for node in bom_tree:
+        kind = node.data.get("hardware_or_supplies")
+        description = node.data.get("description")
+
+        if not kind or kind == "Tooling - Manufactured":
+            codes = (node.data.get("finish_code") or "").split("\n")
+            finish_codes.extend(code for code in codes if code)
+        elif kind == "Tooling" and description is not None:
+            shared_items.append(tooling_item(node.part_number, description))
+
+    finish_codes = list(dict.fromkeys(finish_codes))
+    shared_items.extend(finish_code_item(code) for code in finish_codes)
+    if not shared_items:
+        return {}
+
+    with item.memoized_items():
+        item.resolve_items(shared_items)
+        # memo hits: the same item `get_or_create_item` would return for each code.
+        return {
+            code: item.get_or_create_item(**finish_code_item(code)) for code in finish_codes
+        }
 
 
 def create_finish_router(finish_description: str, item_fin_pk: int, part_num: str):
     "Adds a router for every finish"
-    finish_code = finish_description.split("\n")
-    finish_pks = []
-
-    if finish_code:
-        for code in finish_code:
-            finish_codes_pk = item.get_or_create_item(
-                **{
-                    "PartNumber": code[:100],
-                    "Description": code[
-                        :490
-                    ],  # TODO: Fix this as its crossing the limit, add this to the comments.
-                    "Inventoriable": 0,
-                    "ItemTypeFK": 5,
-                    "CertificationsRequiredBySupplier": 1,
-                    "CanNotCreateWorkOrder": 1,
-                    "CanNotInvoice": 1,
-                    "PurchaseGeneralLedgerAccountFK": 125,
-                    "SalesCogsAccountFK": 125,
-                    "CalculationTypeFK": 17,
-                    "Comment": code,
-                }
-            )
-            finish_pks.append(finish_codes_pk)
+    create_finish_routers([(finish_description, item_fin_pk, part_num)])
+
+
+def create_finish_routers(
+    finishes: List[Tuple[str, int, str]], finish_pks: Optional[Dict[str, int]] = None
+) -> None:
+    """
+    Adds the finish routers of many parts with a fixed number of round trips.
+
+    Finish codes missing from `finish_pks` are resolved in bulk, then all routers and
+    all their work centers are inserted with batched statements. Each line of a
+    finish description becomes a work center, in order, blank lines included.
 
-    router_pk = router.create_router(item_fin_pk, part_num)
-    LOGGER.debug(f"Created Router PK: {router_pk}")
+    :param finishes: (finish description, OP finish ItemPK, router PartNumber) per part.
+    :param finish_pks: Finish code -> ItemPK already resolved, e.g. by `resolve_shared_items`.
+    """
+    if not finishes:
+        return
+
+    codes_per_router = [
+        (finish_description or "").split("\n") for finish_description, _, _ in finishes
+    ]
+    finish_pks = dict(finish_pks or {})
+
+    missing = list(
+        dict.fromkeys(
+            code for codes in codes_per_router for code in codes if code not in finish_pks
+        )
+    )
+    if missing:
+        with item.memoized_items():
+            # resolve_items needs a PartNumber; a blank line's item is looked up on its own.
+            named = [code for code in missing if code]
+            if named:
+                item.resolve_items([finish_code_item(code) for code in named])
 
-    for idx, pk in enumerate(finish_pks, start=1):
-        router.create_router_work_center(pk, router_pk, idx)
+            # memo hits for the named codes: the item `get_or_create_item` would return.
+            for code in missing:
+                finish_pks[code] = item.get_or_create_item(**finish_code_item(code))
+
+    router_pks = router.create_routers(
+        [(item_fin_pk, part_num) for _, item_fin_pk, part_num in finishes]
+    )
+    LOGGER.debug(f"Created Router PKs: {router_pks}")
+
+    router.create_router_work_centers(
+        [
+            (finish_pks[code], router_pk, idx)
+            for router_pk, codes in zip(router_pks, codes_per_router)
+            for idx, code in enumerate(codes, start=1)
+        ]
+    )
 
 
 def transfer_and_categorize_files(file_list, destination_path):
@@ -152,30 +362,92 @@ def transfer_and_categorize_files(file_list, destination_path):
     :return: Dictionary mapping transferred file paths to their document group PKs (or None if uncategorized).
     :rtype: dict
     """
-    result_dict = {}
+    return copy_documents({destination_path: (file_list, destination_path)})[
+        destination_path
+    ]
 
-    for file in file_list:
-        # Copy file to destination folder (folder is created if not exists)
-        file_path_to_add_to_rfq = transfer_file_to_folder(destination_path, file)
-        path = file_path_to_add_to_rfq.lower()
-
-        # Categorize based on file name pattern
-        if (
-            "_pl_" in path
-            or "spdl" in path
-            or "psdl" in path
-            or "pl" in os.path.basename(path)
-        ):
-            result_dict[file_path_to_add_to_rfq] = 26
-        elif "dwg" in path or "drw" in path:
-            result_dict[file_path_to_add_to_rfq] = 27
-        elif "step" in path or "stp" in path:
-            result_dict[file_path_to_add_to_rfq] = 30
-        elif "zsp" in path or "speco" in path:
-            result_dict[file_path_to_add_to_rfq] = 33
-        elif ".cat" in path:
-            result_dict[file_path_to_add_to_rfq] = 16
-        else:
-            result_dict[file_path_to_add_to_rfq] = None  # Unmatched pattern
+
+def plan_copies(
+    targets: Dict[Hashable, Tuple[List[str], str]],
+) -> List[Tuple[str, str]]:
+    """
+    Lists the (source file, destination folder) copies needed by `targets`, one per
+    destination path.
+
+    Parts that share a part number share a folder, and a file picked twice is still
+    one copy. Two different files with the same name going to one folder land on the
+    same path: the last one listed is copied, as it was when every file was copied
+    in turn. Destinations keep their first-seen order.
+
+    :param targets: For each target (e.g. a part), its files and destination folder.
+    :return: The (source, folder) pairs to copy.
+    """
+    copies: Dict[str, Tuple[str, str]] = {}
+    for file_list, folder in targets.values():
+        for file in file_list:
+            copies[_destination_key(file, folder)] = (file, folder)
+
+    return list(copies.values())
+
+
+def copy_documents(
+    targets: Dict[Hashable, Tuple[List[str], str]],
+) -> Dict[Hashable, Dict[str, Optional[int]]]:
+    """
+    Copies the files of every target to its folder, each distinct copy exactly once.
+
+    :param targets: For each target (e.g. a part), its files and destination folder.
+    :return: For each target, its copied file paths mapped to their document group PKs
+        (or None if uncategorized), ready for upload.
+    """
+    copies = plan_copies(targets)
+    LOGGER.info(f"Copying {len(copies)} documents for {len(targets)} targets.")
+
+    # Copy files to their destination folders (folders are created if not exists)
+    copied = {
+        _destination_key(file, folder): destination
+        for (file, folder), destination in zip(copies, transfer_files(copies))
+    }
+
+    result_dict = {}
+    for target, (file_list, folder) in targets.items():
+        result_dict[target] = {}
+        for file in file_list:
+            file_path_to_add_to_rfq = copied[_destination_key(file, folder)]
+            result_dict[target][file_path_to_add_to_rfq] = document_group_pk(
+                file_path_to_add_to_rfq
+            )
 
     return result_dict
+
+
+def _destination_key(file: str, folder: str) -> str:
+    return os.path.normcase(destination_of(file, folder))
+
+
+def document_group_pk(file_path: str) -> Optional[int]:
+    """
+    Categorizes a document based on file name patterns.
+
+    :param file_path: Path of the document.
+    :return: The PK of its document group, or None if uncategorized.
+    """
+    path = file_path.lower()
+
+    if (
+        "_pl_" in path
+        or "spdl" in path
+        or "psdl" in path
+        or "pl" in os.path.basename(path)
+    ):
+        return 26
+    elif "dwg" in path or "drw" in path:
+        return 27
+    elif "step" in path or "stp" in path:
+        return 30
+    elif "zsp" in path or "speco" in path:
+        return 33
+    elif ".cat" in path:
+        return 16
+    else:
+        return None  # Unmatched pattern
@@ -1,9 +1,18 @@
+import os
+import json
+import math
+import zlib
+import pickle
+import hashlib
+import functools
+import openpyxl
 import pandas as pd
-from typing import Optional, Dict, Any
-from pydantic import BaseModel, ValidationError
+from typing import Optional, Dict, Any, Iterator, List
+from pydantic import BaseModel, TypeAdapter, ValidationError
 from base_logger import getlogger
 from mie_trak_api import item
-import re
+from mie_trak_api.utils import cache_path
+from app.bom_tree import BomTree, DUPLICATE_SEPARATOR
 
 
 LOGGER = getlogger("Excel Parser")
@@ -30,6 +39,71 @@ class PartData(BaseModel):
     stock_thickness: float = 0.0
 
 
+REQUIRED_COLUMNS = {
+    "Part": "part_number",
+    "DESCRIPTION": "description",
+    "PartLength": "length",
+    "Thickness": "thickness",
+    "PartWidth": "width",
+    "Weight": "weight",
+    "Material": "material",
+    "FinishCode": "finish_code",
+    "HeatTreat": "heat_treat",
+    "DrawingNumber": "drawing_number",
+    "DrawingRevision": "drawing_revision",
+    "QuantityRequired": "quantity_required",
+    "PLRevision": "pl_revision",
+    "AssyFor": "assy_for",
+    "Hardware/Tooling": "hardware_or_supplies",
+    "StockLength": "stock_length",
+    "StockWidth": "stock_width",
+    "StockThickness": "stock_thickness",
+}
+
+NUMERIC_FIELDS = [
+    "length",
+    "thickness",
+    "width",
+    "weight",
+    "stock_length",
+    "stock_width",
+    "stock_thickness",
+]
+
+# Validates a whole sheet in one call instead of building models row by row.
+PART_LIST_ADAPTER = TypeAdapter(List[PartData])
+
+# Bump whenever a change to the parser changes its output, so cached results are dropped.
+PARSER_VERSION = 1
+PARSE_CACHE_DIR = "parsed_excel"
+PARSE_CACHE_SIZE = int(os.getenv("RFQ_GEN_PARSE_CACHE_SIZE", "32"))
+# Workbooks larger than this many bytes are read with `iter_parts_from_excel`.
+STREAM_ABOVE_BYTES = int(os.getenv("RFQ_GEN_STREAM_EXCEL_BYTES", str(5 * 1024 * 1024)))
+
+# Cell texts `pd.read_excel` reads as missing by default.
+EXCEL_NA_VALUES = {
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+}
+
+
 def sanitize_value(value, default=None):
     """Sanitizes NaN values and strips strings."""
     if pd.isna(value):  # More robust check than math.isnan
@@ -39,7 +113,9 @@ def sanitize_value(value, default=None):
     return value
 
 
-def create_dict_from_excel_new(filepath: str) -> Dict[str, Dict[str, Any]]:
+def create_dict_from_excel_new(
+    filepath: str, stream: bool = False
+) -> Dict[str, Dict[str, Any]]:
     """
     Reads an Excel file and converts it into a dictionary where each part number is a key,
     and its corresponding data is stored as a dictionary.
@@ -49,92 +125,288 @@ def create_dict_from_excel_new(filepath: str) -> Dict[str, Dict[str, Any]]:
     the `PartData` Pydantic model. If a part number is missing, a fallback name is generated.
     If a duplicate part number is found, a unique suffix is appended.
 
+    Cleaning and the blank-row cutoff work on whole columns, and the rows are validated
+    with a single call to `PART_LIST_ADAPTER`. With `stream=True` the rows are read
+    through `iter_parts_from_excel` instead and added to the result one at a time:
+    the workbook is never loaded whole, and the first invalid row stops the read.
+    The result itself still holds every part, since the BOM tree needs them all.
+
     :param filepath: Path to the Excel file to be processed.
+    :param stream: Read the sheet row by row instead of loading it whole.
     :return: A dictionary where keys are part numbers and values are dictionaries of part attributes.
     :raises ValueError: If required columns are missing in the Excel file.
     :raises ValueError: If data validation fails for one or more rows.
     """
 
+    if stream:
+        parts = (part.model_dump() for part in iter_parts_from_excel(filepath))
+    else:
+        parts = _read_parts_from_frame(filepath)
+
+    my_dict = {}
+    next_suffix: Dict[str, int] = {}  # so repeated part numbers don't rescan taken suffixes
+    for idx, part_data in enumerate(parts, start=1):
+        part_number = part_data["part_number"] or f"Tool-{idx}"  # Fallback naming
+
+        original_part_number = part_number
+        suffix = next_suffix.get(original_part_number, 1)
+        while part_number in my_dict:
+            part_number = f"{original_part_number}{DUPLICATE_SEPARATOR}{suffix}"
+            suffix += 1
+        next_suffix[original_part_number] = suffix
+
+        my_dict[part_number] = part_data
+
+    _check_assemblies(my_dict)
+
+    LOGGER.info("Excel File extracted successfully.")
+
+    return my_dict
+
+
+def create_dict_from_excel_cached(
+    filepath: str, stream: bool = False
+) -> Dict[str, Dict[str, Any]]:
+    """
+    `create_dict_from_excel_new` behind a cache keyed on the content of the workbook.
+
+    Parsing the same sheet again (a retry after a database error, a regeneration after
+    a reset) returns the stored result without decoding the workbook. Entries are
+    zlib-compressed pickles in the `parsed_excel` folder of the local cache directory;
+    beyond `RFQ_GEN_PARSE_CACHE_SIZE` entries the least recently used are removed.
+    The key also covers `PARSER_VERSION` and the `PartData` schema, so results of an
+    older parser are never returned. Sheets that fail to parse are not cached.
+
+    :param filepath: Path to the Excel file to be processed.
+    :param stream: Passed on to `create_dict_from_excel_new` on a cache miss.
+    :return: The same dictionary `create_dict_from_excel_new` returns.
+    """
+    key = _parse_cache_key(filepath)
+    cache_dir = cache_path(PARSE_CACHE_DIR)
+    path = os.path.join(cache_dir, f"{key}.bin")
+
+    try:
+        with open(path, "rb") as f:
+            parts = pickle.loads(zlib.decompress(f.read()))
+        os.utime(path)  # marks the entry as recently used
+        LOGGER.info(f"Excel File loaded from parse cache ({key}).")
+        return parts
+    except FileNotFoundError:
+        pass
+    except (OSError, zlib.error, pickle.UnpicklingError, EOFError) as e:
+        LOGGER.warning(f"Ignoring unreadable parse cache entry {path}: {e}")
+
+    parts = create_dict_from_excel_new(filepath, stream=stream)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(zlib.compress(pickle.dumps(parts, pickle.HIGHEST_PROTOCOL)))
+        os.replace(tmp_path, path)
+        _evict_parse_cache(cache_dir)
+    except OSError as e:
+        LOGGER.warning(f"Could not write parse cache: {e}")
+
+    return parts
+
+
+def create_bom_tree_from_excel(filepath: str, stream: Optional[bool] = None) -> BomTree:
+    """
+    Parses a parts list into its `BomTree`, the form the RFQ generation works on.
+
+    :param filepath: Path to the Excel file to be processed.
+    :param stream: Passed on to `create_dict_from_excel_cached`. None streams
+        workbooks larger than `STREAM_ABOVE_BYTES`.
+    :return: The parts of the sheet, in sheet order, linked to their parent assemblies.
+    """
+    if stream is None:
+        stream = os.path.getsize(filepath) > STREAM_ABOVE_BYTES
+        if stream:
+            LOGGER.info(f"Streaming large Excel file {filepath}.")
+
+    return BomTree(create_dict_from_excel_cached(filepath, stream=stream))
+
+
+@functools.cache
+def _parse_cache_salt() -> bytes:
+    """Changes whenever the parser or the `PartData` fields change."""
+    schema = json.dumps(PartData.model_json_schema(), sort_keys=True)
+    return f"{PARSER_VERSION}:{pickle.HIGHEST_PROTOCOL}:{schema}".encode("utf-8")
+
+
+def _parse_cache_key(filepath: str) -> str:
+    digest = hashlib.blake2b(_parse_cache_salt(), digest_size=20)
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def _evict_parse_cache(cache_dir: str) -> None:
+    entries = [entry for entry in os.scandir(cache_dir) if entry.name.endswith(".bin")]
+    if len(entries) <= PARSE_CACHE_SIZE:
+        return
+
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    for entry in entries[: len(entries) - PARSE_CACHE_SIZE]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def _read_parts_from_frame(filepath: str) -> List[Dict[str, Any]]:
     df = pd.read_excel(filepath, dtype=str).fillna("")
 
-    required_columns = {
-        "Part": "part_number",
-        "DESCRIPTION": "description",
-        "PartLength": "length",
-        "Thickness": "thickness",
-        "PartWidth": "width",
-        "Weight": "weight",
-        "Material": "material",
-        "FinishCode": "finish_code",
-        "HeatTreat": "heat_treat",
-        "DrawingNumber": "drawing_number",
-        "DrawingRevision": "drawing_revision",
-        "QuantityRequired": "quantity_required",
-        "PLRevision": "pl_revision",
-        "AssyFor": "assy_for",
-        "Hardware/Tooling": "hardware_or_supplies",
-        "StockLength": "stock_length",
-        "StockWidth": "stock_width",
-        "StockThickness": "stock_thickness",
-    }
-
-    missing_columns = [col for col in required_columns if col not in df.columns]
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
     if missing_columns:
         raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
 
-    df = df.rename(columns=required_columns)
-
-    df = df.map(sanitize_value)
-
-    numeric_fields = [
-        "length",
-        "thickness",
-        "width",
-        "weight",
-        "stock_length",
-        "stock_width",
-        "stock_thickness",
-    ]
-    df[numeric_fields] = (
-        df[numeric_fields].apply(pd.to_numeric, errors="coerce").fillna(0.0)
+    df = df.rename(columns=REQUIRED_COLUMNS)
+    df = _clean_frame(df)
+    df = _cut_at_first_blank_row(df)
+
+    records = df[list(REQUIRED_COLUMNS.values())].to_dict("records")
+    return _validate_parts(records)
+
+
+def _clean_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Strips every text column and converts the numeric columns, a column at a time."""
+    df = df.apply(lambda column: column.str.strip() if column.dtype == object else column)
+
+    df[NUMERIC_FIELDS] = (
+        df[NUMERIC_FIELDS].apply(pd.to_numeric, errors="coerce").fillna(0.0)
     )
 
     df["quantity_required"] = (
-        df["quantity_required"]
-        .apply(pd.to_numeric, errors="coerce")
-        .fillna(0)
-        .astype(int)
+        pd.to_numeric(df["quantity_required"], errors="coerce").fillna(0).astype(int)
     )
 
-    my_dict = {}
+    return df
 
-    errors = []
 
-    for idx, (_, row) in enumerate(df.iterrows(), start=1):
-        # check if line is blank.
-        if all([e == "" or not e or e == 0.0 for e in row]):
-            LOGGER.debug("Found blank. Breaking.")
-            break
+def _cut_at_first_blank_row(df: pd.DataFrame) -> pd.DataFrame:
+    """Drops the first row whose cells are all empty or zero, and every row after it."""
+    blank = ~df.astype(bool).any(axis=1).to_numpy()
+    if blank.any():
+        LOGGER.debug("Found blank. Breaking.")
+        return df.iloc[: blank.argmax()]
 
-        part_number = row["part_number"] or f"Tool-{idx}"  # Fallback naming
+    return df
+
+
+def _validate_parts(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Validates the rows with `PartData` and returns them dumped to dictionaries.
+
+    :param records: One dictionary of `PartData` fields per sheet row, in sheet order.
+    :raises ValueError: Listing every row that failed validation.
+    """
+    try:
+        return PART_LIST_ADAPTER.dump_python(PART_LIST_ADAPTER.validate_python(records))
+    except ValidationError as e:
+        failed_rows = sorted({error["loc"][0] for error in e.errors()})
 
+    # Only rebuild the failing rows one by one, so the messages read as before.
+    errors = []
+    for row in failed_rows:
         try:
-            part_data = PartData(**row.to_dict())  # Validate with Pydantic
+            PartData(**records[row])
         except ValidationError as e:
-            errors.append(f"Row {idx}: {e}")
-            continue
+            errors.append(f"Row {row + 1}: {e}")
 
-        original_part_number = part_number
-        suffix = 1
-        while part_number in my_dict:
-            part_number = f"{original_part_number}_____{suffix}"
-            suffix += 1
+    raise ValueError(f"Data validation failed:\n" + "\n".join(errors))
 
-        my_dict[part_number] = part_data.model_dump()
 
-    if errors:
-        raise ValueError(f"Data validation failed:\n" + "\n".join(errors))
+def iter_parts_from_excel(filepath: str) -> Iterator[PartData]:
+    """
+    Streams the parts of an Excel file, one validated `PartData` per row.
+
+    The workbook is opened in openpyxl read-only mode, so rows are read from disk as
+    they are consumed and the reader's own memory stays flat however long the sheet
+    is; what the caller keeps is up to it. Only the required columns are converted; cells are cleaned the same way as in
+    `create_dict_from_excel_new`, and iteration stops at the first blank row.
+
+    Unlike the batch path, the first invalid row raises straight away instead of
+    being collected, so a bad sheet fails before the rest of it is read.
+
+    :param filepath: Path to the Excel file to be processed.
+    :return: An iterator of validated parts in sheet order.
+    :raises ValueError: If required columns are missing in the Excel file.
+    :raises ValueError: If a row fails validation.
+    """
+    workbook = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = list(next(rows, ()))
+
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in header]
+        if missing_columns:
+            raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+
+        positions = {field: header.index(col) for col, field in REQUIRED_COLUMNS.items()}
+        other_positions = [
+            pos for pos in range(len(header)) if pos not in positions.values()
+        ]
+
+        for idx, row in enumerate(rows, start=1):
+            fields = {
+                field: _cell_text(row[pos] if pos < len(row) else None)
+                for field, pos in positions.items()
+            }
+            for field in NUMERIC_FIELDS:
+                fields[field] = _to_number(fields[field])
+            fields["quantity_required"] = int(_to_number(fields["quantity_required"]))
+
+            # check if line is blank.
+            if not any(fields.values()) and not any(
+                _cell_text(row[pos]) for pos in other_positions if pos < len(row)
+            ):
+                LOGGER.debug("Found blank. Breaking.")
+                break
+
+            try:
+                yield PartData(**fields)
+            except ValidationError as e:
+                raise ValueError(f"Data validation failed:\nRow {idx}: {e}")
+    finally:
+        workbook.close()
+
+
+def _cell_text(value: Any) -> str:
+    """Formats a cell the way `pd.read_excel(dtype=str).fillna("")` does, stripped."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+
+    text = str(value)
+    if text in EXCEL_NA_VALUES:
+        return ""
+
+    return text.strip()
+
+
+def _to_number(text: str) -> float:
+    """`pd.to_numeric(errors="coerce")` for a single cell, with NaN read as 0."""
+    if "_" in text:  # float() accepts "1_000", pandas does not
+        return 0.0
+    try:
+        number = float(text)
+    except ValueError:
+        return 0.0
+
+    return 0.0 if math.isnan(number) else number
+
+
+def _check_assemblies(my_dict: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Checks that the sheet has a main part and that every 'assy_for' value names a part in it.
 
+    :raises ValueError: If the main part is missing or an 'assy_for' value is invalid.
+    """
     # check for a main part number.
     all_assy_for_data = [value.get("assy_for") for _, value in my_dict.items()]
     if not "" in all_assy_for_data:
@@ -159,20 +431,16 @@ def create_dict_from_excel_new(filepath: str) -> Dict[str, Dict[str, Any]]:
         LOGGER.error("\n".join(assy_errors))
         raise ValueError("\n".join(assy_errors))
 
-    LOGGER.info("Excel File extracted successfully.")
-
-    return my_dict
-
 
-def generate_item_pks(info_dict: Dict[str, Dict[str, Any]]) -> Dict[str, tuple]:
+def generate_item_pks(bom_tree: BomTree) -> Dict[str, tuple]:
     """
     Generates a dictionary mapping part numbers to their corresponding material, heat treatment, and finish primary keys.
 
-    This function processes an input dictionary containing item details, checks if corresponding
+    This function processes the parts of the BOM tree, checks if corresponding
     records exist in the database, and retrieves or creates primary keys (PKs) for materials, finishes,
-    and heat treatments. It ensures unique part number keys in the returned dictionary.
+    and heat treatments.
 
-    :param info_dict: A dictionary where each key is a part number and the value is a dictionary containing:
+    :param bom_tree: The parts list, whose node data contains:
                       - "material": Material description
                       - "finish_code": Finish description
                       - "heat_treat": Heat treatment description
@@ -180,43 +448,37 @@ def generate_item_pks(info_dict: Dict[str, Dict[str, Any]]) -> Dict[str, tuple]:
                       - "stock_length": Stock length for material lookup
                       - "stock_width": Stock width for material lookup
                       - "thickness": Thickness for material lookup
-    :return: A dictionary mapping each unique part number to a tuple of:
+    :return: A dictionary mapping each node key (the part number, suffixed for repeated parts) to a tuple of:
              (material_pk, heat_treat_pk, finish_pk), where each PK is an integer or None if not found/created.
     """
 
-    my_dict = {}
-    for new_key, value_dict in info_dict.items():
-        # Remove suffix if present
-        key = (
-            new_key.split("_____")[0]
-            if bool(re.search(r"____\d+$", new_key))
-            else new_key
-        )
+    item_requests = {}
+    for node in bom_tree:
+        key = node.part_number
+        value_dict = node.data
 
-        # Initialize primary keys
-        mat_pk = None
-        fin_pk = None
-        ht_pk = None
+        # Initialize item attributes
+        mat_item = None
+        fin_item = None
+        ht_item = None
 
-        # Fetch or create material PK
+        # Material item
         if value_dict.get("material"):
-            mat_pk = item.get_or_create_item(
-                **{
-                    "PartNumber": value_dict.get("material"),
-                    "ServiceItem": 0,
-                    "Purchase": 1,
-                    "Manufactureditem": 0,
-                    "ItemTypeFK": 2,
-                    "BulkShip": 0,
-                    "ShipLoose": 0,
-                    "CertificationsRequiredBySupplier": 1,
-                    "PurchaseGeneralLedgerAccountFK": 127,
-                    "SalesCogsAccountFK": 127,
-                    "CalculationTypeFK": 4,
-                }
-            )
-
-        # Fetch or create finish PK
+            mat_item = {
+                "PartNumber": value_dict.get("material"),
+                "ServiceItem": 0,
+                "Purchase": 1,
+                "Manufactureditem": 0,
+                "ItemTypeFK": 2,
+                "BulkShip": 0,
+                "ShipLoose": 0,
+                "CertificationsRequiredBySupplier": 1,
+                "PurchaseGeneralLedgerAccountFK": 127,
+                "SalesCogsAccountFK": 127,
+                "CalculationTypeFK": 4,
+            }
+
+        # Finish item
         if value_dict.get("finish_code"):
             material = value_dict.get("material")
             comment = (
@@ -225,23 +487,21 @@ def generate_item_pks(info_dict: Dict[str, Dict[str, Any]]) -> Dict[str, tuple]:
                 else value_dict["finish_code"]
             )
 
-            fin_pk = item.get_or_create_item(
-                **{
-                    "PartNumber": f"{key} - OP Finish",
-                    "ItemTypeFK": 5,
-                    "Comment": comment,
-                    "PurchaseOrderComment": comment,
-                    "Inventoriable": 0,
-                    "CertificationsRequiredBySupplier": 1,
-                    "CanNotCreateWorkOrder": 1,
-                    "CanNotInvoice": 1,
-                    "PurchaseGeneralLedgerAccountFK": 127,
-                    "SalesCogsAccountFK": 127,
-                    "CalculationTypeFK": 17,
-                }
-            )
-
-        # Fetch or create heat treat PK
+            fin_item = {
+                "PartNumber": f"{key} - OP Finish",
+                "ItemTypeFK": 5,
+                "Comment": comment,
+                "PurchaseOrderComment": comment,
+                "Inventoriable": 0,
+                "CertificationsRequiredBySupplier": 1,
+                "CanNotCreateWorkOrder": 1,
+                "CanNotInvoice": 1,
+                "PurchaseGeneralLedgerAccountFK": 127,
+                "SalesCogsAccountFK": 127,
+                "CalculationTypeFK": 17,
+            }
+
+        # Heat treat item
         if value_dict.get("heat_treat"):
             material = value_dict.get("material")
             comment = (
@@ -250,30 +510,33 @@ def generate_item_pks(info_dict: Dict[str, Dict[str, Any]]) -> Dict[str, tuple]:
                 else value_dict["heat_treat"]
             )
 
-            ht_pk = item.get_or_create_item(
-                **{
-                    "PartNumber": f"{key} - OP HT",
-                    "ItemTypeFK": 5,
-                    "Description": value_dict.get("heat_treat"),
-                    "Comment": comment,
-                    "PurchaseOrderComment": comment,
-                    "Inventoriable": 0,
-                    "CertificationsRequiredBySupplier": 1,
-                    "CanNotCreateWorkOrder": 1,
-                    "CanNotInvoice": 1,
-                    "PurchaseGeneralLedgerAccountFK": 125,
-                    "SalesCogsAccountFK": 125,
-                    "CalculationTypeFK": 17,
-                }
+            ht_item = {
+                "PartNumber": f"{key} - OP HT",
+                "ItemTypeFK": 5,
+                "Description": value_dict.get("heat_treat"),
+                "Comment": comment,
+                "PurchaseOrderComment": comment,
+                "Inventoriable": 0,
+                "CertificationsRequiredBySupplier": 1,
+                "CanNotCreateWorkOrder": 1,
+                "CanNotInvoice": 1,
+                "PurchaseGeneralLedgerAccountFK": 125,
+                "SalesCogsAccountFK": 125,
+                "CalculationTypeFK": 17,
+            }
+
+        item_requests[node.key] = (mat_item, ht_item, fin_item)
+
+    # Resolve every item in bulk first; the per-part calls below are then answered
+    # by the memo without touching the database.
+    my_dict = {}
+    with item.memoized_items():
+        item.resolve_items(
+            [data for requests in item_requests.values() for data in requests if data]
+        )
+        for key, requests in item_requests.items():
+            my_dict[key] = tuple(
+                item.get_or_create_item(**data) if data else None for data in requests
             )
 
-        # Ensure unique key in dictionary
-        original_key = key
-        suffix = 1
-        while key in my_dict:
-            key = f"{original_key}_____{suffix}"
-            suffix += 1
-
-        my_dict[key] = (mat_pk, ht_pk, fin_pk)
-
     return my_dict
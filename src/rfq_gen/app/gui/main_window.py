@@ -1,17 +1,21 @@
 import os
 import datetime
-import re
 from pprint import pprint
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
 from tkcalendar import Calendar
+import functools
+from contextlib import nullcontext
 from threading import Thread
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 from app import controller
+from app.bom_tree import BomNode
 from app.gui.utils import center_window, gui_error_handler
-from app.excel_parser import create_dict_from_excel_new, generate_item_pks
+from app.excel_parser import create_bom_tree_from_excel, generate_item_pks
 from app.gui.cust_buyer_selection_gui import CustomerSelectionGUI
-from mie_trak_api import bom, item, party, request_for_quote, quote, router
+from mie_trak_api import bom, catalog, item, item_index, party, request_for_quote, quote, router
+from mie_trak_api.utils import after_commit, unit_of_work
+from mie_trak_api.instrumentation import query_report
 from base_logger import getlogger
 
 
@@ -468,17 +472,15 @@ class RfqGen(tk.Tk):
             return
 
         LOGGER.info("Extracting excel...")
-        info_dict: Dict[str, Dict[str, Any]] = create_dict_from_excel_new(
-            self.files.get("Excel files", [])[0]
-        )
+        bom_tree = create_bom_tree_from_excel(self.files.get("Excel files", [])[0])
 
-        if not info_dict:
+        if not bom_tree:
             self.loading_screen.destroy()
             messagebox.showerror("ERROR", "Edit Excel File and try Again")
             self.reset_gui()
             return
 
-        LOGGER.debug(info_dict)
+        LOGGER.debug({node.key: node.data for node in bom_tree})
 
         customer_rfq_number = self.rfq_number_text.get()  # user input
 
@@ -498,246 +500,363 @@ class RfqGen(tk.Tk):
         buyer_fk = self.party_details.get("buyer_pk", None)
         party_pk = self.party_details.get("party_pk")
 
-        address_dict = party.get_party_address(party_pk)
-        if update_rfq_pk:
-            rfq_pk = update_rfq_pk
-        else:  # for new rfqs
-            rfq_pk = request_for_quote.insert_into_rfq(
-                party_pk,
-                address_dict,
-                customer_rfq_number=customer_rfq_number,
-                buyer_fk=buyer_fk,
-                inquiry_date=inq_date,
-                due_date=due_date_formated,
-                create_date=current_date_formatted,
-            )  # creating the rfq with selected customer details
-
-        if not rfq_pk:
-            messagebox.showerror(
-                title="RFQ error",
-                message="RFQ might not be generated, database did not return a value for the insertion. Check last RFQ in MT and regenerate.",
-            )
-            return None
+        # Tk variables are read here, never on the worker threads.
+        restricted = bool(self.itar_restricted_var.get())
+        party_name = self.party_details.get("party_name")
 
-        LOGGER.info(f"Created RFQ with pk: {rfq_pk}.")
+        # checking if the user clicked on Restricted box or not and based on that destination path is decided
+        if restricted:
+            estimation_destinatoin_path = rf"y:\Estimating\Restricted\{party_name}\{customer_rfq_number}"
+        else:
+            estimation_destinatoin_path = rf"y:\Estimating\Non-restricted\{party_name}\{customer_rfq_number}"
 
-        # dictionary with file path as key and the pk of the document group
-        user_selected_file_paths = self.files.get("Parts Requested Files", [])
+        # Files are copied before any transaction opens, so no database locks are held
+        # during the network-share copies; a failed run leaves the copies in place and
+        # a retry skips the identical ones. The estimation files go to one RFQ folder,
+        # so they are copied and uploaded once rather than once per part.
+        parts = [node for node in bom_tree if self.is_part_row(node)]
         estimation_folder_docs = list(
             self.files.get("Estimation files", []) + self.files.get("Excel files", [])
         )
-        order_by_counter = 1
-
-        LOGGER.info("Generating FIN, HT, MAT items for parts...")
-        part_mat_ht_op_dict = generate_item_pks(info_dict)
-        pprint(part_mat_ht_op_dict)
-
-        self.loading_screen.set_progress(20)
-
-        item_pk_dict = {}  # {"PartNumber": ItemPK}
-        restricted = False
-        quote_pk_dict = {}
-        LOGGER.info("Starting loop to insert all parts...")
-        for new_key, value in info_dict.items():
-            key = (
-                new_key.split("_____")[0] if self.ends_with_suffix(new_key) else new_key
+        estimation_path_dict = (
+            controller.transfer_and_categorize_files(
+                estimation_folder_docs, estimation_destinatoin_path
             )
-            LOGGER.info(f"Processing part: {key}")
-
-            hardware_or_supplies = value.get("hardware_or_supplies", None)
-            if (
-                not hardware_or_supplies
-                or hardware_or_supplies == "Tooling - Manufactured"
-            ):  # if main part of tooling.
-                # PREPARE DOCUMENTS ------------------------------
-
-                if self.itar_restricted_var.get():  # checking if the user clicked on Restricted box or not and based on that destination path is decided
-                    # pass
-                    destination_path = rf"y:\PDM\Restricted\{self.party_details.get('party_name')}\{key}"
-                    estimation_destinatoin_path = rf"y:\Estimating\Restricted\{self.party_details.get('party_name')}\{self.rfq_number_text.get()}"
-                    restricted = True
-                else:
-                    destination_path = rf"y:\PDM\Non-restricted\{self.party_details.get('party_name')}\{key}"
-                    estimation_destinatoin_path = rf"y:\Estimating\Non-restricted\{self.party_details.get('party_name')}\{self.rfq_number_text.get()}"
-
-                path_dict = controller.transfer_and_categorize_files(
-                    user_selected_file_paths, destination_path
-                )
-                estimation_path_dict = controller.transfer_and_categorize_files(
-                    estimation_folder_docs, estimation_destinatoin_path
+            if parts
+            else {}
+        )
+
+        # Every part folder gets the user-selected files; the planner copies each
+        # (file, folder) pair once, however many rows share a part number.
+        user_selected_file_paths = self.files.get("Parts Requested Files", [])
+        part_documents = controller.copy_documents(
+            {
+                node.key: (
+                    user_selected_file_paths,
+                    rf"y:\PDM\Restricted\{party_name}\{node.part_number}"
+                    if restricted
+                    else rf"y:\PDM\Non-restricted\{party_name}\{node.part_number}",
                 )
+                for node in parts
+            }
+        )
+
+        # Per-call DB timings are written as JSON next to the log, and repeated item
+        # lookups are memoized. The RFQ itself (the reset of an updated RFQ, the header,
+        # its lines and BOMs) is written in the last transaction, so a failed run never
+        # touches an existing RFQ nor leaves an empty one behind. With one worker (the
+        # default) everything below is that one transaction. More (`RFQ_GEN_WORKERS`)
+        # is an opt-in: the shared items commit first and every part commits on its
+        # own; if the run then fails, the quotes of the committed parts are deleted
+        # again, but the items they created are kept.
+        workers = controller.part_workers()
+        whole_rfq = unit_of_work() if workers == 1 else nullcontext()
+        with query_report("RFQ_new") as report, item.memoized_items():
+            # tooling numbers are allocated in short transactions of their own, so
+            # their key-range locks are not held until the whole RFQ commits.
+            controller.create_tooling_items(bom_tree)
+
+            with whole_rfq:
+                with unit_of_work():
+                    LOGGER.info("Generating FIN, HT, MAT items for parts...")
+                    catalog.OUTSIDE_PROCESSING_ITEMS.refresh()  # finish/HT items added since startup
+                    item_index.ITEM_INDEX.sync()
+                    part_mat_ht_op_dict = generate_item_pks(bom_tree)
+                    pprint(part_mat_ht_op_dict)
+                    finish_pks = controller.resolve_shared_items(bom_tree)
+
+                self.loading_screen.set_progress(20)
+
+                # Every BOM line gets its OrderBy up front, in sheet order, so the result
+                # does not depend on which pipeline finishes first.
+                order_by = {}
+                order_by_counter = 1
+                supplies = []
+                for node in bom_tree:
+                    order_by[node.key] = order_by_counter
+                    if self.is_part_row(node):
+                        order_by_counter += sum(
+                            pk is not None for pk in part_mat_ht_op_dict[node.key]
+                        )
+                    elif node.data.get("hardware_or_supplies") in ("Hardware", "Tooling"):
+                        supplies.append(node)
+                        order_by_counter += 1
 
-                # Uploading documents to the RFQ with a counter so that the same document is not uploaded more than once
-                # UPDATE: Counter removed: function checks if the file is inserted or not.
-                for file, pk in estimation_path_dict.items():
-                    # TODO; Use the estiamtion folder dict to upload here
-                    request_for_quote.upload_documents_to_rfq_or_item(
-                        file,
-                        rfq_fk=rfq_pk,
-                        document_type_fk=6,
-                        secure_document=1 if restricted else 0,
-                        document_group_pk=pk,
+                # BOM lines of every part are buffered and written together at the end.
+                bom_writer = bom.BomWriter()
+
+                # quotes of the parts that committed on their own
+                committed_quotes = []
+                try:
+                    LOGGER.info(f"Starting {len(parts)} part pipelines on {workers} worker(s)...")
+                    created = controller.run_pipelines(
+                        [
+                            functools.partial(
+                                self.create_part,
+                                node,
+                                party_pk,
+                                bom_writer,
+                                part_mat_ht_op_dict[node.key],
+                                order_by[node.key],
+                                committed_quotes,
+                            )
+                            for node in parts
+                        ],
+                        workers,
                     )
 
-                # ---------------------------------------------------------
-
-                # searching for the part on MIE Trak and returns the PK, if the part doesn't exist then it creates an item and returns the pk
-                item_dict = {
-                    "PartNumber": key,
-                    "Description": value.get("description", ""),
-                    "Purchase": 0,
-                    "ServiceItem": 0,
-                    "ManufacturedItem": 1,
-                    "ItemTypeFK": 7
-                    if hardware_or_supplies == "Tooling - Manufactured"
-                    else None,
-                }
-                item_pk = item.get_or_create_item(**item_dict)
-                item_pk_dict[key] = item_pk
-
-                # uploading the documents of the item or part
-                matching_paths = {
-                    path: pk for path, pk in path_dict.items() if key in path
-                }
-                for url, pk in matching_paths.items():
-                    if restricted:
-                        request_for_quote.upload_documents_to_rfq_or_item(
-                            url,
-                            item_fk=item_pk,
-                            document_type_fk=2,
-                            secure_document=1,
-                            document_group_pk=pk,
+                    # every row has its own quote, even when it repeats a part number.
+                    quote_pk_by_node = {}
+                    item_pk_by_node = {}
+                    operations_by_quote = {}
+                    for node, (item_pk, quote_pk, quote_assembly_pks) in zip(parts, created):
+                        item_pk_by_node[node.key] = item_pk
+                        operations_by_quote[quote_pk] = quote_assembly_pks
+                        quote_pk_by_node[node.key] = quote_pk
+
+                    # hardware and tooling go on the BOM of their assembly, once its quote exists.
+                    supply_tasks = []
+                    for node in supplies:
+                        fk = quote_pk_by_node.get(node.parent.key) if node.parent else None
+                        supply_tasks.append(
+                            functools.partial(
+                                self.add_supply_to_bom,
+                                node,
+                                bom_writer,
+                                fk,
+                                operations_by_quote.get(fk, {}),
+                                order_by[node.key],
+                            )
                         )
-                    else:
-                        request_for_quote.upload_documents_to_rfq_or_item(
-                            url,
-                            item_fk=item_pk,
-                            document_type_fk=2,
-                            document_group_pk=pk,
+                    controller.run_pipelines(supply_tasks, workers)
+
+                    self.loading_screen.set_progress(40)
+
+                    with unit_of_work():
+                        address_dict = party.get_party_address(party_pk)
+                        if update_rfq_pk:
+                            # reset in the transaction that writes the new lines, so a
+                            # failed regeneration leaves the existing RFQ untouched.
+                            request_for_quote.reset_rfq(update_rfq_pk)
+                            rfq_pk = update_rfq_pk
+                        else:  # for new rfqs
+                            rfq_pk = request_for_quote.insert_into_rfq(
+                                party_pk,
+                                address_dict,
+                                customer_rfq_number=customer_rfq_number,
+                                buyer_fk=buyer_fk,
+                                inquiry_date=inq_date,
+                                due_date=due_date_formated,
+                                create_date=current_date_formatted,
+                            )  # creating the rfq with selected customer details
+
+                        if not rfq_pk:
+                            raise RuntimeError(
+                                "RFQ might not be generated, database did not return a value for the insertion. Check last RFQ in MT and regenerate."
+                            )
+
+                        LOGGER.info(f"Created RFQ with pk: {rfq_pk}.")
+                        report.label = f"RFQ_{rfq_pk}"
+
+                        bom_writer.flush()
+
+                        # a router for the OP finish of every part that has one
+                        controller.create_finish_routers(
+                            [
+                                (
+                                    node.data.get("finish_code", ""),
+                                    part_mat_ht_op_dict[node.key][2],
+                                    f"{node.part_number} - OP Finish",
+                                )
+                                for node in parts
+                                if part_mat_ht_op_dict[node.key][2]  # if OP finish is not none
+                            ],
+                            finish_pks,
                         )
 
-                # creating a quote for the Part and getting QuotePk
-                quote_pk = quote.create_quote_new(party_pk, item_pk, 0, key)
-                quote_pk_dict[key] = quote_pk
-                quote.copy_operations_to_quote(quote_pk)
+                        # uploading the estimation documents of the RFQ, and the documents of the items or parts
+                        request_for_quote.register_documents(
+                            [
+                                {
+                                    "document_path": file,
+                                    "rfq_fk": rfq_pk,
+                                    "document_type_fk": 6,
+                                    "secure_document": 1 if restricted else 0,
+                                    "document_group_pk": pk,
+                                }
+                                for file, pk in estimation_path_dict.items()
+                            ]
+                            + [
+                                {
+                                    "document_path": url,
+                                    "item_fk": item_pk_by_node[node.key],
+                                    "document_type_fk": 2,
+                                    "secure_document": 1 if restricted else 0,
+                                    "document_group_pk": pk,
+                                }
+                                for node in parts
+                                for url, pk in part_documents[node.key].items()
+                                if node.part_number in url
+                            ]
+                        )
 
-                # Sequence number in Operations for IssueMat, HT, FIN resp
-                seq_nums = [6, 21, 22]
+                        controller.create_rfq(
+                            quote_pk_by_node, item_pk_by_node, rfq_pk, bom_tree
+                        )  # checking if the Assy or Detail and creating the line item and adding quotes of assembly to the BOM of Assy Line Quotes
 
-                # list of Quote Assembly pk in order MAT, HT, FIN
-                quote_assembly_fks = [
-                    quote.get_quote_assembly_pk(
-                        **{"QuoteFK": quote_pk, "SequenceNumber": x}
-                    )
-                    for x in seq_nums
-                ]
-
-                # creating a Bill of Material for a quote
-                mat_ht_fin_pks: tuple = part_mat_ht_op_dict[key]
-
-                for pk, quote_ass_fk, num in zip(
-                    mat_ht_fin_pks, quote_assembly_fks, seq_nums
-                ):
-                    if pk is not None:
-                        bom.create_bom_quote(
-                            quote_pk,
-                            pk,
-                            quote_ass_fk,
-                            num,
-                            order_by_counter,
-                            PartLength=value.get("length", ""),
-                            PartWidth=value.get("width", ""),
-                            Thickness=value.get("thickness", ""),
-                        )
-                        order_by_counter += 1
+                        self.loading_screen.set_progress(60)
 
-                if mat_ht_fin_pks[2]:  # if OP finish is not none
-                    op_finish_pk = mat_ht_fin_pks[2]
-                    op_part_number = f"{key} - OP Finish"
-                    finish_description = value.get("finish_code", "")
-                    controller.create_finish_router(
-                        finish_description, op_finish_pk, op_part_number
-                    )
+                        quote.create_quote_assembly_formula_variables(list(quote_pk_by_node.values()))
+                except BaseException as err:
+                    # with one worker nothing has been committed; the rollback undoes it all.
+                    try:
+                        controller.discard_quotes(committed_quotes)
+                    except RuntimeError as discard_err:
+                        raise RuntimeError(f"{err}\n\n{discard_err}") from err
+                    raise
 
-                # Inserting dimensional and other values to the item table for a part and attaching Document to OP, HT, FIN
-                # if key in info_dict:
-                item.insert_part_details_in_item(item_pk, key, value)
-                pk_value = part_mat_ht_op_dict[key]
-                for pk in pk_value[1:]:
-                    if pk:
-                        item.insert_part_details_in_item(pk, key, value)
-                if pk_value[0]:
-                    item.insert_part_details_in_item(
-                        pk_value[0], key, value, item_type="Material"
-                    )
+        loading_screen.set_progress(100)
+        messagebox.showinfo(
+            "Success", f"RFQ generated successfully! RFQ Number: {rfq_pk}"
+        )
 
-            else:
-                # if hardware or tooling then adding it to the BOM of its Assembly part accordingly
-                part_num = value.get("assy_for")
+        self.reset_gui()
 
-                fk = quote_pk_dict.get(part_num)
-                if value.get("hardware_or_supplies", "") == "Hardware":
-                    quote_assembly_pk = quote.get_quote_assembly_pk(
-                        **{"QuoteFK": fk, "SequenceNumber": 24}
-                    )
-                    item_fk = item.check_and_create_tooling(value.get("description"))
-                    bom.create_bom_quote(
-                        fk,
-                        item_fk,
-                        quote_assembly_pk,
-                        24,
-                        order_by_counter,
-                        QuantityRequired=value.get("quantity_required", 1.00),
-                    )
-                    order_by_counter += 1
-                elif value.get("hardware_or_supplies", "") == "Tooling":
-                    quote_assembly_pk = quote.get_quote_assembly_pk(
-                        "QuoteAssemblyPK", QuoteFK=fk, SequenceNumber=8
-                    )
-                    item_fk = item.get_or_create_item(
-                        **{
-                            "PartNumber": key,
-                            "Description": value.get("description"),
-                            "ItemTypeFK": 7,
-                            "MpsItem": 0,
-                            "Purchase": 0,
-                            "ForecastOnMRP": 0,
-                            "MpsOnMRP": 0,
-                            "ServiceItem": 0,
-                            "ShipLoose": 0,
-                            "BulkShip": 0,
-                            "CanNotCreateWorkOrder": 1,
-                            "CanNotInvoice": 1,
-                            "ManufacturedItem": 1,
-                        }
-                    )
-                    bom.create_bom_quote(
-                        fk,
-                        item_fk,
-                        quote_assembly_pk,
-                        8,
-                        order_by_counter,
-                        QuantityRequired=value.get("quantity_required", 1.00),
-                    )
-                    order_by_counter += 1
+    # -------------------------------------------------------------------------------------------------------------
 
-        self.loading_screen.set_progress(40)
+    @staticmethod
+    def is_part_row(node: BomNode) -> bool:
+        """Parts and manufactured tooling get their own item and quote."""
+        hardware_or_supplies = node.data.get("hardware_or_supplies", None)
+        return (
+            not hardware_or_supplies or hardware_or_supplies == "Tooling - Manufactured"
+        )
 
-        controller.create_rfq(
-            quote_pk_dict, item_pk_dict, rfq_pk, info_dict
-        )  # checking if the Assy or Detail and creating the line item and adding quotes of assembly to the BOM of Assy Line Quotes
+    def create_part(
+        self,
+        node: BomNode,
+        party_pk: int,
+        bom_writer: bom.BomWriter,
+        mat_ht_fin_pks: tuple,
+        order_by_counter: int,
+        committed_quotes: List[int],
+    ) -> Tuple[int, int, Dict[int, int]]:
+        """
+        Runs the pipeline of one part: item, quote and operations, BOM and item
+        details. Touches no Tk state, so it can run on a worker
+        thread. The part's documents are registered afterwards, for all parts at once,
+        and its BOM lines are only buffered in `bom_writer`.
 
-        self.loading_screen.set_progress(60)
+        :param committed_quotes: Gets the part's QuotePK once its transaction commits,
+            so it can be discarded if the RFQ fails later.
 
-        for value in quote_pk_dict.values():
-            quote.create_quote_assembly_formula_variable(value)
+        :return: The ItemPK and QuotePK of the part, and the QuoteAssemblyPKs of its
+            operations by SequenceNumber.
+        """
+        key = node.part_number
+        value = node.data
+        hardware_or_supplies = value.get("hardware_or_supplies", None)
+        LOGGER.info(f"Processing part: {key}")
+
+        # searching for the part on MIE Trak and returns the PK, if the part doesn't exist then it creates an item and returns the pk
+        item_dict = {
+            "PartNumber": key,
+            "Description": value.get("description", ""),
+            "Purchase": 0,
+            "ServiceItem": 0,
+            "ManufacturedItem": 1,
+            "ItemTypeFK": 7
+            if hardware_or_supplies == "Tooling - Manufactured"
+            else None,
+        }
+        item_pk = item.get_or_create_item(**item_dict)
+
+        # creating a quote for the Part and getting QuotePk
+        quote_pk = quote.create_quote_new(party_pk, item_pk, 0, key)
+        after_commit(functools.partial(committed_quotes.append, quote_pk))
+        quote_assembly_pks = quote.copy_operations_to_quote(quote_pk)
+
+        # Sequence number in Operations for IssueMat, HT, FIN resp
+        seq_nums = [6, 21, 22]
+
+        # list of Quote Assembly pk in order MAT, HT, FIN
+        quote_assembly_fks = [quote_assembly_pks.get(x) for x in seq_nums]
+
+        # creating a Bill of Material for a quote
+        for pk, quote_ass_fk, num in zip(
+            mat_ht_fin_pks, quote_assembly_fks, seq_nums
+        ):
+            if pk is not None:
+                bom_writer.add(
+                    quote_pk,
+                    pk,
+                    quote_ass_fk,
+                    num,
+                    order_by_counter,
+                    PartLength=value.get("length", ""),
+                    PartWidth=value.get("width", ""),
+                    Thickness=value.get("thickness", ""),
+                )
+                order_by_counter += 1
+
+        # Inserting dimensional and other values to the item table for a part and attaching Document to OP, HT, FIN
+        # if key in info_dict:
+        item.insert_part_details_in_item(item_pk, key, value)
+        pk_value = mat_ht_fin_pks
+        for pk in pk_value[1:]:
+            if pk:
+                item.insert_part_details_in_item(pk, key, value)
+        if pk_value[0]:
+            item.insert_part_details_in_item(
+                pk_value[0], key, value, item_type="Material"
+            )
 
-        loading_screen.set_progress(100)
-        messagebox.showinfo(
-            "Success", f"RFQ generated successfully! RFQ Number: {rfq_pk}"
-        )
+        return item_pk, quote_pk, quote_assembly_pks
 
-        self.reset_gui()
+    def add_supply_to_bom(
+        self,
+        node: BomNode,
+        bom_writer: bom.BomWriter,
+        fk: Optional[int],
+        quote_assembly_pks: Dict[int, int],
+        order_by_counter: int,
+    ) -> None:
+        """
+        Adds a hardware or tooling row to the BOM of its assembly's quote, through
+        `bom_writer`.
+
+        :param fk: QuotePK of the assembly the row belongs to.
+        :param quote_assembly_pks: QuoteAssemblyPKs of that quote's operations, by
+            SequenceNumber, as returned by `quote.copy_operations_to_quote`.
+        """
+        key = node.part_number
+        value = node.data
+        LOGGER.info(f"Processing part: {key}")
+
+        if value.get("hardware_or_supplies", "") == "Hardware":
+            quote_assembly_pk = quote_assembly_pks.get(24)
+            item_fk = item.check_and_create_tooling(value.get("description"))
+            bom_writer.add(
+                fk,
+                item_fk,
+                quote_assembly_pk,
+                24,
+                order_by_counter,
+                QuantityRequired=value.get("quantity_required", 1.00),
+            )
+        elif value.get("hardware_or_supplies", "") == "Tooling":
+            quote_assembly_pk = quote_assembly_pks.get(8)
+            item_fk = item.get_or_create_item(
+                **controller.tooling_item(key, value.get("description"))
+            )
+            bom_writer.add(
+                fk,
+                item_fk,
+                quote_assembly_pk,
+                8,
+                order_by_counter,
+                QuantityRequired=value.get("quantity_required", 1.00),
+            )
 
     # -------------------------------------------------------------------------------------------------------------
 
@@ -750,20 +869,10 @@ class RfqGen(tk.Tk):
             title="Enter RFQ #", prompt="Enter the RFQ# you would like to update"
         )
 
-        try:
-            request_for_quote.reset_rfq(rfq_pk)
-        except Exception as e:
-            messagebox.showerror(
-                title="RFQ could not reset",
-                message=f"RFQ {rfq_pk} was not reset due to an error:\n\n{e}",
-            )
-
+        # the RFQ is reset by `generate_rfq` in the same transaction as the regeneration.
         loading_screen = LoadingScreen(self, max_progress=100)
         Thread(
             target=self.generate_rfq,
             args=(loading_screen,),
             kwargs={"update_rfq_pk": rfq_pk},
         ).start()
-
-    def ends_with_suffix(self, s):
-        return re.search(r"_____\d+$", s) is not None
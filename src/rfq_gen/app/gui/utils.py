@@ -1,7 +1,18 @@
 import functools
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import messagebox
 import os
 import shutil
+from typing import Dict, List, Tuple
+
+
+# Copies run at once by `transfer_files`; the network shares are the bottleneck.
+TRANSFER_WORKERS = max(1, int(os.getenv("RFQ_GEN_TRANSFER_WORKERS", "4")))
+# Also compare contents before skipping a copy whose size and mtime already match.
+TRANSFER_VERIFY_HASH = os.getenv("RFQ_GEN_TRANSFER_VERIFY_HASH", "0") == "1"
+# Read/write size for copies on Windows, sized for multi-hundred-MB STEP/CATIA files.
+COPY_BUFFER_SIZE = 16 * 1024 * 1024
 
 
 def gui_error_handler(func):
@@ -69,16 +80,22 @@ def center_window(window, width=1000, height=700):
     window.geometry(f"{width}x{height}+{x}+{y}")
 
 
-def transfer_file_to_folder(folder_path: str, file_path: str) -> str:
+def transfer_file_to_folder(
+    folder_path: str, file_path: str, verify_hash: bool = TRANSFER_VERIFY_HASH
+) -> str:
     """
     Copies a file to the specified folder and returns the new file path.
 
     This function ensures that the destination folder exists, then copies the file
     from the given source path to that folder, preserving the original filename.
+    The copy is skipped when the destination already has the same size and
+    modification time (and, with `verify_hash`, the same contents), which is the
+    usual case when an RFQ is regenerated.
 
     Parameters:
         folder_path (str): The path to the destination folder where the file should be copied.
         file_path (str): The full path to the source file that will be copied.
+        verify_hash (bool): Also compare file contents before skipping a copy.
 
     Returns:
         str: The full path to the copied file in the destination folder.
@@ -86,8 +103,91 @@ def transfer_file_to_folder(folder_path: str, file_path: str) -> str:
 
     os.makedirs(folder_path, exist_ok=True)
 
-    filename = os.path.basename(file_path)  # source file path
-    destination_path = os.path.join(folder_path, filename)
-    shutil.copyfile(file_path, destination_path)
+    destination_path = destination_of(file_path, folder_path)
+    if not _is_identical(file_path, destination_path, verify_hash):
+        _copy_file(file_path, destination_path)
 
     return destination_path
+
+
+def transfer_files(
+    copies: List[Tuple[str, str]], workers: int = TRANSFER_WORKERS
+) -> List[str]:
+    """
+    Runs `transfer_file_to_folder` for many files on a thread pool.
+
+    Copies to the same destination path (same file name, same folder) run one after
+    the other on one worker, in the order of `copies`, so the last one wins as it
+    would if everything ran serially; only different destinations run at once.
+
+    Parameters:
+        copies (list[tuple[str, str]]): (source file, destination folder) pairs.
+        workers (int): Most copies run at once.
+
+    Returns:
+        list[str]: The destination path of every copy, in the order of `copies`.
+    """
+    if workers <= 1 or len(copies) <= 1:
+        return [transfer_file_to_folder(folder, file) for file, folder in copies]
+
+    by_destination: Dict[str, List[int]] = {}
+    for index, (file, folder) in enumerate(copies):
+        key = os.path.normcase(destination_of(file, folder))
+        by_destination.setdefault(key, []).append(index)
+
+    destinations: List[str] = [""] * len(copies)
+
+    def copy_in_order(indexes: List[int]) -> None:
+        for index in indexes:
+            file, folder = copies[index]
+            destinations[index] = transfer_file_to_folder(folder, file)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rfq-copy") as pool:
+        list(pool.map(copy_in_order, by_destination.values()))
+
+    return destinations
+
+
+def destination_of(file_path: str, folder_path: str) -> str:
+    """The path `transfer_file_to_folder` copies `file_path` to in `folder_path`."""
+    return os.path.join(folder_path, os.path.basename(file_path))
+
+
+def _is_identical(source: str, destination: str, verify_hash: bool) -> bool:
+    """Whether `destination` is already a copy of `source`."""
+    try:
+        src_stat = os.stat(source)
+        dest_stat = os.stat(destination)
+    except FileNotFoundError:
+        return False
+
+    # copies keep the source mtime (see `_copy_file`); shares may round it to 2s.
+    if src_stat.st_size != dest_stat.st_size or abs(
+        src_stat.st_mtime - dest_stat.st_mtime
+    ) > 2:
+        return False
+
+    return not verify_hash or _file_digest(source) == _file_digest(destination)
+
+
+def _file_digest(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return hashlib.file_digest(file, "blake2b").digest()
+
+
+def _copy_file(source: str, destination: str) -> None:
+    """
+    Copies a file's contents and modification time.
+
+    On Windows the contents are copied with a large buffer; elsewhere `shutil`
+    already uses the kernel (`sendfile`/`copy_file_range`).
+    """
+    if os.name == "nt":
+        with open(source, "rb") as fsrc, open(destination, "wb") as fdst:
+            shutil.copyfileobj(fsrc, fdst, COPY_BUFFER_SIZE)
+    else:
+        shutil.copyfile(source, destination)
+
+    # set last, so an interrupted copy never looks identical to its source.
+    src_stat = os.stat(source)
+    os.utime(destination, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
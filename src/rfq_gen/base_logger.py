@@ -2,6 +2,9 @@ import sys
 import loguru
 
 
+LOG_FILE = r"Z:\dist\logs\RFQ_GEN.log"
+
+
 def getlogger(name: str = "DefaultName", level="DEBUG") -> loguru.logger:  # type: ignore
     """
     Initialize and return a logger instance with the specified name and level.
@@ -29,7 +32,7 @@ def getlogger(name: str = "DefaultName", level="DEBUG") -> loguru.logger:  # typ
 
     # NOTE: to get logs into a file for prod.
     logobj.add(
-        r"Z:\dist\logs\RFQ_GEN.log",  # Specify your desired log file path
+        LOG_FILE,  # Specify your desired log file path
         level=level,
         format=logger_format,
         colorize=False,  # No color in file logs
@@ -0,0 +1,38 @@
+"""
+Builds the RFQ Gen executable with PyInstaller.
+
+Run from `src/rfq_gen` with a database connection (VPN), so the prebuilt schema
+artifacts can be written first:
+
+    python build.py [extra PyInstaller options]
+
+The artifacts (`mie_trak_api.build_schemas`) are bundled as data, so a fresh install
+builds its validation models without querying INFORMATION_SCHEMA. The build stops if
+they cannot be written.
+"""
+
+import os
+import sys
+import PyInstaller.__main__
+from mie_trak_api.build_schemas import DEFAULT_TABLES
+from mie_trak_api.utils import write_schema_artifact
+
+
+DATA_DIRS = ["mie_trak_api/schemas", "mie_trak_api/sql"]
+
+
+def main(pyinstaller_args):
+    for table_name in DEFAULT_TABLES:
+        print(f"Wrote {write_schema_artifact(table_name)}")
+
+    add_data = []
+    for folder in DATA_DIRS:
+        add_data += ["--add-data", f"{folder}{os.pathsep}{folder}"]
+
+    PyInstaller.__main__.run(
+        ["main.py", "--name", "RFQ_GEN", "--noconfirm", *add_data, *pyinstaller_args]
+    )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,6 +1,9 @@
 from app.gui.main_window import RfqGen
+from mie_trak_api import catalog, item_index
 
 
 if __name__ == "__main__":
+    catalog.OUTSIDE_PROCESSING_ITEMS.load_in_background()
+    item_index.ITEM_INDEX.open_in_background()
     r = RfqGen()
     r.mainloop()
@@ -0,0 +1,408 @@
+import os
+import re
+import hashlib
+import itertools
+import sqlite3
+import threading
+import pyodbc
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from base_logger import getlogger
+
+
+LOGGER = getlogger("MT Backend")
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sql")
+
+
+class Backend(ABC):
+    """
+    The database a `with_db_conn` call talks to.
+
+    Every module in `mie_trak_api` issues plain parameterised SQL that both backends
+    understand. The few statements that need a server-specific dialect (returning a
+    generated key, reading a table schema) go through the methods below instead; a
+    backend must implement every abstract one before it can be created.
+    """
+
+    name = "base"
+    # Errors that mean the database could not be reached at all.
+    connection_errors: Tuple[type, ...] = ()
+    # Any other database error.
+    errors: Tuple[type, ...] = ()
+    # Most parameters a single statement may carry.
+    max_parameters = 999
+    # Most rows a single multi-row VALUES list may carry.
+    max_insert_rows = 1000
+    # Table hint that keeps the rows an `insert_if_absent_sql` check read locked
+    # until the transaction ends.
+    key_lock_hint = ""
+
+    @abstractmethod
+    def connect(self) -> Any:
+        raise NotImplementedError
+
+    def insert_returning_sql(
+        self, table: str, columns: Sequence[str], returning: Sequence[str], rows: int = 1
+    ) -> str:
+        """
+        Returns an INSERT of `rows` rows that yields the `returning` columns of every new row.
+
+        The returned columns must be integers (keys), and are not guaranteed to come back
+        in the order of the VALUES rows.
+        """
+        row_placeholders = "(" + ", ".join(["?"] * len(columns)) + ")"
+        values = ", ".join([row_placeholders] * rows)
+
+        return self.insert_select_returning_sql(
+            table, columns, f"VALUES {values}", returning
+        )
+
+    @abstractmethod
+    def insert_select_returning_sql(
+        self, table: str, columns: Sequence[str], source: str, returning: Sequence[str]
+    ) -> str:
+        """
+        Returns an INSERT of the rows of `source` (a SELECT or VALUES clause, without a
+        trailing semicolon) that yields the `returning` columns of every new row.
+
+        The returned columns must be integers, and are not guaranteed to come back in
+        the order of the `source` rows.
+        """
+        raise NotImplementedError
+
+    def insert_if_absent_sql(
+        self,
+        table: str,
+        columns: Sequence[str],
+        key_columns: Sequence[str],
+        returning: Sequence[str],
+    ) -> str:
+        """
+        Returns an INSERT of one row that is skipped when a row with the same
+        `key_columns` values exists, and yields the `returning` columns of the new row
+        (no rows when it was skipped).
+
+        Parameters are the row's values followed by its `key_columns` values.
+        """
+        row = ", ".join(["?"] * len(columns))
+        keys = " AND ".join(f"{column} = ?" for column in key_columns)
+        source = f"""
+            SELECT {row}
+            WHERE NOT EXISTS (SELECT 1 FROM {table}{self.key_lock_hint} WHERE {keys})
+        """
+
+        return self.insert_select_returning_sql(table, columns, source, returning)
+
+    def lock_resource_sql(self) -> Optional[str]:
+        """
+        Returns a statement that takes an exclusive lock on a named resource until
+        the transaction ends, or None if the backend serialises writers anyway.
+
+        Its one parameter is the resource name; it yields one row whose value is
+        negative when the lock was not granted.
+        """
+        return None
+
+    @abstractmethod
+    def max_number_sql(self, table: str, column: str, prefix: str) -> str:
+        """
+        Returns a SELECT of the largest integer that follows `prefix` in `column`
+        (NULL if there is none). Values with anything but digits after the prefix
+        are ignored. Its one parameter is `prefix` + "%".
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def fetch_table_schema(self, cursor, table_name: str) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def schema_fingerprints(self, cursor, table_names: List[str]) -> Dict[str, str]:
+        """Returns a value per (lowercase) table name that changes when the table is altered."""
+        raise NotImplementedError
+
+
+class MSSQLBackend(Backend):
+    """The live MIE Trak SQL Server database, reached through pyodbc."""
+
+    name = "mssql"
+    connection_errors = (pyodbc.OperationalError,)
+    errors = (pyodbc.Error,)
+    max_parameters = 2000  # the hard limit is 2100, less what sp_executesql adds
+    # a key-range lock held to commit, so a concurrent check for the same key waits.
+    key_lock_hint = " WITH (UPDLOCK, HOLDLOCK)"
+
+    def __init__(self, dsn: Optional[str]):
+        self.dsn = dsn
+
+    def connect(self) -> pyodbc.Connection:
+        return pyodbc.connect(self.dsn)
+
+    def insert_select_returning_sql(self, table, columns, source, returning):
+        # OUTPUT ... INTO a table variable rather than a bare OUTPUT clause, so the
+        # statement keeps working on tables that have triggers.
+        declared = ", ".join(f"{column} bigint" for column in returning)
+        inserted = ", ".join(f"INSERTED.{column}" for column in returning)
+
+        return f"""
+        SET NOCOUNT ON;
+        DECLARE @inserted TABLE ({declared});
+        INSERT INTO {table} ({", ".join(columns)})
+        OUTPUT {inserted} INTO @inserted
+        {source};
+        SELECT {", ".join(returning)} FROM @inserted;
+        """
+
+    def lock_resource_sql(self):
+        return """
+        SET NOCOUNT ON;
+        DECLARE @result int;
+        EXEC @result = sp_getapplock
+            @Resource = ?, @LockMode = 'Exclusive', @LockOwner = 'Transaction',
+            @LockTimeout = 30000;
+        SELECT @result;
+        """
+
+    def max_number_sql(self, table, column, prefix):
+        suffix = f"SUBSTRING({column}, {len(prefix) + 1}, 4000)"
+
+        return f"""
+        SELECT MAX(TRY_CAST({suffix} AS bigint)) FROM {table}
+        WHERE {column} LIKE ? AND {suffix} <> '' AND {suffix} NOT LIKE '%[^0-9]%'
+        """
+
+    def fetch_table_schema(self, cursor, table_name):
+        query = """
+        SELECT
+            COLUMN_NAME,
+            DATA_TYPE,
+            CHARACTER_MAXIMUM_LENGTH,
+            IS_NULLABLE
+        FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_NAME = ?
+        """
+        cursor.execute(query, (table_name,))
+        schema = []
+
+        for row in cursor.fetchall():
+            schema.append(
+                {
+                    "column_name": row.COLUMN_NAME,
+                    "data_type": row.DATA_TYPE,
+                    "max_length": row.CHARACTER_MAXIMUM_LENGTH,
+                    "is_nullable": row.IS_NULLABLE == "YES",
+                }
+            )
+
+        return schema
+
+    def schema_fingerprints(self, cursor, table_names):
+        """`sys.tables.modify_date` moves whenever a table is altered."""
+        if not table_names:
+            return {}
+
+        placeholders = ", ".join(["?"] * len(table_names))
+        query = f"""
+        SELECT LOWER(name), CONVERT(varchar(33), modify_date, 126)
+        FROM sys.tables
+        WHERE name IN ({placeholders})
+        """
+        cursor.execute(query, tuple(table_names))
+
+        return {name: modify_date for name, modify_date in cursor.fetchall()}
+
+
+class _SQLiteCursor(sqlite3.Cursor):
+    """
+    Lets a single `execute` carry several statements, like a T-SQL batch does.
+
+    Parameters are handed to each statement in order, by counting its placeholders.
+    """
+
+    def execute(self, sql, parameters=()):
+        statements = _split_statements(sql)
+        if len(statements) <= 1:
+            return super().execute(sql, parameters)
+
+        parameters = tuple(parameters)
+        for statement in statements:
+            count = statement.count("?")
+            super().execute(statement, parameters[:count])
+            parameters = parameters[count:]
+
+        return self
+
+
+class _SQLiteConnection(sqlite3.Connection):
+    def cursor(self, factory=_SQLiteCursor):
+        return super().cursor(factory)
+
+
+def _split_statements(sql: str) -> List[str]:
+    statements = []
+    current = ""
+    for part in sql.split(";"):
+        current += part + ";"
+        if sqlite3.complete_statement(current):
+            if current.strip(" \t\r\n;"):
+                statements.append(current.strip())
+            current = ""
+
+    if current.strip(" \t\r\n;"):
+        statements.append(current.strip())
+
+    return statements
+
+
+class SQLiteBackend(Backend):
+    """
+    A local SQLite copy of the MIE Trak tables used by RFQ Gen.
+
+    It needs no server, VPN or ODBC driver, so the whole RFQ generation flow can be
+    run and profiled offline. The schema (`sql/sqlite_schema.sql`) mirrors the
+    columns these modules touch using SQL Server type names, and is seeded
+    (`sql/sqlite_seed.sql`) with the template quotes and a sample customer.
+
+    :param path: Database file. ":memory:" keeps a private in-memory database that
+        lives as long as the backend does.
+    """
+
+    name = "sqlite"
+    connection_errors = ()
+    errors = (sqlite3.Error,)
+    key_lock_hint = ""  # writers are serialised, so no other insert can interleave.
+
+    _memory_ids = itertools.count(1)
+
+    def __init__(self, path: str = ":memory:"):
+        self._lock = threading.Lock()
+        self._keeper: Optional[sqlite3.Connection] = None
+        self._initialized = False
+
+        if path == ":memory:":
+            # a named shared-cache database, so every pooled connection sees the same data.
+            self.path = f"file:rfq_gen_{next(self._memory_ids)}?mode=memory&cache=shared"
+            self._uri = True
+        else:
+            self.path = path
+            self._uri = False
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            uri=self._uri,
+            timeout=30,
+            check_same_thread=False,  # the pool may hand a connection to another thread
+            factory=_SQLiteConnection,
+        )
+
+        with self._lock:
+            if not self._initialized:
+                self._initialize(conn)
+                if self._uri:
+                    # an in-memory database disappears with its last connection.
+                    self._keeper = sqlite3.connect(
+                        self.path, uri=True, check_same_thread=False
+                    )
+                self._initialized = True
+
+        return conn
+
+    def _initialize(self, conn: sqlite3.Connection) -> None:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Item'"
+        ).fetchone()
+        if exists:
+            return
+
+        LOGGER.info(f"Creating offline MIE Trak database at {self.path}")
+        for filename in ("sqlite_schema.sql", "sqlite_seed.sql"):
+            with open(os.path.join(SQL_DIR, filename), "r", encoding="utf-8") as f:
+                conn.executescript(f.read())
+        conn.commit()
+
+    def insert_select_returning_sql(self, table, columns, source, returning):
+        return f"""
+        INSERT INTO {table} ({", ".join(columns)})
+        {source}
+        RETURNING {", ".join(returning)};
+        """
+
+    def max_number_sql(self, table, column, prefix):
+        suffix = f"SUBSTR({column}, {len(prefix) + 1})"
+
+        return f"""
+        SELECT MAX(CAST({suffix} AS INTEGER)) FROM {table}
+        WHERE {column} LIKE ? AND {suffix} <> '' AND {suffix} NOT GLOB '*[^0-9]*'
+        """
+
+    def fetch_table_schema(self, cursor, table_name):
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = ? COLLATE NOCASE",
+            (table_name,),
+        )
+        found = cursor.fetchone()
+        if not found:
+            return []
+
+        cursor.execute(f"PRAGMA table_info([{found[0]}])")
+        schema = []
+
+        for _, name, declared_type, not_null, _, is_pk in cursor.fetchall():
+            # declared types use SQL Server names, e.g. "nvarchar(100)" or "decimal(18, 5)";
+            # nvarchar(max) is declared without a size, which SQLite cannot parse.
+            match = re.match(r"\s*(\w+)\s*(?:\(\s*(\d+))?", declared_type or "")
+            data_type = match.group(1).lower() if match else "nvarchar"
+            if data_type == "integer":  # only "INTEGER PRIMARY KEY" is an identity in SQLite
+                data_type = "int"
+            size = match.group(2) if match else None
+
+            max_length = None
+            if data_type.endswith("char") and size:
+                max_length = int(size)
+
+            schema.append(
+                {
+                    "column_name": name,
+                    "data_type": data_type,
+                    "max_length": max_length,
+                    "is_nullable": not (not_null or is_pk),
+                }
+            )
+
+        return schema
+
+    def schema_fingerprints(self, cursor, table_names):
+        """The `CREATE TABLE` text changes whenever a SQLite table is altered."""
+        if not table_names:
+            return {}
+
+        placeholders = ", ".join(["?"] * len(table_names))
+        cursor.execute(
+            f"""
+            SELECT LOWER(name), sql FROM sqlite_master
+            WHERE type = 'table' AND LOWER(name) IN ({placeholders})
+            """,
+            tuple(table_names),
+        )
+
+        return {
+            name: hashlib.sha1(sql.encode("utf-8")).hexdigest()
+            for name, sql in cursor.fetchall()
+        }
+
+
+def get_backend(dsn: Optional[str]) -> Backend:
+    """
+    Picks the backend from the `DB_BACKEND` environment variable.
+
+    `DB_BACKEND=sqlite` uses the offline SQLite database at `SQLITE_PATH`
+    (default: ":memory:"); anything else uses the live server through `dsn`.
+
+    :param dsn: ODBC connection string of the live server.
+    """
+    if os.getenv("DB_BACKEND", "mssql").lower() == "sqlite":
+        return SQLiteBackend(os.getenv("SQLITE_PATH", ":memory:"))
+
+    return MSSQLBackend(dsn)
@@ -1,5 +1,8 @@
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
 import pyodbc
-from mie_trak_api.utils import with_db_conn
+from mie_trak_api.utils import insert_many, with_db_conn
 from base_logger import getlogger
 
 
@@ -47,6 +50,47 @@ default_values = {
 }
 
 
+# Columns every BOM line sets; keywords may add any other QuoteAssembly column.
+BOM_COLUMNS = [
+    "QuoteFK",
+    "ItemFK",
+    "QuoteAssemblySeqNumberFK",
+    "SequenceNumber",
+    "OrderBy",
+    *default_values,
+]
+
+
+def bom_row(
+    quote_fk: int,
+    item_fk: int,
+    quote_assembly_seq_number_fk: Optional[int],
+    sequence_number: int,
+    order_by: int,
+    **kwargs,
+) -> Dict[str, Any]:
+    """
+    Returns the column values of a BOM line: `BOM_COLUMNS` first, then any other
+    column passed as a keyword.
+
+    :param quote_fk: Quote the line is added to.
+    :param item_fk: Item of the line (material, heat treat, finish, hardware or tooling).
+    :param quote_assembly_seq_number_fk: QuoteAssembly row of the operation the line belongs to.
+    :param sequence_number: Sequence number of that operation.
+    :param order_by: Position of the line in the BOM.
+    :param kwargs: QuoteAssembly values that overwrite the defaults, e.g. `QuantityRequired=2`.
+    """
+    return {
+        "QuoteFK": quote_fk,
+        "ItemFK": item_fk,
+        "QuoteAssemblySeqNumberFK": quote_assembly_seq_number_fk,
+        "SequenceNumber": sequence_number,
+        "OrderBy": order_by,
+        **default_values,  # Default values
+        **kwargs,  # User-provided values overwrite defaults
+    }
+
+
 # TODO: testing pending
 @with_db_conn(commit=True)
 def create_bom_quote(
@@ -69,22 +113,92 @@ def create_bom_quote(
     :param order_by: [TODO:description]
     """
 
-    info_dict = {
-        "QuoteFK": quote_fk,
-        "ItemFK": item_fk,
-        "QuoteAssemblySeqNumberFK": quote_assembly_seq_number_fk,
-        "SequenceNumber": sequence_number,
-        "OrderBy": order_by,
-        **default_values,  # Default values
+    row = bom_row(
+        quote_fk,
+        item_fk,
+        quote_assembly_seq_number_fk,
+        sequence_number,
+        order_by,
         **kwargs,  # User-provided values overwrite defaults
-    }
+    )
+
+    LOGGER.debug(f"Inserting row: \n{row}")
+    _insert_lines(cursor, [row])
+
+
+@with_db_conn(commit=True)
+def write_bom_lines(cursor: pyodbc.Cursor, rows: List[Dict[str, Any]]) -> None:
+    """
+    Inserts BOM lines built by `bom_row` with multi-row INSERTs. Lines are grouped
+    by the columns they set, so lines with extra columns get their own statements;
+    each group keeps the order the lines were given in.
+
+    :param rows: One dict per line, as returned by `bom_row`.
+    """
+    _insert_lines(cursor, rows)
+    LOGGER.info(f"Inserted {len(rows)} BOM lines.")
+
+
+def _insert_lines(cursor: pyodbc.Cursor, rows: List[Dict[str, Any]]) -> None:
+    groups: Dict[Tuple[str, ...], List[tuple]] = {}
+    for row in rows:
+        groups.setdefault(tuple(row), []).append(tuple(row.values()))
+
+    for columns, values in groups.items():
+        insert_many(cursor, "QuoteAssembly", list(columns), values)
+
+
+class BomWriter:
+    """
+    Buffers the BOM lines of an RFQ and writes them in batches.
+
+    `add` takes the arguments of `create_bom_quote` and can be called from several
+    threads; `flush` writes every buffered line, in OrderBy order, with as few
+    statements as the backend allows. Used as a context manager, the buffer is
+    flushed when the block exits without an error.
+
+    Usage::
+
+        with bom.BomWriter() as writer:
+            writer.add(quote_pk, item_pk, quote_assembly_pk, 6, 1, PartLength=2.5)
+    """
+
+    def __init__(self):
+        self.rows: List[Dict[str, Any]] = []
+        self.lock = threading.Lock()
+
+    def add(
+        self,
+        quote_fk: int,
+        item_fk: int,
+        quote_assembly_seq_number_fk: Optional[int],
+        sequence_number: int,
+        order_by: int,
+        **kwargs: Any,
+    ) -> None:
+        row = bom_row(
+            quote_fk,
+            item_fk,
+            quote_assembly_seq_number_fk,
+            sequence_number,
+            order_by,
+            **kwargs,
+        )
+        with self.lock:
+            self.rows.append(row)
 
-    LOGGER.debug(f"Inserting dict: \n{info_dict}")
+    def flush(self) -> int:
+        """Writes the buffered lines and returns how many were written."""
+        with self.lock:
+            rows, self.rows = self.rows, []
 
-    columns = ", ".join(info_dict.keys())
-    placeholders = ", ".join(["?"] * len(info_dict))
-    values = tuple(info_dict.values())
+        if rows:
+            write_bom_lines(sorted(rows, key=lambda row: row["OrderBy"]))
+        return len(rows)
 
-    query = f"INSERT INTO QuoteAssembly ({columns}) VALUES ({placeholders});"
+    def __enter__(self) -> "BomWriter":
+        return self
 
-    cursor.execute(query, values)
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.flush()
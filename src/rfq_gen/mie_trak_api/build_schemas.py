@@ -0,0 +1,19 @@
+"""
+Writes the prebuilt table schema artifacts used to build validation models offline.
+
+`build.py` runs this before PyInstaller and bundles the folder as data. To refresh
+the artifacts alone, run from `src/rfq_gen` with a database connection:
+
+    python -m mie_trak_api.build_schemas item
+"""
+
+import sys
+from mie_trak_api.utils import write_schema_artifact
+
+
+DEFAULT_TABLES = ["item"]
+
+
+if __name__ == "__main__":
+    for table_name in sys.argv[1:] or DEFAULT_TABLES:
+        print(f"Wrote {write_schema_artifact(table_name)}")
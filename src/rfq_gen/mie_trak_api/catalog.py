@@ -0,0 +1,176 @@
+import threading
+from typing import Any, Dict, List, Optional
+
+import pyodbc
+from mie_trak_api.utils import normalized_value, with_db_conn
+from base_logger import getlogger
+
+
+LOGGER = getlogger("MT Catalog")
+
+# ItemTypeFK of outside-processing items: finish codes, "OP Finish" and "OP HT".
+OUTSIDE_PROCESSING_TYPE = 5
+# Every column the finish and heat treat items are looked up by.
+OUTSIDE_PROCESSING_COLUMNS = [
+    "PartNumber",
+    "Description",
+    "ItemTypeFK",
+    "Comment",
+    "PurchaseOrderComment",
+    "Inventoriable",
+    "CertificationsRequiredBySupplier",
+    "CanNotCreateWorkOrder",
+    "CanNotInvoice",
+    "PurchaseGeneralLedgerAccountFK",
+    "SalesCogsAccountFK",
+    "CalculationTypeFK",
+]
+
+
+class ItemCatalog:
+    """
+    An in-process copy of the Item rows of one ItemTypeFK, keyed by normalized
+    PartNumber, that answers `get_or_create_item` lookups without the database.
+
+    The catalog is loaded once (`load_in_background` at startup) and then refreshed
+    incrementally: `refresh` only fetches rows with an ItemPK above the highest one
+    already held. Items created by this process are picked up by the next refresh,
+    once committed, so a rolled back insert is never served.
+
+    A lookup the catalog cannot answer (not loaded yet, another ItemTypeFK, a column
+    it does not hold, no matching row) returns None and the caller asks the
+    database, so a stale catalog costs a query, not a wrong item. Rows changed
+    through `item.update_item` or `item.insert_part_details_in_item` are dropped;
+    edits made elsewhere are only seen after a restart.
+
+    :param item_type_fk: ItemTypeFK of the rows to hold.
+    :param columns: Item columns to hold, including "PartNumber" and "ItemTypeFK".
+    """
+
+    def __init__(self, item_type_fk: int, columns: List[str]):
+        self.item_type_fk = item_type_fk
+        self.columns = columns
+        self._known_columns = {column.lower() for column in columns}
+        self._rows: Dict[str, List[Dict[str, Any]]] = {}
+        self.high_water = 0
+        self.hits = 0
+        self.ready = threading.Event()
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self._rows.values())
+
+    def load_in_background(self) -> threading.Thread:
+        """Starts the first load on a daemon thread and returns it."""
+        thread = threading.Thread(
+            target=self._load_quietly, name="item-catalog", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _load_quietly(self) -> None:
+        try:
+            self.refresh()
+        except RuntimeError as err:  # e.g. VPN not connected; lookups use the database
+            LOGGER.warning(f"Item catalog not loaded: {err}")
+
+    def refresh(self) -> int:
+        """
+        Fetches the rows added since the last refresh (all rows the first time).
+
+        :return: The number of rows fetched.
+        """
+        with self.refresh_lock:
+            rows = _fetch_items_after(self.item_type_fk, self.columns, self.high_water)
+
+            with self.lock:
+                for row in rows:
+                    record = {
+                        column: normalized_value(value) for column, value in row.items()
+                    }
+                    self._rows.setdefault(record["partnumber"], []).append(record)
+                    self.high_water = max(self.high_water, record["itempk"])
+
+            first_load = not self.ready.is_set()
+            self.ready.set()
+
+        if first_load or rows:
+            LOGGER.info(
+                f"Item catalog (ItemTypeFK {self.item_type_fk}): {len(rows)} rows fetched, {len(self)} held."
+            )
+        return len(rows)
+
+    def find(self, item_data: Dict[str, Any]) -> Optional[int]:
+        """
+        Returns the lowest ItemPK of a held row whose columns all equal `item_data`
+        (compared like SQL Server does), or None if the catalog cannot tell.
+        """
+        if not self.ready.is_set() or not item_data:
+            return None
+
+        wanted = {column.lower(): value for column, value in item_data.items()}
+        if (
+            normalized_value(wanted.get("itemtypefk")) != self.item_type_fk
+            or not wanted.get("partnumber")
+            or any(value is None for value in wanted.values())  # `= NULL` never matches
+            or not wanted.keys() <= self._known_columns
+        ):
+            return None
+
+        attributes = [(column, normalized_value(value)) for column, value in wanted.items()]
+        with self.lock:
+            matches = [
+                record["itempk"]
+                for record in self._rows.get(normalized_value(wanted["partnumber"]), ())
+                if all(record[column] == value for column, value in attributes)
+            ]
+            if matches:
+                self.hits += 1
+
+        return min(matches) if matches else None
+
+    def forget_changed(self, item_pk: int, values: Dict[str, Any]) -> None:
+        """Drops a held row when an update changes one of the held columns."""
+        if not {column.lower() for column in values} & self._known_columns:
+            return
+
+        with self.lock:
+            for part_number, records in list(self._rows.items()):
+                kept = [record for record in records if record["itempk"] != item_pk]
+                if len(kept) != len(records):
+                    self._rows[part_number] = kept
+
+    def clear(self) -> None:
+        """Forgets every row; the next `refresh` loads the catalog again."""
+        with self.refresh_lock, self.lock:
+            self._rows = {}
+            self.high_water = 0
+            self.ready.clear()
+
+
+@with_db_conn()
+def _fetch_items_after(
+    cursor: pyodbc.Cursor, item_type_fk: int, columns: List[str], after_pk: int
+) -> List[Dict[str, Any]]:
+    """Item rows of one ItemTypeFK with an ItemPK above `after_pk`, keyed by lowercase column."""
+    selected = ", ".join(["ItemPK"] + columns)
+    cursor.execute(
+        f"SELECT {selected} FROM Item WHERE ItemTypeFK = ? AND ItemPK > ? ORDER BY ItemPK",
+        (item_type_fk, after_pk),
+    )
+    names = [description[0].lower() for description in cursor.description]
+
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+OUTSIDE_PROCESSING_ITEMS = ItemCatalog(OUTSIDE_PROCESSING_TYPE, OUTSIDE_PROCESSING_COLUMNS)
+
+
+def find_item(item_data: Dict[str, Any]) -> Optional[int]:
+    """The ItemPK of an item held by a catalog, or None if it has to be looked up."""
+    return OUTSIDE_PROCESSING_ITEMS.find(item_data)
+
+
+def forget_changed(item_pk: int, values: Dict[str, Any]) -> None:
+    OUTSIDE_PROCESSING_ITEMS.forget_changed(item_pk, values)
@@ -0,0 +1,319 @@
+import os
+import json
+import math
+import time
+import datetime
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from base_logger import getlogger, LOG_FILE
+
+
+LOGGER = getlogger("MT Stats")
+
+_active_reports: List["QueryReport"] = []
+_active_lock = threading.Lock()
+_local = threading.local()
+
+
+class CallRecord:
+    """
+    Timings and counters for a single `with_db_conn` call.
+
+    `total_s` includes the calls made from inside this one; `self_s` does not, so
+    summing `self_s` over nested calls counts every second once.
+    """
+
+    __slots__ = (
+        "function",
+        "started",
+        "connect_s",
+        "execute_s",
+        "total_s",
+        "nested_s",
+        "statements",
+        "rows",
+        "connections_opened",
+        "failed",
+        "nested",
+    )
+
+    def __init__(self, function: str, nested: bool = False):
+        self.function = function
+        self.started = time.perf_counter()
+        self.connect_s = 0.0
+        self.execute_s = 0.0
+        self.total_s = 0.0
+        self.nested_s = 0.0
+        self.statements = 0
+        self.rows = 0
+        self.connections_opened = 0
+        self.failed = False
+        self.nested = nested
+
+    @property
+    def self_s(self) -> float:
+        return self.total_s - self.nested_s
+
+    def connected(self) -> None:
+        """Marks the end of the connection checkout."""
+        self.connect_s = time.perf_counter() - self.started
+
+    def wrap(self, cursor: Any) -> "InstrumentedCursor":
+        return InstrumentedCursor(cursor, self)
+
+
+class _NullCall:
+    """Stand-in used when no report is active, so the hot path stays untouched."""
+
+    def connected(self) -> None:
+        pass
+
+    def wrap(self, cursor: Any) -> Any:
+        return cursor
+
+
+_NULL_CALL = _NullCall()
+
+
+class InstrumentedCursor:
+    """
+    A thin proxy around a DB-API cursor that counts statements and fetched rows
+    and times every call that goes to the database.
+    """
+
+    __slots__ = ("_cursor", "_record")
+
+    def __init__(self, cursor: Any, record: CallRecord):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_record", record)
+
+    def _timed(self, method: str, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return getattr(self._cursor, method)(*args, **kwargs)
+        finally:
+            self._record.execute_s += time.perf_counter() - start
+
+    def execute(self, *args, **kwargs):
+        self._record.statements += 1
+        self._timed("execute", *args, **kwargs)
+        return self
+
+    def executemany(self, *args, **kwargs):
+        self._record.statements += 1
+        self._timed("executemany", *args, **kwargs)
+        return self
+
+    def fetchone(self):
+        row = self._timed("fetchone")
+        if row is not None:
+            self._record.rows += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._timed("fetchmany", *args)
+        self._record.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed("fetchall")
+        self._record.rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._record.rows += 1
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+
+class QueryReport:
+    """
+    Collects `with_db_conn` call records while active and summarises them.
+
+    :param label: Name written into the report, e.g. the RFQ number.
+    """
+
+    def __init__(self, label: str):
+        self.label = label
+        self.started_at = datetime.datetime.now()
+        self._started = time.perf_counter()
+        self.wall_s = 0.0
+        self.status = "running"
+        self.records: List[CallRecord] = []
+        self._lock = threading.Lock()
+
+    def add(self, record: CallRecord) -> None:
+        with self._lock:
+            self.records.append(record)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Aggregates the records into round trips, time by function and latency percentiles.
+
+        Round trips are statements executed (commits included) plus new connections
+        opened. `total_ms` is self time, so a call made from inside another one is not
+        counted twice; latency percentiles are of whole calls.
+        """
+        with self._lock:
+            records = list(self.records)
+
+        by_function: Dict[str, List[CallRecord]] = {}
+        for record in records:
+            by_function.setdefault(record.function, []).append(record)
+
+        functions = {
+            name: _summarise(calls)
+            for name, calls in sorted(
+                by_function.items(),
+                key=lambda item: sum(r.self_s for r in item[1]),
+                reverse=True,
+            )
+        }
+
+        return {
+            "label": self.label,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "wall_ms": round(self.wall_s * 1000, 3),
+            "total_round_trips": sum(r.statements + r.connections_opened for r in records),
+            **_summarise(records),
+            "functions": functions,
+        }
+
+    def write(self, directory: Optional[str] = None) -> str:
+        """
+        Writes the summary as JSON next to the log file.
+
+        :param directory: Folder to write to, defaults to the folder of `LOG_FILE`.
+        :return: Path of the written report.
+        """
+        directory = directory if directory is not None else os.path.dirname(LOG_FILE)
+        safe_label = "".join(c if c.isalnum() or c in "-_" else "_" for c in self.label)
+        filename = (
+            f"RFQ_GEN_queries_{safe_label}_{self.started_at:%Y%m%d_%H%M%S}.json"
+        )
+        path = os.path.join(directory, filename)
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+        return path
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _summarise(records: List[CallRecord]) -> Dict[str, Any]:
+    latencies = sorted(r.total_s for r in records)
+    return {
+        "calls": len(records),
+        "nested_calls": sum(1 for r in records if r.nested),
+        "failed_calls": sum(1 for r in records if r.failed),
+        "statements": sum(r.statements for r in records),
+        "connections_opened": sum(r.connections_opened for r in records),
+        "rows_fetched": sum(r.rows for r in records),
+        "total_ms": round(sum(r.self_s for r in records) * 1000, 3),
+        "connect_ms": round(sum(r.connect_s for r in records) * 1000, 3),
+        "execute_ms": round(sum(r.execute_s for r in records) * 1000, 3),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 3),
+    }
+
+
+@contextmanager
+def track_call(function: str) -> Iterator[Any]:
+    """
+    Records one `with_db_conn` call into every active report.
+
+    Yields an object with `connected()` and `wrap(cursor)`; when no report is
+    active it is a no-op that hands the cursor back unchanged.
+    """
+    if not _active_reports:
+        yield _NULL_CALL
+        return
+
+    parent = getattr(_local, "call", None)
+    record = CallRecord(function, nested=parent is not None)
+    _local.call = record
+    try:
+        yield record
+    except BaseException:
+        record.failed = True
+        raise
+    finally:
+        _local.call = parent
+        record.total_s = time.perf_counter() - record.started
+        if parent is not None:
+            parent.nested_s += record.total_s
+        with _active_lock:
+            reports = list(_active_reports)
+        for report in reports:
+            report.add(record)
+
+
+def commit(conn: Any) -> None:
+    """
+    Commits `conn`, recorded in every active report as a one-statement "commit" call,
+    since each commit is a round trip of its own.
+    """
+    with track_call("commit") as call:
+        call.connected()
+        conn.commit()
+        if call is not _NULL_CALL:
+            call.statements += 1
+
+
+def note_connection_opened() -> None:
+    """Counts a freshly opened connection against the call currently being tracked."""
+    record = getattr(_local, "call", None)
+    if record is not None:
+        record.connections_opened += 1
+
+
+@contextmanager
+def query_report(label: str, write: bool = True) -> Iterator[QueryReport]:
+    """
+    Collects every `with_db_conn` call made, on any thread, while the block runs.
+
+    On exit the report is written as JSON next to the log (see `QueryReport.write`),
+    whether the block succeeded or not. The label can be changed inside the block,
+    e.g. once the RFQ number is known.
+
+    :param label: Name of the report.
+    :param write: If False, the report is only kept in memory.
+    """
+    report = QueryReport(label)
+    with _active_lock:
+        _active_reports.append(report)
+
+    try:
+        yield report
+        report.status = "ok"
+    except BaseException:
+        report.status = "failed"
+        raise
+    finally:
+        report.wall_s = time.perf_counter() - report._started
+        with _active_lock:
+            _active_reports.remove(report)
+
+        if write:
+            try:
+                path = report.write()
+                LOGGER.info(f"Query report written to {path}")
+            except OSError as e:
+                LOGGER.warning(f"Could not write query report: {e}")
@@ -1,13 +1,294 @@
-from mie_trak_api.utils import with_db_conn, create_pydantic_model
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional, Set, Tuple, Type
+from pydantic import BaseModel
+from mie_trak_api import catalog, item_index
+from mie_trak_api.utils import (
+    with_db_conn,
+    after_commit,
+    transaction_state,
+    chunked,
+    create_pydantic_model,
+    insert_if_absent,
+    insert_many_returning,
+    insert_returning_pk,
+    load_schema_artifact,
+    lock_resource,
+    max_number,
+    normalized_value,
+)
 from base_logger import getlogger
 import pyodbc
 
 
 LOGGER = getlogger("MT Item")
 
-item_model = create_pydantic_model("item")
+# Part numbers per `IN` list when items are resolved in bulk.
+ITEM_LOOKUP_CHUNK_SIZE = 500
 
+TOOLING_PREFIX = "05-"
+# Server lock every RFQ Gen session takes before picking a tooling number.
+TOOLING_LOCK = "RFQ_Gen tooling numbers"
+# Taken numbers `check_and_create_tooling` skips before giving up.
+TOOLING_ALLOCATION_RETRIES = 5
 
+
+@functools.cache
+def get_item_model() -> Type[BaseModel]:
+    """
+    Returns the Pydantic model used to validate new Item rows.
+
+    The model is built on first use rather than at import, so importing this module
+    never touches the database. It is built from the prebuilt `item` schema artifact
+    when one is shipped, and from the (cached) live schema otherwise.
+    """
+    return create_pydantic_model("item", schema=load_schema_artifact("item"))
+
+
+def __getattr__(name):
+    # `item_model` used to be built at import time; keep it reachable lazily.
+    if name == "item_model":
+        return get_item_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _ItemMemo:
+    """
+    ItemPKs resolved during one `memoized_items` block, keyed on normalized attributes.
+
+    Entries put inside a transaction are only seen by that transaction until it
+    commits, and are dropped if it rolls back.
+    """
+
+    __slots__ = ("pks", "keys_by_pk", "hits", "lock")
+
+    def __init__(self):
+        self.pks: Dict[Tuple, int] = {}
+        self.keys_by_pk: Dict[int, Set[Tuple]] = {}
+        self.hits = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[int]:
+        with self.lock:
+            item_pk = self._pending().get(key) or self.pks.get(key)
+            if item_pk is not None:
+                self.hits += 1
+            return item_pk
+
+    def put(self, key: Tuple, item_pk: int) -> None:
+        state = transaction_state()
+        if state is None:
+            self._publish({key: item_pk})
+            return
+
+        with self.lock:
+            pending = state.get(self)
+            if pending is None:
+                pending = state[self] = {}
+                after_commit(functools.partial(self._publish, pending))
+            pending[key] = item_pk
+
+    def forget_changed(self, item_pk: int, values: Dict[str, Any]) -> None:
+        """Drops the entries of an updated item whose attributes no longer match."""
+        changed = dict(_normalized(values))
+
+        def changes(key: Tuple) -> bool:
+            attributes = dict(key[1])
+            return any(
+                column in attributes and attributes[column] != value
+                for column, value in changed.items()
+            )
+
+        with self.lock:
+            pending = self._pending()
+            for key in [key for key, pk in pending.items() if pk == item_pk]:
+                if changes(key):
+                    del pending[key]
+            for key in list(self.keys_by_pk.get(item_pk, ())):
+                if changes(key):
+                    del self.pks[key]
+                    self.keys_by_pk[item_pk].discard(key)
+
+    def _pending(self) -> Dict[Tuple, int]:
+        """Entries put by the current transaction, not yet committed. Caller holds the lock."""
+        state = transaction_state()
+        return state.get(self, {}) if state is not None else {}
+
+    def _publish(self, entries: Dict[Tuple, int]) -> None:
+        with self.lock:
+            for key, item_pk in entries.items():
+                self.pks[key] = item_pk
+                self.keys_by_pk.setdefault(item_pk, set()).add(key)
+
+
+_active_memo: Optional[_ItemMemo] = None
+_active_memo_lock = threading.Lock()
+
+
+@contextmanager
+def memoized_items() -> Iterator[_ItemMemo]:
+    """
+    Remembers the ItemPK returned by every `get_or_create_item` and
+    `check_and_create_tooling` call made while the block runs, on any thread.
+
+    Repeated calls with the same attributes (compared case-insensitively and ignoring
+    trailing spaces, like SQL Server does) are answered without a connection or query,
+    so a material shared by 200 parts is looked up once. Calls with a None attribute
+    are never remembered, since `Column = NULL` matches nothing and a new item is
+    created each time.
+
+    A PK found or inserted inside a transaction is only shared with other threads
+    once that transaction commits, and forgotten if it rolls back, so no thread is
+    handed a row it cannot see or that never existed. `update_item` and
+    `insert_part_details_in_item` forget entries whose attributes they change.
+    Nested blocks share the outermost memo.
+
+    :return: The memo.
+    """
+    global _active_memo
+
+    with _active_memo_lock:
+        if _active_memo is not None:
+            owner = False
+        else:
+            _active_memo = _ItemMemo()
+            owner = True
+        memo = _active_memo
+
+    try:
+        yield memo
+    finally:
+        if owner:
+            with _active_memo_lock:
+                memo, _active_memo = _active_memo, None
+            LOGGER.info(
+                f"Item memo: {memo.hits} repeated lookups skipped, {len(memo.pks)} items remembered."
+            )
+
+
+def _normalized(item_data: Dict[str, Any]) -> FrozenSet[Tuple[str, Any]]:
+    return frozenset(
+        (column.lower(), normalized_value(value)) for column, value in item_data.items()
+    )
+
+
+def _memoized(*arg_columns: str):
+    """
+    Serves repeated calls of an ItemPK resolver from the active `memoized_items` block.
+
+    :param arg_columns: Item columns of the positional arguments, in order.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            memo = _active_memo
+            item_data = {**dict(zip(arg_columns, args)), **kwargs}
+            if (
+                memo is None
+                or len(args) > len(arg_columns)
+                or any(value is None for value in item_data.values())
+            ):
+                return func(*args, **kwargs)
+
+            key = (func.__name__, _normalized(item_data))
+            item_pk = memo.get(key)
+            if item_pk is None:
+                item_pk = func(*args, **kwargs)
+                memo.put(key, item_pk)
+
+            return item_pk
+
+        return wrapper
+
+    return decorator
+
+
+def _forget_changed(item_pk: int, values: Dict[str, Any]) -> None:
+    memo = _active_memo
+    if memo is not None:
+        memo.forget_changed(item_pk, values)
+    catalog.forget_changed(item_pk, values)
+    item_index.forget_changed(item_pk, values)
+    # a `remember` queued earlier in this transaction runs on commit and would
+    # bring the old attributes back, so forget them again after it
+    after_commit(functools.partial(item_index.forget_changed, item_pk, dict(values)))
+
+
+def _find_indexed(cursor: pyodbc.Cursor, items: List[Dict[str, Any]]) -> List[Optional[int]]:
+    """
+    The ItemPK `item_index` holds for each item, confirmed on the server, or None.
+
+    The index never sees deletions, nor edits that leave LastAccess alone, so every
+    hit is read back with one `ItemPK IN` query per chunk. A hit whose row is gone or
+    no longer has the item's attributes is dropped from the index and left to the
+    usual lookup. Without a hit no query is made.
+    """
+    hits = [item_index.find_item(data) for data in items]
+    hit_pks = list(dict.fromkeys(item_pk for item_pk in hits if item_pk is not None))
+    if not hit_pks:
+        return hits
+
+    columns = {
+        column.lower(): column
+        for data, item_pk in zip(items, hits)
+        if item_pk is not None
+        for column in data
+    }
+    selected = ", ".join(["ItemPK"] + [c for c in columns.values() if c.lower() != "itempk"])
+    rows: Dict[int, Dict[str, Any]] = {}
+    for chunk in chunked(hit_pks, ITEM_LOOKUP_CHUNK_SIZE):
+        placeholders = ", ".join(["?"] * len(chunk))
+        cursor.execute(
+            f"SELECT {selected} FROM Item WHERE ItemPK IN ({placeholders})", tuple(chunk)
+        )
+        names = [description[0].lower() for description in cursor.description]
+        for row in cursor.fetchall():
+            record = dict(zip(names, row))
+            rows[record["itempk"]] = record
+
+    stale = set()
+    for index, (data, item_pk) in enumerate(zip(items, hits)):
+        record = rows.get(item_pk)
+        if item_pk is not None and (
+            record is None
+            or any(
+                normalized_value(record[column]) != value for column, value in _normalized(data)
+            )
+        ):
+            stale.add(item_pk)
+            hits[index] = None
+
+    if stale:
+        LOGGER.warning(f"Item index: {len(stale)} stale items dropped: {sorted(stale)}")
+        item_index.forget(sorted(stale))
+    return hits
+
+
+def _remember_after_commit(items: List[Tuple[int, Dict[str, Any]]]) -> None:
+    """Writes items back to `item_index` once they are committed on the server."""
+    after_commit(functools.partial(item_index.remember, items))
+
+
+def _answered_locally(func):
+    """Answers lookups of items held by `catalog` without opening a connection."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **item_data):
+        if not args:
+            item_pk = catalog.find_item(item_data)
+            if item_pk is not None:
+                LOGGER.debug(f"PartNumber: {item_data.get('PartNumber')} found locally.")
+                return item_pk
+
+        return func(*args, **item_data)
+
+    return wrapper
+
+
+@_memoized()
+@_answered_locally
 @with_db_conn(commit=True)
 def get_or_create_item(cursor: pyodbc.Cursor, **item_data):
     """
@@ -21,41 +302,25 @@ def get_or_create_item(cursor: pyodbc.Cursor, **item_data):
 
     part_number = item_data.get("PartNumber", "")
 
-    result = get_item(cursor, **item_data)  # more accurate search
+    # a confirmed `item_index` hit is one ItemPK lookup instead of the search below
+    result = _find_indexed(cursor, [item_data])[0] or get_item(cursor, **item_data)
 
     if result:
         LOGGER.info(f"PartNumber: {part_number} found. (PK: {result})")
+        _remember_after_commit([(result, item_data)])
         return result
 
-    validated_data = item_model(**item_data).model_dump(exclude_unset=True)
-
-    cursor.execute("INSERT INTO ItemInventory (QuantityOnHand) Values (0.000)")
-    cursor.execute("SELECT SCOPE_IDENTITY()")
-    item_inventory_pk = cursor.fetchone()
-
-    if not item_inventory_pk:
-        raise ValueError("ItemPK was not returned.")
+    validated_data = get_item_model()(**item_data).model_dump(exclude_unset=True)
 
-    validated_data["ItemInventoryFK"] = int(item_inventory_pk[0])
-
-    columns = ", ".join(validated_data.keys())
-    placeholders = ", ".join(["?"] * len(validated_data))
-    values = tuple(validated_data.values())
-
-    query = f"INSERT INTO Item ({columns}) VALUES ({placeholders})"
+    validated_data["ItemInventoryFK"] = insert_returning_pk(
+        cursor, "ItemInventory", {"QuantityOnHand": 0.000}, "ItemInventoryPK"
+    )
 
-    cursor.execute(query, values)
-    cursor.execute("SELECT IDENT_CURRENT('Item')")
-    result = cursor.fetchone()
+    item_pk = insert_returning_pk(cursor, "Item", validated_data, "ItemPK")
+    LOGGER.info(f"Inserted new ItemPK: {item_pk}")
+    _remember_after_commit([(item_pk, item_data)])
 
-    if result and result[0]:
-        LOGGER.info(f"Inserted new ItemPK: {result[0]}")
-        return result[0]
-    else:
-        LOGGER.critical("SELECT IDENT failed in get_or_create_item")
-        raise ValueError(
-            "`SELECT SCOPE` did not return anything. Item might not be inserted."
-        )
+    return item_pk
 
 
 def get_item(cursor: pyodbc.Cursor, **item_data) -> int | None:
@@ -81,6 +346,153 @@ def get_item(cursor: pyodbc.Cursor, **item_data) -> int | None:
     return result[0] if result else None
 
 
+@with_db_conn(commit=True)
+def resolve_items(cursor: pyodbc.Cursor, items: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    The bulk version of `get_or_create_item`: resolves a whole list of items in a
+    handful of round trips instead of one or more per item.
+
+    Every PartNumber is looked up with chunked `IN` lists, each item is matched to an
+    existing row with all of its attributes equal (compared like SQL Server does, and
+    to the lowest ItemPK when several match), and the missing ones are inserted with
+    batched multi-row INSERTs. As with `get_or_create_item`, an item with a None
+    attribute never matches and is always inserted; identical missing items are
+    inserted once.
+
+    Items held by `catalog` are answered from it and not looked up; `item_index`
+    hits are only confirmed by ItemPK (see `_find_indexed`). The others are written
+    back to `item_index` once committed. Inside a
+    `memoized_items` block the results are remembered, so later
+    `get_or_create_item` calls for the same items need no query.
+
+    :param cursor: Database cursor for executing queries.
+    :param items: Column-value pairs of every item, each with a "PartNumber".
+    :return: PartNumber -> ItemPK; if several items share a PartNumber, the first wins.
+    :raises ValueError: If an item has no PartNumber.
+    """
+    if any(not data.get("PartNumber") for data in items):
+        raise ValueError("Every item needs a PartNumber to be resolved in bulk.")
+
+    wanted = [_normalized(data) for data in items]
+    catalogued = [catalog.find_item(data) for data in items]
+    indexed = iter(
+        _find_indexed(
+            cursor, [data for data, item_pk in zip(items, catalogued) if item_pk is None]
+        )
+    )
+    catalogued = [item_pk if item_pk is not None else next(indexed) for item_pk in catalogued]
+    to_fetch = [data for data, item_pk in zip(items, catalogued) if item_pk is None]
+    candidates = _fetch_items_by_part_number(
+        cursor,
+        [data["PartNumber"] for data in to_fetch],
+        list({column.lower(): column for data in to_fetch for column in data}.values()),
+    )
+
+    item_pks: List[Optional[int]] = []
+    missing: Dict[Any, List[int]] = {}
+    for index, (data, attributes) in enumerate(zip(items, wanted)):
+        if catalogued[index] is not None:
+            item_pks.append(catalogued[index])
+            continue
+
+        if any(value is None for value in data.values()):
+            missing[("always new", index)] = [index]
+            item_pks.append(None)
+            continue
+
+        matches = [
+            record["itempk"]
+            for record in candidates.get(normalized_value(data["PartNumber"]), ())
+            if all(normalized_value(record[column]) == value for column, value in attributes)
+        ]
+        item_pks.append(min(matches) if matches else None)
+        if not matches:
+            missing.setdefault(attributes, []).append(index)
+
+    if missing:
+        new_pks = _insert_items(cursor, [items[indexes[0]] for indexes in missing.values()])
+        for indexes, item_pk in zip(missing.values(), new_pks):
+            for index in indexes:
+                item_pks[index] = item_pk
+        LOGGER.info(f"Inserted {len(new_pks)} new items in bulk.")
+
+    memo = _active_memo
+    result: Dict[str, int] = {}
+    for data, attributes, item_pk in zip(items, wanted, item_pks):
+        result.setdefault(data["PartNumber"], item_pk)
+        if memo is not None and all(value is not None for value in data.values()):
+            memo.put(("get_or_create_item", attributes), item_pk)
+
+    _remember_after_commit(
+        [
+            (item_pk, data)
+            for data, item_pk, local_pk in zip(items, item_pks, catalogued)
+            if local_pk is None
+        ]
+    )
+
+    return result
+
+
+def _fetch_items_by_part_number(
+    cursor: pyodbc.Cursor, part_numbers: List[str], columns: List[str]
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Returns every Item row with one of the part numbers, keyed by normalized PartNumber."""
+    unique_part_numbers = list(dict.fromkeys(part_numbers))
+    selected = ", ".join(["ItemPK"] + [c for c in columns if c.lower() != "itempk"])
+    candidates: Dict[str, List[Dict[str, Any]]] = {}
+
+    for chunk in chunked(unique_part_numbers, ITEM_LOOKUP_CHUNK_SIZE):
+        placeholders = ", ".join(["?"] * len(chunk))
+        cursor.execute(
+            f"SELECT {selected} FROM Item WHERE PartNumber IN ({placeholders})",
+            tuple(chunk),
+        )
+        names = [description[0].lower() for description in cursor.description]
+        for row in cursor.fetchall():
+            record = dict(zip(names, row))
+            key = normalized_value(record["partnumber"])
+            candidates.setdefault(key, []).append(record)
+
+    return candidates
+
+
+def _insert_items(cursor: pyodbc.Cursor, items: List[Dict[str, Any]]) -> List[int]:
+    """Inserts the items, each with its own ItemInventory row, and returns their PKs in order."""
+    model = get_item_model()
+    validated = [model(**data).model_dump(exclude_unset=True) for data in items]
+
+    inventory_pks = [
+        row[0]
+        for row in insert_many_returning(
+            cursor,
+            "ItemInventory",
+            ["QuantityOnHand"],
+            [(0.000,)] * len(validated),
+            ["ItemInventoryPK"],
+        )
+    ]
+
+    # rows are inserted per column set; the inventory FK tells the returned rows apart.
+    by_columns: Dict[Tuple[str, ...], List[int]] = {}
+    for index, data in enumerate(validated):
+        data["ItemInventoryFK"] = inventory_pks[index]
+        by_columns.setdefault(tuple(data), []).append(index)
+
+    item_pk_by_inventory = {}
+    for columns, indexes in by_columns.items():
+        returned = insert_many_returning(
+            cursor,
+            "Item",
+            list(columns),
+            [tuple(validated[index].values()) for index in indexes],
+            ["ItemPK", "ItemInventoryFK"],
+        )
+        item_pk_by_inventory.update({inventory: item_pk for item_pk, inventory in returned})
+
+    return [item_pk_by_inventory[inventory_pk] for inventory_pk in inventory_pks]
+
+
 @with_db_conn(commit=True)
 def update_item(cursor, itempk: int, **item_data) -> None:
     if not item_data:
@@ -91,12 +503,13 @@ def update_item(cursor, itempk: int, **item_data) -> None:
 
     LOGGER.debug(query)
     cursor.execute(query)
+    _forget_changed(itempk, item_data)
     LOGGER.info(f"Updated ItemPK: {itempk}.")
 
 
 @with_db_conn(commit=True)
 def get_or_create_tooling(cursor: pyodbc.Cursor, description) -> int:
-    search_query = f"Select ItemPK from Item Where Description='{description}' AND PartNumber LIKE '05-%'"
+    search_query = f"Select ItemPK from Item Where Description='{description}' AND PartNumber LIKE '{TOOLING_PREFIX}%'"
     return 0
 
 
@@ -154,28 +567,50 @@ def insert_part_details_in_item(
     query = f"UPDATE Item SET {set_clause} WHERE ItemPK = ?"
 
     cursor.execute(query, tuple(update_values.values()) + (item_pk,))
+    _forget_changed(item_pk, update_values)
 
     LOGGER.info(
         f"Updated item {item_pk} ({'Material' if item_type == 'Material' else 'Standard'})."
     )
 
 
+def next_tooling_number(cursor: pyodbc.Cursor) -> int:
+    """
+    Returns the number after the largest "05-N" tooling number on the server,
+    computed there with one MAX query.
+
+    The `TOOLING_LOCK` server lock is taken first and held until the transaction
+    ends, so RFQ Gen sessions take turns between this query and the insert of the
+    new item, and never pick the same number. Sessions that do not take the lock
+    (e.g. MIE Trak itself) are caught by the guarded insert.
+    """
+    lock_resource(cursor, TOOLING_LOCK)
+    return max_number(cursor, "Item", "PartNumber", TOOLING_PREFIX) + 1
+
+
+@_memoized("Description")
 @with_db_conn(commit=True)
 def check_and_create_tooling(cursor: pyodbc.Cursor, user_des: str):
     """
     Checks if a tooling item with the given description exists in the database.
-    If it does not exist, it creates a new tooling item with a unique PartNumber.
+    If it does not exist, it creates a new tooling item with the next "05-N"
+    PartNumber from `next_tooling_number`; the insert is skipped and retried with
+    the next number if a session outside the tooling lock took it first.
+
+    The tooling lock and the insert's key-range lock are held until commit, so call
+    it in a short transaction of its own rather than inside a long one.
 
     :param cursor: Database cursor for executing queries.
     :param user_des: The description of the tooling item.
     :return: The primary key (ItemPK) of the existing or newly created tooling item.
+    :raises RuntimeError: If every number tried was taken by another session.
     """
 
     search_query = """
         SELECT ItemPK FROM Item 
-        WHERE Description = ? AND PartNumber LIKE '05-%'
+        WHERE Description = ? AND PartNumber LIKE ?
     """
-    cursor.execute(search_query, (user_des,))
+    cursor.execute(search_query, (user_des, f"{TOOLING_PREFIX}%"))
     result = cursor.fetchone()
 
     if result:
@@ -184,40 +619,38 @@ def check_and_create_tooling(cursor: pyodbc.Cursor, user_des: str):
         )
         return result[0]
 
-    part_name_query = """
-        SELECT PartNumber FROM Item 
-        WHERE PartNumber LIKE '05-%' AND PartNumber LIKE '%[0-9]'
-    """
-    cursor.execute(part_name_query)
-    result = cursor.fetchall()
-
-    numbers = []
-    for part in result:
-        try:
-            number_str = part[0].split("05-")[1]
-            numbers.append(int(number_str))
-        except (IndexError, ValueError):
-            continue  # Skip malformed PartNumbers
-
-    new_part_number = f"05-{max(numbers) + 1}" if numbers else "05-1"
+    tooling_dict = {
+        "Description": user_des,
+        "CalculationTypeFK": 12,
+        "PurchaseGeneralLedgerAccountFK": 130,
+        "SalesCogsAccountFK": 130,
+        "MPSItem": 0,
+        "ForecastOnMRP": 0,
+        "MPSOnMRP": 0,
+        "ServiceItem": 0,
+        "ShipLoose": 0,
+        "BulkShip": 0,
+        "CertificationsRequiredBySupplier": 1,
+        "ItemTypeFK": 3,
+    }
 
-    insert_query = """
-        INSERT INTO Item 
-        (PartNumber, Description, CalculationTypeFK, PurchaseGeneralLedgerAccountFK, SalesCogsAccountFK, 
-        MPSItem, ForecastOnMRP, MPSOnMRP, ServiceItem, ShipLoose, BulkShip, CertificationsRequiredBySupplier, ItemTypeFK)
-        VALUES (?, ?, 12, 130, 130, 0, 0, 0, 0, 0, 0, 1, 3)
-    """
-    cursor.execute(insert_query, (new_part_number, user_des))
+    for _ in range(TOOLING_ALLOCATION_RETRIES):
+        new_part_number = f"{TOOLING_PREFIX}{next_tooling_number(cursor)}"
+        item_pk = insert_if_absent(
+            cursor,
+            "Item",
+            {"PartNumber": new_part_number, **tooling_dict},
+            ["PartNumber"],
+            "ItemPK",
+        )
+        if item_pk is not None:
+            LOGGER.info(
+                f"New tooling created: ItemPK={item_pk}, PartNumber='{new_part_number}', Description='{user_des}'"
+            )
+            return item_pk
 
-    cursor.execute("SELECT IDENT_CURRENT('Item')")
-    result = cursor.fetchone()
+        LOGGER.warning(f"Tooling number {new_part_number} was taken, retrying.")
 
-    if result and result[0]:
-        LOGGER.info(
-            f"New tooling created: ItemPK={result[0]}, PartNumber='{new_part_number}', Description='{user_des}'"
-        )
-        return result[0]
-    else:
-        raise ValueError(
-            f"Failed to retrieve ItemPK after inserting new tooling: PartNumber='{new_part_number}', Description='{user_des}'"
-        )
+    raise RuntimeError(
+        f"No free tooling number after {TOOLING_ALLOCATION_RETRIES} attempts for '{user_des}'."
+    )
@@ -0,0 +1,306 @@
+import datetime
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import pyodbc
+from mie_trak_api import utils
+from mie_trak_api.utils import normalized_value, with_db_conn
+from base_logger import getlogger
+
+
+LOGGER = getlogger("MT Item Index")
+
+INDEX_VERSION = 1
+# Item columns `get_or_create_item` is called with, besides PartNumber.
+INDEX_COLUMNS = [
+    "Description",
+    "ItemTypeFK",
+    "Purchase",
+    "ServiceItem",
+    "ManufacturedItem",
+    "Inventoriable",
+    "MPSItem",
+    "ForecastOnMRP",
+    "MPSOnMRP",
+    "ShipLoose",
+    "BulkShip",
+    "CertificationsRequiredBySupplier",
+    "CanNotCreateWorkOrder",
+    "CanNotInvoice",
+    "PurchaseGeneralLedgerAccountFK",
+    "SalesCogsAccountFK",
+    "CalculationTypeFK",
+    "Comment",
+    "PurchaseOrderComment",
+]
+
+
+class ItemIndex:
+    """
+    A local, disk-backed (SQLite) copy of the Item columns items are looked up by,
+    so `get_or_create_item` can find existing items without the network.
+
+    The index is kept in the cache directory, one file per database, and survives
+    restarts. `sync` brings it up to date incrementally: it only fetches the rows
+    with an ItemPK or LastAccess above the highest ones already seen. Items found
+    or created by `get_or_create_item` are written back once their transaction
+    commits.
+
+    Values are stored normalized (see `utils.normalized_value`), so lookups compare
+    like SQL Server does. A lookup the index cannot answer returns None and the
+    caller asks the database. `sync` does not notice items deleted on the server, nor
+    edits that leave LastAccess alone, so a hit is only a candidate: `item` reads it
+    back by ItemPK before using it and calls `forget` when it is stale.
+    """
+
+    def __init__(self, columns: List[str]):
+        self.columns = [column.lower() for column in columns]
+        self._known_columns = set(self.columns) | {"partnumber"}
+        self.path: Optional[str] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self.ready = threading.Event()
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+        self.hits = 0
+
+    def open(self, path: Optional[str] = None) -> None:
+        """
+        Opens (or creates) the index file; it is usable right away if it was synced before.
+
+        :param path: Index file; defaults to one per backend and DSN in the cache directory.
+        """
+        path = path or utils.cache_path(
+            f"item_index_{utils.BACKEND.name}_{utils.conn_type.lower()}.sqlite3"
+        )
+        conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+
+        column_defs = ", ".join(self.columns)
+        conn.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value);
+            CREATE TABLE IF NOT EXISTS item (
+                itempk INTEGER PRIMARY KEY, partnumber TEXT NOT NULL, {column_defs}
+            );
+            CREATE INDEX IF NOT EXISTS ix_item_partnumber ON item (partnumber);
+            """
+        )
+        state = dict(conn.execute("SELECT key, value FROM state").fetchall())
+        if state.get("version") != INDEX_VERSION or state.get("columns") != ",".join(
+            self.columns
+        ):
+            conn.executescript("DELETE FROM item; DELETE FROM state;")
+            conn.executemany(
+                "INSERT INTO state VALUES (?, ?)",
+                [("version", INDEX_VERSION), ("columns", ",".join(self.columns))],
+            )
+            state = {}
+
+        with self.lock:
+            self.close()
+            self.path, self._conn = path, conn
+            if state.get("high_pk"):
+                self.ready.set()
+
+    def open_in_background(self) -> threading.Thread:
+        """Opens and syncs the index on a daemon thread and returns it."""
+
+        def run():
+            try:
+                self.open()
+                self.sync()
+            except (RuntimeError, sqlite3.Error) as err:  # lookups use the database
+                LOGGER.warning(f"Item index not synced: {err}")
+
+        thread = threading.Thread(target=run, name="item-index", daemon=True)
+        thread.start()
+        return thread
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+        self.ready.clear()
+
+    def sync(self) -> int:
+        """
+        Fetches the Item rows added or changed since the last sync (all of them the
+        first time) into the index. Deleted rows, and rows edited without a newer
+        LastAccess, are not seen.
+
+        :return: The number of rows fetched.
+        """
+        if self._conn is None:
+            return 0
+
+        with self.sync_lock:
+            state = dict(self._conn.execute("SELECT key, value FROM state").fetchall())
+            high_pk = state.get("high_pk") or 0
+            high_access = state.get("high_access")
+
+            rows = _fetch_changed_items(self.columns, high_pk, high_access)
+            for row in rows:
+                high_pk = max(high_pk, row["itempk"])
+                access = _as_text(row.pop("lastaccess"))
+                if access is not None and (high_access is None or access > high_access):
+                    high_access = access
+
+            with self.lock:
+                self._upsert([_stored(row) for row in rows])
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO state VALUES (?, ?)",
+                    [("high_pk", high_pk), ("high_access", high_access)],
+                )
+            self.ready.set()
+
+        LOGGER.info(f"Item index: {len(rows)} rows synced, up to ItemPK {high_pk}.")
+        return len(rows)
+
+    def find(self, item_data: Dict[str, Any]) -> Optional[int]:
+        """
+        Returns the lowest ItemPK of an indexed item whose columns all equal
+        `item_data`, or None if the index cannot tell. The row may have been deleted
+        or edited on the server since.
+        """
+        wanted = {column.lower(): value for column, value in item_data.items()}
+        if (
+            not self.ready.is_set()
+            or not wanted.get("partnumber")
+            or any(value is None for value in wanted.values())  # `= NULL` never matches
+            or not wanted.keys() <= self._known_columns
+        ):
+            return None
+
+        where = " AND ".join(f"{column} = ?" for column in wanted)
+        values = tuple(_stored_value(value) for value in wanted.values())
+        with self.lock:
+            if self._conn is None:
+                return None
+            found = self._conn.execute(
+                f"SELECT MIN(itempk) FROM item WHERE {where}", values
+            ).fetchone()[0]
+            if found is not None:
+                self.hits += 1
+
+        return found
+
+    def remember(self, items: List[Tuple[int, Dict[str, Any]]]) -> None:
+        """
+        Writes the indexed columns of items that exist on the server.
+
+        :param items: (ItemPK, column-value pairs) of every item.
+        """
+        if not self.ready.is_set():
+            return
+
+        rows = []
+        for item_pk, item_data in items:
+            row = {
+                column.lower(): value
+                for column, value in item_data.items()
+                if column.lower() in self._known_columns and value is not None
+            }
+            if "partnumber" in row:
+                rows.append(_stored({"itempk": item_pk, **row}))
+
+        try:
+            with self.lock:
+                if self._conn is not None and rows:
+                    self._upsert(rows)
+        except sqlite3.Error as err:
+            LOGGER.warning(f"Item index not updated: {err}")
+
+    def forget_changed(self, item_pk: int, values: Dict[str, Any]) -> None:
+        """Drops an item when an update changes one of its indexed columns."""
+        if not {column.lower() for column in values} & self._known_columns:
+            return
+
+        with self.lock:
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM item WHERE itempk = ?", (item_pk,))
+
+    def forget(self, item_pks: List[int]) -> None:
+        """Drops items found stale on the server."""
+        with self.lock:
+            if self._conn is not None:
+                self._conn.executemany(
+                    "DELETE FROM item WHERE itempk = ?", [(item_pk,) for item_pk in item_pks]
+                )
+
+    def _upsert(self, rows: List[Dict[str, Any]]) -> None:
+        """Inserts rows, or updates only the given columns of rows already indexed."""
+        by_columns: Dict[tuple, List[tuple]] = {}
+        for row in rows:
+            by_columns.setdefault(tuple(row), []).append(tuple(row.values()))
+
+        self._conn.execute("BEGIN")
+        try:
+            for columns, values in by_columns.items():
+                updates = ", ".join(
+                    f"{column} = excluded.{column}" for column in columns if column != "itempk"
+                )
+                self._conn.executemany(
+                    f"""
+                    INSERT INTO item ({", ".join(columns)})
+                    VALUES ({", ".join(["?"] * len(columns))})
+                    ON CONFLICT (itempk) DO UPDATE SET {updates}
+                    """,
+                    values,
+                )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+
+def _stored_value(value: Any) -> Any:
+    value = normalized_value(value)
+    return int(value) if isinstance(value, bool) else value
+
+
+def _stored(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {column: _stored_value(value) for column, value in row.items()}
+
+
+def _as_text(value: Any) -> Optional[str]:
+    """LastAccess as ODBC canonical text, which compares in time order."""
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    return value
+
+
+@with_db_conn()
+def _fetch_changed_items(
+    cursor: pyodbc.Cursor, columns: List[str], high_pk: int, high_access: Optional[str]
+) -> List[Dict[str, Any]]:
+    """Item rows with an ItemPK or LastAccess above the given marks, keyed by lowercase column."""
+    selected = ", ".join(["ItemPK", "PartNumber", "LastAccess"] + columns)
+    query = f"SELECT {selected} FROM Item WHERE PartNumber IS NOT NULL AND (ItemPK > ?"
+    params: tuple = (high_pk,)
+    if high_access is not None:
+        query += " OR LastAccess > ?"
+        params += (high_access,)
+
+    cursor.execute(query + ")", params)
+    names = [description[0].lower() for description in cursor.description]
+
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+ITEM_INDEX = ItemIndex(INDEX_COLUMNS)
+
+
+def find_item(item_data: Dict[str, Any]) -> Optional[int]:
+    return ITEM_INDEX.find(item_data)
+
+
+def remember(items: List[Tuple[int, Dict[str, Any]]]) -> None:
+    ITEM_INDEX.remember(items)
+
+
+def forget(item_pks: List[int]) -> None:
+    ITEM_INDEX.forget(item_pks)
+
+
+def forget_changed(item_pk: int, values: Dict[str, Any]) -> None:
+    ITEM_INDEX.forget_changed(item_pk, values)
@@ -0,0 +1,205 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+from base_logger import getlogger
+
+
+LOGGER = getlogger("MT Pool")
+
+
+class ConnectionPool:
+    """
+    A small thread-safe pool of database connections.
+
+    Connections are checked out per thread: nested checkouts on the same thread
+    (e.g. a decorated function calling another decorated function) reuse the
+    connection the thread already holds, so a single thread never needs more
+    than one slot. The transaction is only committed or rolled back when the
+    outermost checkout on that thread ends.
+
+    :param connect: Zero-argument callable that opens a new DB-API connection.
+    :param size: Maximum number of connections checked out at the same time.
+    :param idle_timeout: Seconds after which an unused pooled connection is closed.
+    :param ping_after: Connections idle for longer than this many seconds are
+        checked with `liveness_query` before being handed out. 0 checks every time.
+    :param checkout_timeout: Seconds to wait for a free slot before giving up.
+    :param liveness_query: Cheap statement used to check a pooled connection.
+    :param commit: Commits a connection; defaults to `conn.commit()`.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        size: int = 5,
+        idle_timeout: float = 300.0,
+        ping_after: float = 30.0,
+        checkout_timeout: float = 30.0,
+        liveness_query: str = "SELECT 1",
+        commit: Optional[Callable[[Any], None]] = None,
+    ):
+        if size < 1:
+            raise ValueError("Connection pool size must be at least 1.")
+
+        self._connect = connect
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self.checkout_timeout = checkout_timeout
+        self.liveness_query = liveness_query
+        self._commit = commit or (lambda conn: conn.commit())
+
+        self._idle: List[Tuple[Any, float]] = []  # (connection, released_at)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._local = threading.local()
+
+    @contextmanager
+    def connection(self, commit: bool = False) -> Iterator[Any]:
+        """
+        Checks out a connection for the current thread.
+
+        When the outermost checkout on the thread exits without an exception the
+        transaction is committed if any level asked for `commit`, otherwise it is
+        rolled back. On an exception it is rolled back, and the connection is
+        discarded if the rollback itself fails.
+
+        :param commit: If True, commit the transaction when the outermost checkout ends.
+        """
+        held = getattr(self._local, "held", None)
+        if held is not None:
+            held["depth"] += 1
+            held["commit"] = held["commit"] or commit
+            try:
+                yield held["conn"]
+            finally:
+                held["depth"] -= 1
+            return
+
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            raise RuntimeError(
+                f"Timed out after {self.checkout_timeout}s waiting for a database connection."
+            )
+
+        try:
+            conn = self._checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+
+        held = {"conn": conn, "depth": 1, "commit": commit, "after_commit": []}
+        self._local.held = held
+        healthy = True
+        try:
+            yield conn
+            if held["commit"]:
+                self._commit(conn)
+            else:
+                conn.rollback()
+                held["after_commit"].clear()
+        except BaseException:
+            healthy = self._rollback_quietly(conn)
+            raise
+        finally:
+            self._local.held = None
+            self._checkin(conn, healthy)
+            self._slots.release()
+
+        for callback in held["after_commit"]:
+            callback()
+
+    def after_commit(self, callback: Callable[[], Any]) -> None:
+        """
+        Runs `callback` once the current thread's transaction is committed, or right
+        away if the thread holds no connection. It is dropped if the transaction is
+        rolled back.
+        """
+        held = getattr(self._local, "held", None)
+        if held is None:
+            callback()
+        else:
+            held["after_commit"].append(callback)
+
+    def transaction_state(self) -> Optional[dict]:
+        """
+        A dict private to the current thread's transaction, shared by its nested
+        checkouts and discarded when it ends, or None if the thread holds no connection.
+        """
+        held = getattr(self._local, "held", None)
+        return None if held is None else held.setdefault("state", {})
+
+    def close_all(self) -> None:
+        """Closes every idle connection held by the pool."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def _checkout(self) -> Any:
+        """Returns a live pooled connection, or opens a new one."""
+        while True:
+            with self._lock:
+                self._evict_idle()
+                if not self._idle:
+                    break
+                conn, released_at = self._idle.pop()  # most recently used first
+
+            if time.monotonic() - released_at < self.ping_after or self._is_alive(
+                conn
+            ):
+                return conn
+
+            LOGGER.warning("Discarding dead pooled connection.")
+            self._close_quietly(conn)
+
+        LOGGER.debug("Opening new pooled connection.")
+        return self._connect()
+
+    def _checkin(self, conn: Any, healthy: bool) -> None:
+        if not healthy:
+            self._close_quietly(conn)
+            return
+
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+            self._evict_idle()
+
+    def _evict_idle(self) -> None:
+        """Closes connections idle for longer than `idle_timeout`. Caller holds the lock."""
+        now = time.monotonic()
+        keep = []
+        for conn, released_at in self._idle:
+            if now - released_at > self.idle_timeout:
+                self._close_quietly(conn)
+            else:
+                keep.append((conn, released_at))
+        self._idle = keep
+
+    def _is_alive(self, conn: Any) -> bool:
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self.liveness_query)
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _rollback_quietly(conn: Any) -> bool:
+        try:
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn: Any) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -1,10 +1,24 @@
+from typing import Dict, List
+
 import pyodbc
-from mie_trak_api.utils import get_table_schema, with_db_conn
+from mie_trak_api.utils import (
+    chunked,
+    get_table_schema,
+    with_db_conn,
+    insert_returning_pk,
+    insert_select_returning,
+)
 from base_logger import getlogger
 
 
 LOGGER = getlogger("MT Quote")
 SOURCE_QUOTE = 49
+OPERATION_TEMPLATE_QUOTE = 494
+# Each QuotePK is bound twice by the formula variable INSERT; 450 stays under
+# SQLite's 999 parameters.
+FORMULA_VARIABLE_CHUNK_SIZE = 450
+# QuotePKs per `IN` list when quotes are deleted; stays under SQLite's 999 parameters.
+QUOTE_DELETE_CHUNK_SIZE = 900
 
 
 @with_db_conn(commit=True)
@@ -34,30 +48,49 @@ def create_quote_new(
     Raises:
         ValueError: If the database fails to return the primary key for the newly inserted quote.
     """
-    query = """
-        INSERT INTO Quote (CustomerFK, ItemFK, QuoteType, PartNumber, DivisionFK) 
-        VALUES (?, ?, ?, ?, ?);
+    quote_dict = {
+        "CustomerFK": customer_fk,
+        "ItemFK": item_fk,
+        "QuoteType": quote_type,
+        "PartNumber": part_number,
+        "DivisionFK": 1,
+    }
+
+    return insert_returning_pk(cursor, "Quote", quote_dict, "QuotePK")
+
+
+@with_db_conn(commit=True)
+def delete_quotes(cursor: pyodbc.Cursor, quote_pks: List[int]) -> None:
     """
-    cursor.execute(query, (customer_fk, item_fk, quote_type, part_number, 1))
-    cursor.execute("SELECT IDENT_CURRENT('Quote');")
-    result = cursor.fetchone()
+    Deletes quotes together with their quote assemblies (operations and BOM lines),
+    e.g. the quotes of an RFQ run that failed.
 
-    if not result or result[0] is None:
-        raise ValueError("Quote PK was not returned by the database.")
+    :param cursor: Database cursor for executing queries.
+    :param quote_pks: QuotePKs of the quotes to delete.
+    """
+    if not quote_pks:
+        return
 
-    return int(result[0])
+    for chunk in chunked(quote_pks, QUOTE_DELETE_CHUNK_SIZE):
+        placeholders = ", ".join(["?"] * len(chunk))
+        cursor.execute(
+            f"DELETE FROM QuoteAssembly WHERE QuoteFK IN ({placeholders})", tuple(chunk)
+        )
+        cursor.execute(f"DELETE FROM Quote WHERE QuotePK IN ({placeholders})", tuple(chunk))
+    LOGGER.info(f"Deleted QuotePKs: {quote_pks}.")
 
 
 @with_db_conn(commit=True)
 def copy_operations_to_quote(
     cursor: pyodbc.Cursor, new_quote_fk, source_quote_fk=SOURCE_QUOTE
-):
+) -> Dict[int, int]:
     """
     Copies operations from one quote to another in the QuoteAssembly table.
 
     This function duplicates selected columns from the QuoteAssembly records associated
     with the source quote and inserts them for the new quote. Certain columns and the BOM are excluded
-    from the copy.
+    from the copy. The new rows' keys are returned by the INSERT itself, so callers
+    need no `get_quote_assembly_pk` lookups afterwards.
 
     Parameters:
         cursor (pyodbc.Cursor): The database cursor used to execute SQL queries.
@@ -65,38 +98,43 @@ def copy_operations_to_quote(
         source_quote_fk (int, optional): The foreign key of the quote from which operations
             will be copied. Defaults to the constant SOURCE_QUOTE.
 
+    Returns:
+        dict[int, int]: The QuoteAssemblyPK of every copied operation, keyed by its
+        SequenceNumber (the lowest PK if a sequence number repeats).
     """
 
-    all_columns = get_table_schema("QuoteAssembly")
-    excluded_columns = [
-        "QuoteFK",
-        "QuoteAssemblyPK",
-        "LastAccess",
-        "ParentQuoteAssemblyFK",
-        "ParentQuoteFK",
-    ]
-
-    columns_to_copy = [
-        column.get("column_name")
-        for column in all_columns
-        if column.get("column_name") not in excluded_columns
-    ]
+    columns_to_copy = _operation_columns()
     column_names = ", ".join(columns_to_copy)  # Convert list to SQL-friendly format
 
     query = f"""
-        INSERT INTO QuoteAssembly ({column_names}, QuoteFK)
         SELECT {column_names}, ?
         FROM QuoteAssembly
         WHERE QuoteFK = ?
-        AND NOT (UnitOfMeasureSetFK = 1 AND CalculationTypeFK = 17);
+        AND NOT (UnitOfMeasureSetFK = 1 AND CalculationTypeFK = 17)
     """
 
-    cursor.execute(query, (new_quote_fk, source_quote_fk))
+    copied = insert_select_returning(
+        cursor,
+        "QuoteAssembly",
+        columns_to_copy + ["QuoteFK"],
+        query,
+        (new_quote_fk, source_quote_fk),
+        ["QuoteAssemblyPK", "SequenceNumber"],
+    )
+
+    quote_assembly_pks: Dict[int, int] = {}
+    for quote_assembly_pk, sequence_number in sorted(copied):
+        if sequence_number is not None:
+            quote_assembly_pks.setdefault(sequence_number, quote_assembly_pk)
+
     LOGGER.info(f"Copied QuotePK: {source_quote_fk} to NEW QuotePK: {new_quote_fk}")
+    return quote_assembly_pks
 
 
 @with_db_conn()
-def get_operation_quote_template(cursor: pyodbc.Cursor, quote_fk: int = 494):
+def get_operation_quote_template(
+    cursor: pyodbc.Cursor, quote_fk: int = OPERATION_TEMPLATE_QUOTE
+):
     """
     Retrieves operation data for a given quote, excluding certain metadata columns.
 
@@ -115,20 +153,7 @@ def get_operation_quote_template(cursor: pyodbc.Cursor, quote_fk: int = 494):
             - A list of column names included in the result.
             - A list of row tuples representing the data for each operation.
     """
-    all_columns = get_table_schema("QuoteAssembly")
-    excluded_columns = [
-        "QuoteFK",
-        "QuoteAssemblyPK",
-        "LastAccess",
-        "ParentQuoteAssemblyFK",
-        "ParentQuoteFK",
-    ]
-
-    columns_to_copy = [
-        str(column.get("column_name"))
-        for column in all_columns
-        if column.get("column_name") not in excluded_columns
-    ]
+    columns_to_copy = _operation_columns()
     column_names = ", ".join(columns_to_copy)  # Convert list to SQL-friendly format
 
     query = f"SELECT {column_names} FROM QuoteAssembly WHERE QuoteFK=?"
@@ -206,6 +231,44 @@ def create_quote_assembly_formula_variable(cursor: pyodbc.Cursor, quote_pk):
     cursor.execute(query, (quote_pk, quote_pk))
 
 
+@with_db_conn(commit=True)
+def create_quote_assembly_formula_variables(cursor: pyodbc.Cursor, quote_pks: List[int]):
+    """
+    Inserts formula variable records for all operations of many quotes at once.
+
+    The set-based version of `create_quote_assembly_formula_variable`: the rows of
+    every quote are inserted by one `INSERT ... SELECT` (one per 450 quotes), so
+    populating a whole RFQ costs the same no matter how many parts it has.
+
+    Parameters:
+        cursor (pyodbc.Cursor): The database cursor used to execute SQL queries.
+        quote_pks (list[int]): The primary keys of the quotes, e.g. every quote of an RFQ.
+    """
+    unique_quote_pks = list(dict.fromkeys(quote_pks))
+
+    for chunk in chunked(unique_quote_pks, FORMULA_VARIABLE_CHUNK_SIZE):
+        placeholders = ", ".join(["?"] * len(chunk))
+        query = f"""
+            INSERT INTO QuoteAssemblyFormulaVariable
+                (QuoteAssemblyFK, OperationFormulaVariableFK, FormulaType, VariableValue)
+            SELECT
+                QuoteAssemblyPK, SetupFormulaFK, 0, SetupTime
+            FROM QuoteAssembly
+            WHERE QuoteFK IN ({placeholders}) AND OperationFK IS NOT NULL
+
+            UNION ALL
+
+            SELECT
+                QuoteAssemblyPK, RunFormulaFK, 1, RunTime
+            FROM QuoteAssembly
+            WHERE QuoteFK IN ({placeholders}) AND OperationFK IS NOT NULL
+        """
+
+        cursor.execute(query, tuple(chunk) * 2)
+
+    LOGGER.info(f"Created formula variables for {len(unique_quote_pks)} quotes.")
+
+
 @with_db_conn(commit=True)
 def create_assy_quote(
     cursor: pyodbc.Cursor,
@@ -218,40 +281,76 @@ def create_assy_quote(
     """
     Creates Quote for Assembly parts by inserting a new QuoteAssembly record and copying related operations.
     """
-    insert_query = """
-        INSERT INTO QuoteAssembly 
-        (QuoteFK, ItemQuoteFK, SequenceNumber, Pull, Lock, OrderBy, QuantityRequired, ParentQuoteFK, ParentQuoteAssemblyFK)
-        VALUES (?, ?, 1, 0, 0, 1, ?, ?, ?);
+    assembly_dict = {
+        "QuoteFK": quotefk,
+        "ItemQuoteFK": quote_to_be_added,
+        "SequenceNumber": 1,
+        "Pull": 0,
+        "Lock": 0,
+        "OrderBy": 1,
+        "QuantityRequired": qty_req,
+        "ParentQuoteFK": parent_quote_fk,
+        "ParentQuoteAssemblyFK": parent_quote_asembly,
+    }
+
+    pk = insert_returning_pk(cursor, "QuoteAssembly", assembly_dict, "QuoteAssemblyPK")
+    LOGGER.debug(f"Inserted QuoteAssembly PK: {pk}.")
+
+    copy_operation_template_to_assembly(cursor, quotefk, quote_to_be_added, pk)
+    LOGGER.debug("inserted quote operation template values.")
+
+    return pk
+
+
+def copy_operation_template_to_assembly(
+    cursor: pyodbc.Cursor,
+    quote_fk: int,
+    parent_quote_fk: int,
+    parent_quote_assembly_fk: int,
+    template_quote_fk: int = OPERATION_TEMPLATE_QUOTE,
+) -> None:
     """
+    Copies every operation of the template quote under an assembly in one statement.
 
-    cursor.execute(
-        insert_query,
-        (quotefk, quote_to_be_added, qty_req, parent_quote_fk, parent_quote_asembly),
-    )
-    cursor.execute("SELECT IDENT_CURRENT('QuoteAssembly');")
-    result = cursor.fetchone()
+    This is the set-based equivalent of reading `get_operation_quote_template` and
+    inserting its rows one by one: the rows are copied server side with a single
+    `INSERT ... SELECT`, so an assembly costs the same number of round trips no
+    matter how many operations the template has.
+
+    Parameters:
+        cursor (pyodbc.Cursor): The database cursor used to execute SQL queries.
+        quote_fk (int): The quote the operations are added to.
+        parent_quote_fk (int): The quote of the assembly the operations belong to.
+        parent_quote_assembly_fk (int): The QuoteAssembly row of that assembly.
+        template_quote_fk (int, optional): The quote to copy operations from.
+            Defaults to OPERATION_TEMPLATE_QUOTE.
+    """
+    column_names = ", ".join(_operation_columns())
 
-    if not result or result[0] is None:
-        raise ValueError("Quote PK was not returned by the database.")
+    query = f"""
+        INSERT INTO QuoteAssembly ({column_names}, QuoteFK, ParentQuoteAssemblyFK, ParentQuoteFK)
+        SELECT {column_names}, ?, ?, ?
+        FROM QuoteAssembly
+        WHERE QuoteFK = ?;
+    """
 
-    pk = int(result[0])
-    LOGGER.debug(f"Inserted QuoteAssembly PK: {pk}.")
+    cursor.execute(
+        query, (quote_fk, parent_quote_assembly_fk, parent_quote_fk, template_quote_fk)
+    )
 
-    # get quote operation template:
-    column_names, template_values = get_operation_quote_template()
-    for data in template_values:
-        insert_dict = dict(zip(column_names, data))
-        insert_dict["QuoteFK"] = quotefk
-        insert_dict["ParentQuoteAssemblyFK"] = pk
-        insert_dict["ParentQuoteFK"] = quote_to_be_added
-
-        insert_columns = ", ".join(insert_dict.keys())
-        placeholders = ", ".join(["?"] * len(insert_dict))
-        insert_query = (
-            f"INSERT INTO QuoteAssembly ({insert_columns}) VALUES ({placeholders})"
-        )
 
-        cursor.execute(insert_query, tuple(insert_dict.values()))
-    LOGGER.debug("inserted quote operation template values.")
+def _operation_columns() -> list[str]:
+    """QuoteAssembly columns that are copied from a template operation."""
+    excluded_columns = [
+        "QuoteFK",
+        "QuoteAssemblyPK",
+        "LastAccess",
+        "ParentQuoteAssemblyFK",
+        "ParentQuoteFK",
+    ]
 
-    return pk
+    return [
+        str(column.get("column_name"))
+        for column in get_table_schema("QuoteAssembly")
+        if column.get("column_name") not in excluded_columns
+    ]
@@ -1,11 +1,22 @@
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 import pyodbc
-from mie_trak_api.utils import with_db_conn
+from mie_trak_api.utils import chunked, insert_many, insert_returning_pk, with_db_conn
 from base_logger import getlogger
 
 
 LOGGER = getlogger("MT RFQ")
+DOCUMENT_LOOKUP_CHUNK_SIZE = 500
+DOCUMENT_COLUMNS = [
+    "URL",
+    "RequestForQuoteFK",
+    "ItemFK",
+    "Active",
+    "DocumentTypeFK",
+    "SecureDocument",
+    "DocumentGroupFK",
+    "PrintWithPurchaseOrder",
+]
 
 
 @with_db_conn(commit=True)
@@ -67,23 +78,9 @@ def insert_into_rfq(
     # Remove None values to prevent SQL errors
     filtered_dict = {k: v for k, v in info_dict.items() if v is not None}
 
-    columns = ", ".join(filtered_dict.keys())
-    placeholders = ", ".join(["?"] * len(filtered_dict))
-    values = tuple(filtered_dict.values())
-
-    query = f"""
-    INSERT INTO RequestForQuote ({columns})
-    VALUES ({placeholders})
-    """
-
-    cursor.execute(query, values)
-    cursor.execute("SELECT IDENT_CURRENT('RequestForQuote')")
-    result = cursor.fetchone()
-
-    if not result or not result[0]:
-        raise ValueError("RFQ PK was not returned by the database.")
-
-    return int(result[0])
+    return insert_returning_pk(
+        cursor, "RequestForQuote", filtered_dict, "RequestForQuotePK"
+    )
 
 
 @with_db_conn(commit=True)
@@ -136,30 +133,19 @@ def create_rfq_line_item(
     :return: The primary key (PK) of the newly inserted RFQ line item.
     """
 
-    query = """
-        INSERT INTO RequestForQuoteLine
-        (ItemFK, RequestForQuoteFK, LineReferenceNumber, QuoteFK, Quantity, PriceTypeFK, UnitOfMeasureSetFK)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """
-    cursor.execute(
-        query,
-        (
-            item_fk,
-            request_for_quote_fk,
-            line_reference_number,
-            quote_fk,
-            quantity,
-            price_type_fk,
-            unit_of_measure_set_fk,
-        ),
-    )
-    cursor.execute("SELECT IDENT_CURRENT('RequestForQuoteLine')")
-    result = cursor.fetchone()
-
-    if not result or not result[0]:
-        raise ValueError("RFQ PK was not returned by the database.")
+    line_dict = {
+        "ItemFK": item_fk,
+        "RequestForQuoteFK": request_for_quote_fk,
+        "LineReferenceNumber": line_reference_number,
+        "QuoteFK": quote_fk,
+        "Quantity": quantity,
+        "PriceTypeFK": price_type_fk,
+        "UnitOfMeasureSetFK": unit_of_measure_set_fk,
+    }
 
-    return int(result[0])
+    return insert_returning_pk(
+        cursor, "RequestForQuoteLine", line_dict, "RequestForQuoteLinePK"
+    )
 
 
 @with_db_conn(commit=True)
@@ -189,32 +175,19 @@ def create_rfq_line_item_with_qty(
     """
 
     # Step 1: Insert into RequestForQuoteLine and retrieve the inserted PK
-    insert_rfq_line_query = """
-        INSERT INTO RequestForQuoteLine 
-        (ItemFK, RequestForQuoteFK, LineReferenceNumber, QuoteFK, Quantity, PriceTypeFK, UnitOfMeasureSetFK)
-        VALUES (?, ?, ?, ?, ?, ?, ?);
-    """
+    line_dict = {
+        "ItemFK": item_fk,
+        "RequestForQuoteFK": request_for_quote_fk,
+        "LineReferenceNumber": line_reference_number,
+        "QuoteFK": quote_fk,
+        "Quantity": quantity,
+        "PriceTypeFK": price_type_fk,
+        "UnitOfMeasureSetFK": unit_of_measure_set_fk,
+    }
 
-    cursor.execute(
-        insert_rfq_line_query,
-        (
-            item_fk,
-            request_for_quote_fk,
-            line_reference_number,
-            quote_fk,
-            quantity,
-            price_type_fk,
-            unit_of_measure_set_fk,
-        ),
+    rfq_line_pk = insert_returning_pk(
+        cursor, "RequestForQuoteLine", line_dict, "RequestForQuoteLinePK"
     )
-
-    cursor.execute("SELECT IDENT_CURRENT('RequestForQuoteLine')")
-    result = cursor.fetchone()
-
-    if not result or not result[0]:
-        raise ValueError("RFQ Line PK was not returned by the database.")
-
-    rfq_line_pk = result[0]
     LOGGER.debug(f"Inserted RFQ Line PK: {rfq_line_pk}")
 
     # Step 2: Insert into RequestForQuoteLineQuantity using the retrieved PK
@@ -292,3 +265,70 @@ def upload_documents_to_rfq_or_item(
     LOGGER.info(
         f"FOUND doc - {document_path} in RFQ PK {rfq_fk} / Item PK {item_fk}..."
     )
+
+
+@with_db_conn(commit=True)
+def register_documents(cursor: pyodbc.Cursor, documents: List[Dict[str, Any]]) -> int:
+    """
+    Uploads many documents to RFQs or items, avoiding duplicate entries.
+
+    The bulk version of `upload_documents_to_rfq_or_item`: existing documents are
+    looked up for the whole list at once and the missing ones are inserted with
+    multi-row INSERTs, so the round trips do not grow with the number of documents
+    (beyond one per 500 URLs). Commits automatically.
+
+    :param cursor: Database cursor for executing queries.
+    :param documents: One dict per document, with the keyword arguments of
+        `upload_documents_to_rfq_or_item` (`document_path` and optionally `rfq_fk`,
+        `item_fk`, `document_type_fk`, `secure_document`, `document_group_pk`,
+        `print_with_purchase_order`).
+    :return: The number of documents inserted.
+    """
+    urls = list(dict.fromkeys(doc["document_path"] for doc in documents))
+
+    # (URL, "item"/"rfq", FK) of every existing document; URLs compare like the
+    # database collation, without case.
+    existing = set()
+    for chunk in chunked(urls, DOCUMENT_LOOKUP_CHUNK_SIZE):
+        placeholders = ", ".join(["?"] * len(chunk))
+        cursor.execute(
+            f"SELECT URL, ItemFK, RequestForQuoteFK FROM Document WHERE URL IN ({placeholders});",
+            tuple(chunk),
+        )
+        for url, item_fk, rfq_fk in cursor.fetchall():
+            existing.add((url.lower(), "item", item_fk))
+            existing.add((url.lower(), "rfq", rfq_fk))
+
+    rows = []
+    for doc in documents:
+        url = doc["document_path"]
+        item_fk = doc.get("item_fk")
+        rfq_fk = doc.get("rfq_fk")
+        keys = [
+            (url.lower(), kind, fk)
+            for kind, fk in (("item", item_fk), ("rfq", rfq_fk))
+            if fk is not None  # `ItemFK = NULL` never matches
+        ]
+
+        if any(key in existing for key in keys):
+            LOGGER.info(f"FOUND doc - {url} in RFQ PK {rfq_fk} / Item PK {item_fk}...")
+            continue
+
+        existing.update(keys)  # the same document twice in `documents`
+        rows.append(
+            (
+                url,
+                rfq_fk,
+                item_fk,
+                1,
+                doc.get("document_type_fk"),
+                doc.get("secure_document", 0),
+                doc.get("document_group_pk"),
+                doc.get("print_with_purchase_order"),
+            )
+        )
+
+    insert_many(cursor, "Document", DOCUMENT_COLUMNS, rows)
+    LOGGER.info(f"INSERTED {len(rows)} of {len(documents)} docs.")
+
+    return len(rows)
@@ -1,25 +1,54 @@
+from typing import Dict, List, Tuple
+
 import pyodbc
-from mie_trak_api.utils import with_db_conn
+from mie_trak_api.utils import (
+    with_db_conn,
+    insert_many,
+    insert_many_returning,
+    insert_returning_pk,
+)
 from base_logger import getlogger
 
 
 LOGGER = getlogger("MT Router")
+ROUTER_COLUMNS = [
+    "ItemFK",
+    "PartNumber",
+    "DivisionFK",
+    "RouterStatusFK",
+    "RouterType",
+    "DefaultRouter",
+]
+WORK_CENTER_COLUMNS = [
+    "ItemFK",
+    "RouterFK",
+    "OrderBy",
+    "UnitOfMeasureSetFK",
+    "SequenceNumber",
+    "PartsPerBlank",
+    "PartsRequired",
+    "QuantityRequired",
+    "QuantityPerInverse",
+    "MinutesPerPart",
+    "VendorUnit",
+    "SetupTime",
+]
+# values of a finish work center after ItemFK, RouterFK and OrderBy
+_WORK_CENTER_DEFAULTS = (1, 1, 1.000, 1.000, 1.000, 1, 0, 1.00, 0.00)
 
 
 @with_db_conn(commit=True)
 def create_router(cursor: pyodbc.Cursor, item_fk: int, part_number: str, division_fk=1, router_status_fk=2, router_type=0, default_router=1):
-    query = f"""
-    INSERT INTO Router (ItemFK, PartNumber, DivisionFK, RouterStatusFK, RouterType, DefaultRouter)
-    VALUES (?, ?, ?, ?, ?, ?)
-    """
-    cursor.execute(query, (item_fk, part_number, division_fk, router_status_fk, router_type, default_router))
-    cursor.execute("SELECT IDENT_CURRENT('Router')")
-    result = cursor.fetchone()
+    router_dict = {
+        "ItemFK": item_fk,
+        "PartNumber": part_number,
+        "DivisionFK": division_fk,
+        "RouterStatusFK": router_status_fk,
+        "RouterType": router_type,
+        "DefaultRouter": default_router,
+    }
 
-    if result and result[0]:
-        return result[0]
-    else:
-        raise ValueError("Error while inserting. Could not get back PK.")
+    return insert_returning_pk(cursor, "Router", router_dict, "RouterPK")
 
 
 @with_db_conn(commit=True)
@@ -30,25 +59,52 @@ def create_router_work_center(
     order_by,
 ):
     """Creates the work center of a Finish router"""
-    router_work_center_dict = {
-        "ItemFK": item_fk,
-        "RouterFK": router_fk,
-        "OrderBy": order_by,
-        "UnitOfMeasureSetFK": 1,
-        "SequenceNumber": 1,
-        "PartsPerBlank": 1.000,
-        "PartsRequired": 1.000,
-        "QuantityRequired": 1.000,
-        "QuantityPerInverse": 1,
-        "MinutesPerPart": 0,
-        "VendorUnit": 1.00,
-        "SetupTime": 0.00,
-    }
+    row = (item_fk, router_fk, order_by) + _WORK_CENTER_DEFAULTS
+    insert_many(cursor, "RouterWorkCenter", WORK_CENTER_COLUMNS, [row])
+
+
+@with_db_conn(commit=True)
+def create_routers(
+    cursor: pyodbc.Cursor,
+    routers: List[Tuple[int, str]],
+    division_fk=1,
+    router_status_fk=2,
+    router_type=0,
+    default_router=1,
+) -> List[int]:
+    """
+    The bulk version of `create_router`: inserts every router with multi-row INSERTs.
+
+    :param routers: (ItemFK, PartNumber) of every router.
+    :return: The RouterPK of every router, in the order of `routers`.
+    """
+    rows = [
+        (item_fk, part_number, division_fk, router_status_fk, router_type, default_router)
+        for item_fk, part_number in routers
+    ]
+    inserted = insert_many_returning(
+        cursor, "Router", ROUTER_COLUMNS, rows, ["RouterPK", "ItemFK"]
+    )
+
+    # the returned rows are unordered; routers of the same item are interchangeable.
+    pks_by_item: Dict[int, List[int]] = {}
+    for router_pk, item_fk in sorted(inserted, reverse=True):
+        pks_by_item.setdefault(item_fk, []).append(router_pk)
 
-    columns = ", ".join(router_work_center_dict.keys())
-    placeholders = ", ".join(["?"] * len(router_work_center_dict))
-    values = tuple(router_work_center_dict.values())
+    return [pks_by_item[item_fk].pop() for item_fk, _ in routers]
 
-    query = f"INSERT INTO RouterWorkCenter ({columns}) VALUES ({placeholders});"
 
-    cursor.execute(query, values)
+@with_db_conn(commit=True)
+def create_router_work_centers(
+    cursor: pyodbc.Cursor, work_centers: List[Tuple[int, int, int]]
+) -> None:
+    """
+    Creates the work centers of Finish routers with multi-row INSERTs.
+
+    :param work_centers: (ItemFK, RouterFK, OrderBy) of every work center.
+    """
+    rows = [
+        (item_fk, router_fk, order_by) + _WORK_CENTER_DEFAULTS
+        for item_fk, router_fk, order_by in work_centers
+    ]
+    insert_many(cursor, "RouterWorkCenter", WORK_CENTER_COLUMNS, rows)
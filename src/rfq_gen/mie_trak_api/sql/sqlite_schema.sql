@@ -0,0 +1,250 @@
+-- Offline copy of the MIE Trak tables used by RFQ Gen (see backends.SQLiteBackend).
+-- Column types use SQL Server names so validation models built from this schema
+-- match the ones built from the live server. Text compares case-insensitively and
+-- bit columns default to 0, as on the server.
+
+CREATE TABLE Country (
+    CountryPK INTEGER PRIMARY KEY AUTOINCREMENT,
+    Description nvarchar(50) COLLATE NOCASE
+);
+
+CREATE TABLE State (
+    StatePK INTEGER PRIMARY KEY AUTOINCREMENT,
+    Description nvarchar(50) COLLATE NOCASE
+);
+
+CREATE TABLE Party (
+    PartyPK INTEGER PRIMARY KEY AUTOINCREMENT,
+    Name nvarchar(100) COLLATE NOCASE,
+    ShortName nvarchar(50) COLLATE NOCASE,
+    Email nvarchar(100) COLLATE NOCASE
+);
+
+CREATE TABLE PartyBuyer (
+    PartyBuyerPK INTEGER PRIMARY KEY AUTOINCREMENT,
+    PartyFK int NOT NULL,
+    BuyerFK int NOT NULL
+);
+
+CREATE TABLE Address (
+    AddressPK INTEGER PRIMARY KEY AUTOINCREMENT,
+    PartyFK int,
+    Name nvarchar(100) COLLATE NOCASE,
+    Address1 nvarchar(100) COLLATE NOCASE,
+    Address2 nvarchar(100) COLLATE NOCASE,
+    AddressAlt nvarchar(100) COLLATE NOCASE,
+    City nvarchar(50) COLLATE NOCASE,
+    ZipCode nvarchar(20) COLLATE NOCASE,
+    StateFK int,
+    CountryFK int
+);
+
+CREATE TABLE ItemInventory (
+    ItemInventoryPK INTEGER PRIMARY KEY AUTOINCREMENT,
+    QuantityOnHand decimal(18, 3)
+);
+
+CREATE TABLE Item (
+    ItemPK INTEGER PRIMARY KEY AUTOINCREMENT,
+    PartNumber nvarchar(100) COLLATE NOCASE,
+    Description nvarchar(500) COLLATE NOCASE,
+    ItemTypeFK int,
+    ItemInventoryFK int,
+    CalculationTypeFK int,
+    PurchaseGeneralLedgerAccountFK int,
+    SalesCogsAccountFK int,
+    Purchase bit DEFAULT 0,
+    ServiceItem bit DEFAULT 0,
+    ManufacturedItem bit DEFAULT 0,
+    Inventoriable bit DEFAULT 0,
+    MPSItem bit DEFAULT 0,
+    ForecastOnMRP bit DEFAULT 0,
+    MPSOnMRP bit DEFAULT 0,
+    ShipLoose bit DEFAULT 0,
+    BulkShip bit DEFAULT 0,
+    CertificationsRequiredBySupplier bit DEFAULT 0,
+    CanNotCreateWorkOrder bit DEFAULT 0,
+    CanNotInvoice bit DEFAULT 0,
+    Comment nvarchar COLLATE NOCASE,
+    PurchaseOrderComment nvarchar COLLATE NOCASE,
+    StockLength decimal(18, 4),
+    StockWidth decimal(18, 4),
+    Thickness decimal(18, 4),
+    Weight decimal(18, 4),
+    PartLength decimal(18, 4),
+    PartWidth decimal(18, 4),
+    DrawingNumber nvarchar(50) COLLATE NOCASE,
+    DrawingRevision nvarchar(50) COLLATE NOCASE,
+    Revision nvarchar(50) COLLATE NOCASE,
+    VendorPartNumber nvarchar(100) COLLATE NOCASE,
+    LastAccess datetime DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IX_Item_PartNumber ON Item (PartNumber);
+
+CREATE TABLE RequestForQuote (
+    RequestForQuotePK INTEGER PRIMARY KEY AUTOINCREMENT,
+    CustomerFK int,
+    BuyerFK int,
+    BillingAddressFK int,
+    ShippingAddressFK int,
+    DivisionFK int,
+    ReceivedPurchaseOrder bit DEFAULT 0,
+    NoBid bit DEFAULT 0,
+    DidNotGet bit DEFAULT 0,
+    MIEExchange bit DEFAULT 0,
+    SalesTaxOnFreight bit DEFAULT 0,
+    RequestForQuoteStatusFK int,
+    BillingAddressName nvarchar(100) COLLATE NOCASE,
+    BillingAddress1 nvarchar(100) COLLATE NOCASE,
+    BillingAddress2 nvarchar(100) COLLATE NOCASE,
+    BillingAddressAlt nvarchar(100) COLLATE NOCASE,
+    BillingAddressCity nvarchar(50) COLLATE NOCASE,
+    BillingAddressZipCode nvarchar(20) COLLATE NOCASE,
+    BillingAddressStateDescription nvarchar(50) COLLATE NOCASE,
+    BillingAddressCountryDescription nvarchar(50) COLLATE NOCASE,
+    ShippingAddressName nvarchar(100) COLLATE NOCASE,
+    ShippingAddress1 nvarchar(100) COLLATE NOCASE,
+    ShippingAddress2 nvarchar(100) COLLATE NOCASE,
+    ShippingAddressAlt nvarchar(100) COLLATE NOCASE,
+    ShippingAddressCity nvarchar(50) COLLATE NOCASE,
+    ShippingAddressZipCode nvarchar(20) COLLATE NOCASE,
+    ShippingAddressStateDescription nvarchar(50) COLLATE NOCASE,
+    ShippingAddressCountryDescription nvarchar(50) COLLATE NOCASE,
+    CustomerRequestForQuoteNumber nvarchar(50) COLLATE NOCASE,
+    InquiryDate datetime,
+    DueDate datetime,
+    CreateDate datetime
+);
+
+CREATE TABLE RequestForQuoteLine (
+    RequestForQuoteLinePK INTEGER PRIMARY KEY AUTOINCREMENT,
+    RequestForQuoteFK int,
+    ItemFK int,
+    QuoteFK int,
+    LineReferenceNumber int,
+    Quantity decimal(18, 5),
+    PriceTypeFK int,
+    UnitOfMeasureSetFK int
+);
+CREATE INDEX IX_RequestForQuoteLine_RequestForQuoteFK ON RequestForQuoteLine (RequestForQuoteFK);
+
+CREATE TABLE RequestForQuoteLineQuantity (
+    RequestForQuoteLineQuantityPK INTEGER PRIMARY KEY AUTOINCREMENT,
+    RequestForQuoteLineFK int,
+    PriceTypeFK int,
+    Quantity decimal(18, 5),
+    Delivery int
+);
+
+CREATE TABLE Quote (
+    QuotePK INTEGER PRIMARY KEY AUTOINCREMENT,
+    CustomerFK int,
+    ItemFK int,
+    QuoteType int,
+    PartNumber nvarchar(100) COLLATE NOCASE,
+    DivisionFK int,
+    LastAccess datetime DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE QuoteAssembly (
+    QuoteAssemblyPK INTEGER PRIMARY KEY AUTOINCREMENT,
+    QuoteFK int,
+    ItemFK int,
+    ItemQuoteFK int,
+    ParentQuoteFK int,
+    ParentQuoteAssemblyFK int,
+    QuoteAssemblySeqNumberFK int,
+    OperationFK int,
+    PartyFK int,
+    SetupFormulaFK int,
+    RunFormulaFK int,
+    SequenceNumber int,
+    OrderBy int,
+    Description nvarchar(500) COLLATE NOCASE,
+    UnitOfMeasureSetFK int,
+    CalculationTypeFK int,
+    Tool bit DEFAULT 0,
+    StopSequence bit DEFAULT 0,
+    UnattendedOperation bit DEFAULT 0,
+    DoNotUseDeliverySchedule bit DEFAULT 0,
+    VendorUnit decimal(18, 5),
+    GrainDirection bit DEFAULT 0,
+    PartsPerBlank decimal(18, 3),
+    AgainstGrain bit DEFAULT 0,
+    DoubleSided bit DEFAULT 0,
+    CertificationsRequired bit DEFAULT 0,
+    NonAmortizedItem bit DEFAULT 0,
+    Pull bit DEFAULT 0,
+    NotIncludeInPiecePrice bit DEFAULT 0,
+    Lock bit DEFAULT 0,
+    Nestable bit DEFAULT 0,
+    BulkShip bit DEFAULT 0,
+    ShipLoose bit DEFAULT 0,
+    CustomerSuppliedMaterial bit DEFAULT 0,
+    SetupTime decimal(18, 2),
+    RunTime decimal(18, 4),
+    ScrapRebate decimal(18, 3),
+    PartWidth decimal(18, 3),
+    PartLength decimal(18, 3),
+    Thickness decimal(18, 2),
+    PartsRequired decimal(18, 3),
+    QuantityRequired decimal(18, 3),
+    MinimumPiecePrice decimal(18, 2),
+    PartsPerBlankScrapPercentage decimal(18, 3),
+    MarkupPercentage1 decimal(18, 6),
+    PieceWeight decimal(18, 3),
+    CustomPieceWeight decimal(18, 4),
+    PieceCost decimal(18, 4),
+    PiecePrice decimal(18, 5),
+    StockPieces int,
+    StockPiecesScrapPercentage decimal(18, 3),
+    LastAccess datetime DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IX_QuoteAssembly_QuoteFK ON QuoteAssembly (QuoteFK);
+
+CREATE TABLE QuoteAssemblyFormulaVariable (
+    QuoteAssemblyFormulaVariablePK INTEGER PRIMARY KEY AUTOINCREMENT,
+    QuoteAssemblyFK int,
+    OperationFormulaVariableFK int,
+    FormulaType int,
+    VariableValue decimal(18, 4)
+);
+
+CREATE TABLE Router (
+    RouterPK INTEGER PRIMARY KEY AUTOINCREMENT,
+    ItemFK int,
+    PartNumber nvarchar(100) COLLATE NOCASE,
+    DivisionFK int,
+    RouterStatusFK int,
+    RouterType int,
+    DefaultRouter bit DEFAULT 0
+);
+
+CREATE TABLE RouterWorkCenter (
+    RouterWorkCenterPK INTEGER PRIMARY KEY AUTOINCREMENT,
+    RouterFK int,
+    ItemFK int,
+    OrderBy int,
+    UnitOfMeasureSetFK int,
+    SequenceNumber int,
+    PartsPerBlank decimal(18, 3),
+    PartsRequired decimal(18, 3),
+    QuantityRequired decimal(18, 3),
+    QuantityPerInverse int,
+    MinutesPerPart decimal(18, 4),
+    VendorUnit decimal(18, 2),
+    SetupTime decimal(18, 2)
+);
+
+CREATE TABLE Document (
+    DocumentPK INTEGER PRIMARY KEY AUTOINCREMENT,
+    URL nvarchar(500) COLLATE NOCASE,
+    RequestForQuoteFK int,
+    ItemFK int,
+    Active bit DEFAULT 0,
+    DocumentTypeFK int,
+    SecureDocument bit DEFAULT 0,
+    DocumentGroupFK int,
+    PrintWithPurchaseOrder bit DEFAULT 0
+);
+CREATE INDEX IX_Document_URL ON Document (URL);
@@ -0,0 +1,43 @@
+-- Seed data for the offline database: a sample customer with a buyer and address,
+-- the operations quote copied into every new quote (quote.SOURCE_QUOTE) and the
+-- operations template added under every assembly (quote.OPERATION_TEMPLATE_QUOTE).
+
+INSERT INTO Country (CountryPK, Description) VALUES (1, 'USA');
+INSERT INTO State (StatePK, Description) VALUES (1, 'Texas');
+
+INSERT INTO Party (PartyPK, Name, ShortName, Email) VALUES
+    (1, 'Offline Customer', 'OFFLINE', 'customer@example.com'),
+    (2, 'Offline Buyer', 'BUYER', 'buyer@example.com');
+
+INSERT INTO PartyBuyer (PartyFK, BuyerFK) VALUES (1, 2);
+
+INSERT INTO Address (PartyFK, Name, Address1, Address2, AddressAlt, City, ZipCode, StateFK, CountryFK)
+VALUES (1, 'Offline Customer', '1 Test Street', NULL, NULL, 'Houston', '77001', 1, 1);
+
+INSERT INTO Quote (QuotePK, CustomerFK, QuoteType, PartNumber, DivisionFK) VALUES
+    (49, 1, 0, 'OPERATIONS TEMPLATE', 1),
+    (494, 1, 0, 'ASSEMBLY OPERATIONS TEMPLATE', 1);
+
+-- Operations of the source quote. SequenceNumber 6/21/22 receive the material,
+-- heat treat and finish BOM lines; 24 and 8 receive hardware and tooling.
+INSERT INTO QuoteAssembly
+    (QuoteFK, OperationFK, SetupFormulaFK, RunFormulaFK, SequenceNumber, OrderBy, Description,
+     UnitOfMeasureSetFK, CalculationTypeFK, SetupTime, RunTime, Pull, Lock, QuantityRequired)
+VALUES
+    (49, 101, 1, 2, 1, 1, 'Review', 2, 1, 0.25, 0.00, 0, 0, 1),
+    (49, 106, 1, 2, 6, 2, 'Issue Material', 2, 1, 0.10, 0.05, 0, 0, 1),
+    (49, 108, 1, 2, 8, 3, 'Tooling', 2, 1, 0.00, 0.00, 0, 0, 1),
+    (49, 110, 1, 2, 10, 4, 'Machining', 2, 1, 1.50, 0.75, 0, 0, 1),
+    (49, 121, 1, 2, 21, 5, 'Heat Treat', 2, 1, 0.00, 0.00, 0, 0, 1),
+    (49, 122, 1, 2, 22, 6, 'Finish', 2, 1, 0.00, 0.00, 0, 0, 1),
+    (49, 124, 1, 2, 24, 7, 'Hardware', 2, 1, 0.00, 0.00, 0, 0, 1),
+    (49, 130, 1, 2, 30, 8, 'Inspection', 2, 1, 0.20, 0.10, 0, 0, 1),
+    -- a BOM line on the source quote; never copied (UnitOfMeasureSetFK = 1 AND CalculationTypeFK = 17)
+    (49, NULL, NULL, NULL, 6, 9, 'Source BOM line', 1, 17, 0.00, 0.00, 0, 0, 1);
+
+INSERT INTO QuoteAssembly
+    (QuoteFK, OperationFK, SetupFormulaFK, RunFormulaFK, SequenceNumber, OrderBy, Description,
+     UnitOfMeasureSetFK, CalculationTypeFK, SetupTime, RunTime, Pull, Lock, QuantityRequired)
+VALUES
+    (494, 201, 1, 2, 1, 1, 'Assemble', 2, 1, 0.50, 0.25, 0, 0, 1),
+    (494, 202, 1, 2, 2, 2, 'Assembly Inspection', 2, 1, 0.10, 0.05, 0, 0, 1);
@@ -1,10 +1,15 @@
 import os
 import sys
+import json
 import pyodbc
 import functools
-from contextlib import closing
+import threading
+from contextlib import closing, contextmanager
 from base_logger import getlogger
-from typing import Optional, Annotated, Dict, Any, Callable, List
+from mie_trak_api.pool import ConnectionPool
+from mie_trak_api.backends import Backend, get_backend
+from mie_trak_api import instrumentation
+from typing import Optional, Annotated, Dict, Any, Callable, Iterator, List, Type
 from pydantic import BaseModel, Field, conint, constr, confloat
 from dotenv import load_dotenv
 
@@ -27,14 +32,67 @@ conn_type = "LIVE"  # WARNING: Change this to live when compiling
 LOGGER.info(f"Database conn: {conn_type}")
 DSN = os.getenv(conn_type)
 
+CACHE_DIR = os.getenv(
+    "RFQ_GEN_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".rfq_gen")
+)
+
+
+BACKEND: Backend = get_backend(DSN)
+LOGGER.info(f"Database backend: {BACKEND.name}")
+
+
+def _connect():
+    conn = BACKEND.connect()
+    instrumentation.note_connection_opened()
+    return conn
+
+
+def _create_pool() -> ConnectionPool:
+    return ConnectionPool(
+        _connect,
+        size=int(os.getenv("DB_POOL_SIZE", "5")),
+        idle_timeout=float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300")),
+        ping_after=float(os.getenv("DB_POOL_PING_AFTER", "30")),
+        commit=instrumentation.commit,
+    )
+
+
+POOL = _create_pool()
+
+
+def use_backend(backend: Backend) -> None:
+    """
+    Points every `with_db_conn` function at another backend, e.g. an offline
+    `SQLiteBackend` for profiling or tests. Pooled connections and cached schemas
+    of the previous backend are dropped.
+
+    :param backend: The backend to use from now on.
+    """
+    global BACKEND, POOL
+
+    POOL.close_all()
+    BACKEND = backend
+    POOL = _create_pool()
+    _forget_table_schemas()
+    LOGGER.info(f"Database backend: {BACKEND.name}")
+
 
 def with_db_conn(commit: bool = False):
     """
-    A decorator to manage database connections using pyodbc.
+    A decorator to manage database connections.
+
+    This decorator checks a connection out of the shared `POOL`, commits the
+    transaction if specified, and closes the cursor before handing the connection
+    back. If an error occurs, the transaction is rolled back, the error is logged
+    and the exception is propagated to be handled at a higher level.
 
-    This decorator automatically handles connection management, commits transactions
-    if specified, and properly closes the cursor and connection. If an error occurs,
-    it logs the error and propagates the exception to be handled at a higher level.
+    Pool size and idle behaviour are read from the `DB_POOL_SIZE`,
+    `DB_POOL_IDLE_TIMEOUT` and `DB_POOL_PING_AFTER` environment variables. The
+    database itself is picked by `DB_BACKEND` (see `backends.get_backend`).
+
+    While an `instrumentation.query_report` is active, each call's connect time,
+    execute time, statement count and fetched rows are recorded into it, and so is
+    every commit.
 
     :param commit: If True, commits the transaction after function execution.
     :type commit: bool
@@ -46,21 +104,18 @@ def with_db_conn(commit: bool = False):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             try:
-                with pyodbc.connect(DSN) as conn:
-                    with closing(conn.cursor()) as cursor:
-                        result = func(cursor, *args, **kwargs)
-
-                        if commit:
-                            conn.commit()
-
-                        return result
-            except pyodbc.OperationalError as vpn_err:
+                with instrumentation.track_call(func.__name__) as call:
+                    with POOL.connection(commit=commit) as conn:
+                        call.connected()
+                        with closing(conn.cursor()) as cursor:
+                            return func(call.wrap(cursor), *args, **kwargs)
+            except BACKEND.connection_errors as vpn_err:
                 error_msg = (
                     f"VPN not connected. Could not connect to the database.\n{vpn_err}"
                 )
                 LOGGER.error(error_msg)
                 raise RuntimeError(error_msg)
-            except pyodbc.Error as db_err:
+            except BACKEND.errors as db_err:
                 error_msg = f"Database Error in {func.__name__}: {db_err}"
                 LOGGER.error(error_msg)
                 raise RuntimeError(error_msg)
@@ -77,36 +132,420 @@ def with_db_conn(commit: bool = False):
     return decorator
 
 
+@contextmanager
+def unit_of_work() -> Iterator[Any]:
+    """
+    Runs a block of `with_db_conn` calls as a single database transaction.
+
+    While the block is active, every decorated function called on the same thread
+    joins this connection and transaction instead of committing on its own. The
+    transaction is committed once when the block exits normally and rolled back
+    once if it raises, so a failure part way through leaves nothing behind.
+
+    Usage::
+
+        with unit_of_work():
+            rfq_pk = request_for_quote.insert_into_rfq(...)
+            quote.create_quote_new(...)
+
+    :return: The connection shared by the unit of work.
+    :raises RuntimeError: If the connection cannot be opened or the commit fails.
+    """
+    try:
+        with POOL.connection(commit=True) as conn:
+            yield conn
+    except BACKEND.connection_errors as vpn_err:
+        error_msg = f"VPN not connected. Could not connect to the database.\n{vpn_err}"
+        LOGGER.error(error_msg)
+        raise RuntimeError(error_msg)
+    except BACKEND.errors as db_err:
+        error_msg = f"Database Error while committing unit of work: {db_err}"
+        LOGGER.error(error_msg)
+        raise RuntimeError(error_msg)
+
+
+def after_commit(callback: Callable[[], Any]) -> None:
+    """
+    Runs `callback` once the current transaction (e.g. the enclosing `unit_of_work`)
+    is committed, or right away outside of one. Nothing runs if it is rolled back.
+    """
+    POOL.after_commit(callback)
+
+
+def transaction_state() -> Optional[Dict[Any, Any]]:
+    """
+    Scratch space of the current transaction, e.g. for values that must not be seen
+    outside it before it commits; None outside of one. It is dropped with the
+    transaction, whether it commits or rolls back.
+    """
+    return POOL.transaction_state()
+
+
+def insert_returning_pk(
+    cursor: pyodbc.Cursor, table: str, values: Dict[str, Any], pk_column: str
+) -> int:
+    """
+    Inserts a single row and returns its generated primary key in the same round trip.
+
+    The SQL comes from the active backend; on SQL Server the key is captured with
+    `OUTPUT INSERTED ... INTO` a table variable, which is scoped to this statement
+    (unlike `IDENT_CURRENT`, which can return another session's row) and still
+    works on tables that have triggers.
+
+    :param cursor: Database cursor for executing queries.
+    :param table: Name of the table to insert into.
+    :param values: Column-value pairs of the new row.
+    :param pk_column: Name of the identity column to return.
+    :return: The primary key of the inserted row.
+    :raises ValueError: If the database does not return a primary key.
+    """
+    query = BACKEND.insert_returning_sql(table, list(values.keys()), [pk_column])
+    cursor.execute(query, tuple(values.values()))
+    result = cursor.fetchone()
+
+    if not result or result[0] is None:
+        raise ValueError(f"{table} PK was not returned by the database.")
+
+    return int(result[0])
+
+
+def insert_many_returning(
+    cursor: pyodbc.Cursor,
+    table: str,
+    columns: List[str],
+    rows: List[tuple],
+    returning: List[str],
+) -> List[tuple]:
+    """
+    Inserts many rows with multi-row VALUES statements and returns the `returning`
+    columns of every new row.
+
+    Rows are sent in as few statements as the backend's parameter and row limits
+    allow. The returned rows are not guaranteed to be in the order of `rows`, so
+    return a column that identifies each row.
+
+    :param cursor: Database cursor for executing queries.
+    :param table: Name of the table to insert into.
+    :param columns: Column names, in the order of the values of each row.
+    :param rows: One tuple of values per row.
+    :param returning: Integer columns to return, e.g. the identity column.
+    :return: One tuple of the `returning` values per inserted row.
+    :raises ValueError: If the database returns fewer rows than were inserted.
+    """
+    inserted = []
+
+    for chunk in chunked(rows, _rows_per_statement(columns)):
+        query = BACKEND.insert_returning_sql(table, columns, returning, rows=len(chunk))
+        cursor.execute(query, tuple(value for row in chunk for value in row))
+        returned = cursor.fetchall()
+
+        if len(returned) != len(chunk):
+            raise ValueError(
+                f"{table}: {len(chunk)} rows inserted but {len(returned)} returned by the database."
+            )
+        inserted.extend(tuple(int(value) for value in row) for row in returned)
+
+    return inserted
+
+
+def insert_select_returning(
+    cursor: pyodbc.Cursor,
+    table: str,
+    columns: List[str],
+    source: str,
+    params: tuple,
+    returning: List[str],
+) -> List[tuple]:
+    """
+    Inserts the rows of a SELECT and returns the `returning` columns of every new row,
+    in the same round trip.
+
+    :param cursor: Database cursor for executing queries.
+    :param table: Name of the table to insert into.
+    :param columns: Column names, in the order of the SELECT's columns.
+    :param source: The SELECT, without a trailing semicolon.
+    :param params: Parameters of the SELECT.
+    :param returning: Integer columns to return, e.g. the identity column. NULLs
+        are returned as None.
+    :return: One tuple of the `returning` values per inserted row, in no particular order.
+    """
+    query = BACKEND.insert_select_returning_sql(table, columns, source, returning)
+    cursor.execute(query, params)
+
+    return [
+        tuple(None if value is None else int(value) for value in row)
+        for row in cursor.fetchall()
+    ]
+
+
+def insert_if_absent(
+    cursor: pyodbc.Cursor,
+    table: str,
+    values: Dict[str, Any],
+    key_columns: List[str],
+    pk_column: str,
+) -> Optional[int]:
+    """
+    Inserts a row unless one with the same `key_columns` values exists, checking and
+    inserting in one statement.
+
+    On SQL Server the check holds a key-range lock until commit, so two sessions can
+    never both insert the same key; the second one waits and then skips.
+
+    :param cursor: Database cursor for executing queries.
+    :param table: Name of the table to insert into.
+    :param values: Column-value pairs of the new row; must include `key_columns`.
+    :param key_columns: Columns whose values must not exist yet.
+    :param pk_column: Name of the identity column to return.
+    :return: The primary key of the inserted row, or None if the key was taken.
+    """
+    query = BACKEND.insert_if_absent_sql(table, list(values), key_columns, [pk_column])
+    cursor.execute(
+        query,
+        tuple(values.values()) + tuple(values[column] for column in key_columns),
+    )
+    result = cursor.fetchone()
+
+    return int(result[0]) if result and result[0] is not None else None
+
+
+def lock_resource(cursor: pyodbc.Cursor, resource: str) -> None:
+    """
+    Holds an exclusive lock on `resource` until the transaction ends, so sessions
+    that read and then write the same thing (e.g. a MAX query and an INSERT above
+    it) take turns. Does nothing on backends that serialise writers.
+
+    :param cursor: Database cursor for executing queries.
+    :param resource: Name every session taking turns agrees on.
+    :raises RuntimeError: If the lock was not granted in time.
+    """
+    query = BACKEND.lock_resource_sql()
+    if query is None:
+        return
+
+    cursor.execute(query, (resource,))
+    result = cursor.fetchone()
+    if result is None or result[0] is None or result[0] < 0:
+        raise RuntimeError(f"Lock on '{resource}' not granted (result: {result}).")
+
+
+def max_number(cursor: pyodbc.Cursor, table: str, column: str, prefix: str) -> int:
+    """
+    Returns the largest integer that follows `prefix` in `column` (e.g. 12 for
+    "05-12"), computed on the server, or 0 if there is none.
+    """
+    cursor.execute(BACKEND.max_number_sql(table, column, prefix), (prefix + "%",))
+    result = cursor.fetchone()
+
+    return int(result[0]) if result and result[0] is not None else 0
+
+
+def insert_many(
+    cursor: pyodbc.Cursor, table: str, columns: List[str], rows: List[tuple]
+) -> None:
+    """
+    Inserts many rows with multi-row VALUES statements, in as few statements as the
+    backend's parameter and row limits allow.
+
+    :param cursor: Database cursor for executing queries.
+    :param table: Name of the table to insert into.
+    :param columns: Column names, in the order of the values of each row.
+    :param rows: One tuple of values per row.
+    """
+    column_names = ", ".join(columns)
+    row_placeholders = f"({', '.join(['?'] * len(columns))})"
+
+    for chunk in chunked(rows, _rows_per_statement(columns)):
+        values = ", ".join([row_placeholders] * len(chunk))
+        cursor.execute(
+            f"INSERT INTO {table} ({column_names}) VALUES {values};",
+            tuple(value for row in chunk for value in row),
+        )
+
+
+def _rows_per_statement(columns: List[str]) -> int:
+    return max(
+        1, min(BACKEND.max_insert_rows, BACKEND.max_parameters // max(len(columns), 1))
+    )
+
+
+def normalized_value(value: Any) -> Any:
+    """A column value as SQL Server compares it: without case or trailing spaces."""
+    return value.rstrip().lower() if isinstance(value, str) else value
+
+
+def chunked(values: List[Any], size: int) -> Iterator[List[Any]]:
+    """Splits a list into consecutive lists of at most `size` items."""
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+def cache_path(filename: str) -> str:
+    """
+    Returns the path of a file in the local cache directory, creating the directory if needed.
+
+    The directory defaults to `~/.rfq_gen` and can be moved with the `RFQ_GEN_CACHE_DIR`
+    environment variable.
+
+    :param filename: Name of the cache file.
+    :return: Absolute path of the cache file.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, filename)
+
+
+SCHEMA_CACHE_FILE = "table_schemas_{backend}.json"
+SCHEMA_CACHE_VERSION = 1
+
+_schema_cache: Dict[str, List[Dict[str, Any]]] = {}
+_schema_cache_lock = threading.Lock()
+_schema_cache_restored = False
+
+
+def get_table_schema(table_name: str) -> List[Dict[str, Any]]:
+    """
+    Returns the column definitions of a table, cached per process and on disk.
+
+    Lookups are answered from memory after the first one. On the first lookup of a
+    process, the schemas stored on disk by earlier launches are validated against
+    the backend's schema fingerprints (table modify dates on SQL Server) in a
+    single query and reused when unchanged, so an
+    unchanged schema is never read from INFORMATION_SCHEMA again.
+
+    :param table_name: Name of the table, case-insensitive.
+    :return: One dict per column with `column_name`, `data_type`, `max_length` and `is_nullable`.
+    """
+    schema = _schema_cache.get(table_name.lower())
+    if schema is None:
+        schema = _load_table_schema(table_name)
+
+    return [dict(column) for column in schema]
+
+
+def clear_table_schema_cache() -> None:
+    """Forgets every cached table schema, in memory and on disk."""
+    with _schema_cache_lock:
+        _forget_table_schemas()
+        try:
+            os.remove(cache_path(SCHEMA_CACHE_FILE.format(backend=BACKEND.name)))
+        except FileNotFoundError:
+            pass
+
+
+def _forget_table_schemas() -> None:
+    global _schema_cache_restored
+
+    _schema_cache.clear()
+    _schema_cache_restored = False
+
+
 @with_db_conn()
-def get_table_schema(cursor, table_name: str) -> List[Dict[str, Any]]:
-    """
-    [TODO:description]
-
-    :param table_name: [TODO:description]
-    """
-    query = f"""
-    SELECT 
-        COLUMN_NAME, 
-        DATA_TYPE, 
-        CHARACTER_MAXIMUM_LENGTH, 
-        IS_NULLABLE 
-    FROM INFORMATION_SCHEMA.COLUMNS 
-    WHERE TABLE_NAME = ?
-    """
-    cursor.execute(query, (table_name,))
-    schema = []
-
-    for row in cursor.fetchall():
-        schema.append(
-            {
-                "column_name": row.COLUMN_NAME,
-                "data_type": row.DATA_TYPE,
-                "max_length": row.CHARACTER_MAXIMUM_LENGTH,
-                "is_nullable": row.IS_NULLABLE == "YES",
-            }
+def _load_table_schema(cursor, table_name: str) -> List[Dict[str, Any]]:
+    global _schema_cache_restored
+
+    key = table_name.lower()
+    with _schema_cache_lock:
+        if not _schema_cache_restored:
+            _restore_schema_cache(cursor)
+            _schema_cache_restored = True
+
+        if key in _schema_cache:
+            return _schema_cache[key]
+
+        fingerprint = BACKEND.schema_fingerprints(cursor, [key]).get(key)
+        schema = BACKEND.fetch_table_schema(cursor, table_name)
+
+        _schema_cache[key] = schema
+        if fingerprint is not None:
+            _store_schema_cache(key, fingerprint, schema)
+
+        return schema
+
+
+def _read_schema_cache_file() -> Dict[str, Any]:
+    try:
+        with open(cache_path(SCHEMA_CACHE_FILE.format(backend=BACKEND.name)), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if data.get("version") != SCHEMA_CACHE_VERSION:
+        return {}
+
+    return data.get("tables", {})
+
+
+def _restore_schema_cache(cursor) -> None:
+    """Loads schemas stored by earlier launches whose fingerprint still matches."""
+    stored = _read_schema_cache_file()
+    if not stored:
+        return
+
+    fingerprints = BACKEND.schema_fingerprints(cursor, list(stored))
+    for key, entry in stored.items():
+        if fingerprints.get(key) == entry.get("fingerprint"):
+            _schema_cache[key] = entry["schema"]
+
+    LOGGER.debug(
+        f"Restored {len(_schema_cache)} of {len(stored)} cached table schemas."
+    )
+
+
+def _store_schema_cache(key: str, fingerprint: str, schema: List[Dict[str, Any]]):
+    tables = _read_schema_cache_file()
+    tables[key] = {"fingerprint": fingerprint, "schema": schema}
+
+    path = cache_path(SCHEMA_CACHE_FILE.format(backend=BACKEND.name))
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": SCHEMA_CACHE_VERSION, "tables": tables}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        LOGGER.warning(f"Could not write table schema cache: {e}")
+
+
+SCHEMA_ARTIFACT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schemas")
+
+
+def load_schema_artifact(table_name: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Loads a prebuilt table schema shipped with the app.
+
+    Artifacts are written offline by `mie_trak_api.build_schemas` and let models be
+    built without touching the database.
+
+    :param table_name: Name of the table, case-insensitive.
+    :return: The stored column definitions, or None if no artifact exists.
+    """
+    path = os.path.join(SCHEMA_ARTIFACT_DIR, f"{table_name.lower()}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["schema"]
+    except FileNotFoundError:
+        LOGGER.info(f"No prebuilt schema artifact for {table_name}; see build.py.")
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        LOGGER.warning(f"Ignoring unreadable schema artifact {path}: {e}")
+        return None
+
+
+def write_schema_artifact(table_name: str) -> str:
+    """
+    Reads a table schema from the database and writes it as a prebuilt artifact.
+
+    :param table_name: Name of the table, case-insensitive.
+    :return: Path of the written artifact.
+    """
+    os.makedirs(SCHEMA_ARTIFACT_DIR, exist_ok=True)
+    path = os.path.join(SCHEMA_ARTIFACT_DIR, f"{table_name.lower()}.json")
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"table": table_name, "schema": get_table_schema(table_name)}, f, indent=2
         )
 
-    return schema
+    return path
 
 
 SQL_TO_PYDANTIC = {
@@ -127,15 +566,20 @@ SQL_TO_PYDANTIC = {
 }
 
 
-def create_pydantic_model(table_name: str):
+def create_pydantic_model(
+    table_name: str, schema: Optional[List[Dict[str, Any]]] = None
+) -> Type[BaseModel]:
     """
-    [TODO:description]
+    Builds a Pydantic model that validates rows of a table.
 
-    :param table_name: [TODO:description]
-    :param schema: [TODO:description]
+    :param table_name: Name of the table the model is built for.
+    :param schema: Column definitions as returned by `get_table_schema`. If not
+        given, the schema is read with `get_table_schema`, which needs the database.
+    :return: A `BaseModel` subclass with one field per column.
     """
 
-    schema = get_table_schema(table_name)
+    if schema is None:
+        schema = get_table_schema(table_name)
 
     annotations = {}
     for column in schema:
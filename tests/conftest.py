@@ -0,0 +1,16 @@
+import pytest
+from mie_trak_api import backends, catalog, utils
+
+
+@pytest.fixture
+def offline_db(tmp_path, monkeypatch):
+    """
+    Points every `with_db_conn` function at a fresh in-memory `SQLiteBackend`, with
+    the local cache files (e.g. table schemas) written under `tmp_path`.
+    """
+    monkeypatch.setattr(utils, "CACHE_DIR", str(tmp_path / "cache"))
+    previous = utils.BACKEND
+    utils.use_backend(backends.SQLiteBackend())
+    yield
+    catalog.OUTSIDE_PROCESSING_ITEMS.clear()
+    utils.use_backend(previous)
@@ -0,0 +1,62 @@
+import pytest
+from mie_trak_api import bom, instrumentation, utils
+
+
+@utils.with_db_conn()
+def fetch_lines(cursor, quote_fk):
+    columns = ", ".join(bom.BOM_COLUMNS)
+    cursor.execute(
+        f"SELECT {columns} FROM QuoteAssembly WHERE QuoteFK = ? ORDER BY OrderBy",
+        (quote_fk,),
+    )
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+def test_writer_matches_single_inserts(offline_db):
+    lines = [
+        (6, 11, 6, 1, {"PartLength": 2.5, "PartWidth": 1.0, "Thickness": 0.25}),
+        (7, 12, 21, 2, {}),
+        (8, 13, 24, 3, {"QuantityRequired": 4}),
+    ]
+
+    for item_fk, qa_fk, seq, order_by, kwargs in lines:
+        bom.create_bom_quote(1000, item_fk, qa_fk, seq, order_by, **kwargs)
+
+    with instrumentation.query_report("bom", write=False) as report:
+        with bom.BomWriter() as writer:
+            for item_fk, qa_fk, seq, order_by, kwargs in reversed(lines):
+                writer.add(2000, item_fk, qa_fk, seq, order_by, **kwargs)
+
+    assert report.summary()["functions"]["write_bom_lines"]["calls"] == 1
+    assert [line[1:] for line in fetch_lines(2000)] == [
+        line[1:] for line in fetch_lines(1000)
+    ]
+
+
+def test_writer_accepts_other_columns(offline_db):
+    with instrumentation.query_report("bom", write=False) as report:
+        with bom.BomWriter() as writer:
+            writer.add(4000, 7, 21, 6, 2)
+            writer.add(4000, 6, 11, 6, 1, Description="Dowel", RunTime=1.5)
+
+    assert report.summary()["functions"]["write_bom_lines"]["calls"] == 1
+
+    @utils.with_db_conn()
+    def fetch(cursor):
+        cursor.execute(
+            "SELECT ItemFK, Description, RunTime FROM QuoteAssembly"
+            " WHERE QuoteFK = ? ORDER BY OrderBy",
+            (4000,),
+        )
+        return [tuple(row) for row in cursor.fetchall()]
+
+    assert fetch() == [(6, "Dowel", 1.5), (7, None, None)]
+
+
+def test_writer_discards_lines_on_error(offline_db):
+    with pytest.raises(RuntimeError):
+        with bom.BomWriter() as writer:
+            writer.add(3000, 1, 1, 6, 1)
+            raise RuntimeError("part failed")
+
+    assert fetch_lines(3000) == []
@@ -0,0 +1,39 @@
+from app.bom_tree import BomTree
+
+
+def part(part_number, assy_for=""):
+    return {"part_number": part_number, "assy_for": assy_for}
+
+
+def test_duplicates_keep_their_part_number():
+    tree = BomTree(
+        {
+            "P001": part("P001"),
+            "P001_____1": part("P001"),
+            "Tool-3": part(""),
+        }
+    )
+
+    assert [node.part_number for node in tree] == ["P001", "P001", "Tool-3"]
+    assert [node.occurrence for node in tree] == [0, 1, 0]
+    assert tree.occurrences("P001") == 2
+    assert tree.first("P001").key == "P001"
+
+
+def test_parent_is_closest_row_above_or_first_below():
+    tree = BomTree(
+        {
+            "S001": part("S001", assy_for="A001"),
+            "A001": part("A001", assy_for="P001"),
+            "P001": part("P001"),
+            "P001_____1": part("P001"),
+            "A002": part("A002", assy_for="P001"),
+        }
+    )
+    s001, a001, p001, p001_dup, a002 = tree.nodes
+
+    assert s001.parent is a001
+    assert a001.parent is p001
+    assert a002.parent is p001_dup
+    assert p001.children == [a001]
+    assert tree.roots == [p001, p001_dup]
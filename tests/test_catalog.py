@@ -0,0 +1,43 @@
+from app.controller import finish_code_item
+from mie_trak_api import catalog, instrumentation, item
+
+
+PASSIVATE = finish_code_item("Passivate per AMS 2700")
+ANODIZE = finish_code_item("Anodize per MIL-A-8625")
+
+
+def test_catalog_answers_known_finishes(offline_db):
+    passivate = item.get_or_create_item(**PASSIVATE)
+    item.get_or_create_item(PartNumber="6061-T6", ItemTypeFK=2)
+
+    catalog.OUTSIDE_PROCESSING_ITEMS.load_in_background().join()
+    assert len(catalog.OUTSIDE_PROCESSING_ITEMS) == 1
+
+    with instrumentation.query_report("catalog", write=False) as report:
+        found = item.get_or_create_item(
+            **{**PASSIVATE, "PartNumber": "passivate per ams 2700 "}
+        )
+        assert item.resolve_items([PASSIVATE]) == {PASSIVATE["PartNumber"]: passivate}
+    assert found == passivate
+    functions = report.summary()["functions"]
+    assert "get_or_create_item" not in functions
+    assert functions["resolve_items"]["statements"] == 0
+
+    # other types, unheld columns and None values still go to the database
+    assert catalog.find_item({"PartNumber": "6061-T6", "ItemTypeFK": 2}) is None
+    assert catalog.find_item({**PASSIVATE, "Thickness": 1}) is None
+    assert catalog.find_item({**PASSIVATE, "Comment": None}) is None
+
+
+def test_catalog_refreshes_incrementally(offline_db):
+    item.get_or_create_item(**PASSIVATE)
+    assert catalog.OUTSIDE_PROCESSING_ITEMS.refresh() == 1
+
+    anodize = item.get_or_create_item(**ANODIZE)
+    assert catalog.find_item(ANODIZE) is None
+    assert catalog.OUTSIDE_PROCESSING_ITEMS.refresh() == 1
+    assert catalog.OUTSIDE_PROCESSING_ITEMS.refresh() == 0
+    assert catalog.find_item(ANODIZE) == anodize
+
+    item.update_item(anodize, Comment="changed")
+    assert catalog.find_item(ANODIZE) is None
@@ -0,0 +1,334 @@
+import os
+import threading
+import time
+
+import pytest
+from app import controller
+from app.bom_tree import BomTree
+from mie_trak_api import instrumentation, item, quote, router, utils
+
+
+def test_run_pipelines_keeps_task_order(offline_db):
+    threads = set()
+
+    def task(n):
+        def run():
+            time.sleep(0.01 * (5 - n))  # later tasks finish first
+            threads.add(threading.current_thread().name)
+            return n
+
+        return run
+
+    assert controller.run_pipelines([task(n) for n in range(5)], workers=3) == [
+        0,
+        1,
+        2,
+        3,
+        4,
+    ]
+    assert len(threads) > 1
+    assert all(name.startswith("rfq-part") for name in threads)
+
+
+def test_run_pipelines_raises_first_failure(offline_db):
+    started = []
+
+    def fail():
+        raise ValueError("bad part")
+
+    def slow(n):
+        def run():
+            started.append(n)
+            time.sleep(0.05)
+            return n
+
+        return run
+
+    with pytest.raises(ValueError, match="bad part"):
+        controller.run_pipelines([fail] + [slow(n) for n in range(10)], workers=2)
+    assert len(started) < 10  # the tasks still queued were cancelled
+
+
+@utils.with_db_conn()
+def _count(cursor, query, params):
+    cursor.execute(query, params)
+    return cursor.fetchone()[0]
+
+
+def test_discard_quotes_keeps_committed_items(offline_db):
+    with utils.unit_of_work():
+        part = item.get_or_create_item(PartNumber="P001", ItemTypeFK=7)
+        quote_pk = quote.create_quote_new(1, part, 0, "P001")
+        quote.copy_operations_to_quote(quote_pk)
+
+    controller.discard_quotes([quote_pk])
+
+    assert _count("SELECT COUNT(*) FROM Quote WHERE QuotePK = ?", (quote_pk,)) == 0
+    assert _count("SELECT COUNT(*) FROM QuoteAssembly WHERE QuoteFK = ?", (quote_pk,)) == 0
+    assert _count("SELECT COUNT(*) FROM Item WHERE ItemPK = ?", (part,)) == 1
+
+
+def test_discard_quotes_reports_what_it_could_not_delete(offline_db, monkeypatch):
+    def fail(quote_pks):
+        raise RuntimeError("locked")
+
+    monkeypatch.setattr(quote, "delete_quotes", fail)
+    with pytest.raises(RuntimeError, match=r"QuotePKs \[7, 8\]"):
+        controller.discard_quotes([7, 8])
+
+
+def test_part_workers_never_exceed_the_pool(offline_db, monkeypatch):
+    monkeypatch.setattr(controller, "PART_WORKERS", utils.POOL.size + 3)
+    assert controller.part_workers() == utils.POOL.size
+
+    threads = set()
+
+    def task():
+        threads.add(threading.current_thread().name)
+        time.sleep(0.01)
+
+    controller.run_pipelines([task] * 20, workers=utils.POOL.size + 3)
+    assert len(threads) <= utils.POOL.size
+
+
+def test_shared_items_are_resolved_up_front(offline_db):
+    bom_tree = BomTree(
+        {
+            "A001": {"part_number": "A001", "finish_code": "Anodize\nPassivate"},
+            "T001": {
+                "part_number": "T001",
+                "assy_for": "A001",
+                "hardware_or_supplies": "Tooling",
+                "description": "Fixture",
+            },
+            "H001": {
+                "part_number": "H001",
+                "assy_for": "A001",
+                "hardware_or_supplies": "Hardware",
+                "description": "Dowel pin",
+            },
+        }
+    )
+
+    with item.memoized_items():
+        controller.create_tooling_items(bom_tree)
+        controller.resolve_shared_items(bom_tree)
+        with instrumentation.query_report("shared", write=False) as report:
+            item.get_or_create_item(**controller.finish_code_item("Passivate"))
+            item.get_or_create_item(**controller.tooling_item("T001", "Fixture"))
+            item.check_and_create_tooling("Dowel pin")
+
+    assert report.summary()["total_round_trips"] == 0
+
+
+def test_tooling_items_commit_on_their_own(offline_db):
+    bom_tree = BomTree(
+        {
+            "A001": {"part_number": "A001"},
+            "H001": {
+                "part_number": "H001",
+                "assy_for": "A001",
+                "hardware_or_supplies": "Hardware",
+                "description": "Dowel pin",
+            },
+            "H002": {
+                "part_number": "H002",
+                "assy_for": "A001",
+                "hardware_or_supplies": "Hardware",
+                "description": "Socket screw",
+            },
+        }
+    )
+
+    with instrumentation.query_report("tooling", write=False) as report:
+        controller.create_tooling_items(bom_tree)
+
+    # one short transaction per new tooling number
+    assert report.summary()["functions"]["commit"]["calls"] == 2
+
+
+def test_copy_documents_copies_each_pair_once(tmp_path, monkeypatch):
+    drawing = tmp_path / "P001_dwg.pdf"
+    model = tmp_path / "P001.step"
+    drawing.write_text("drawing")
+    model.write_text("model")
+    files = [str(drawing), str(model), str(drawing)]
+
+    copied = []
+
+    def transfer(copies):
+        copied.extend(copies)
+        return [f"{folder}/{file.rsplit('/', 1)[-1]}" for file, folder in copies]
+
+    monkeypatch.setattr(controller, "transfer_files", transfer)
+    documents = controller.copy_documents(
+        {
+            "P001": (files, "pdm/P001"),
+            "P001_____1": (files, "pdm/P001"),
+            "P002": (files, "pdm/P002"),
+        }
+    )
+
+    assert len(copied) == 4
+    assert documents["P001"] == documents["P001_____1"]
+    assert documents["P002"] == {
+        "pdm/P002/P001_dwg.pdf": 27,
+        "pdm/P002/P001.step": 30,
+    }
+
+
+def test_copy_documents_copies_each_destination_once(tmp_path, monkeypatch):
+    first = tmp_path / "a" / "P001.pdf"
+    second = tmp_path / "b" / "P001.pdf"
+    for source in (first, second):
+        source.parent.mkdir()
+        source.write_text(source.parent.name)
+
+    copied = []
+    transfer = controller.transfer_files
+    monkeypatch.setattr(
+        controller, "transfer_files", lambda copies: copied.extend(copies) or transfer(copies)
+    )
+    folder = str(tmp_path / "pdm" / "P001")
+    documents = controller.copy_documents(
+        {"P001": ([str(first)], folder), "P001_____1": ([str(second)], folder)}
+    )
+
+    destination = os.path.join(folder, "P001.pdf")
+    assert copied == [(str(second), folder)]  # the last file listed, as when copied in turn
+    assert open(destination).read() == "b"
+    assert list(documents["P001"]) == list(documents["P001_____1"]) == [destination]
+
+
+@utils.with_db_conn()
+def fetch_all(cursor, query, params=()):
+    cursor.execute(query, params)
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+def test_finish_routers_are_created_in_bulk(offline_db):
+    finishes = [
+        (f"Passivate\nAnodize {n}", 100 + n, f"P{n:03} - OP Finish") for n in range(20)
+    ]
+    finishes.append(("Passivate", 100, "P000 - OP Finish"))  # same finish item again
+
+    with instrumentation.query_report("routers", write=False) as report:
+        controller.create_finish_routers(finishes)
+    functions = report.summary()["functions"]
+    assert "get_or_create_item" not in functions
+    assert functions["create_routers"]["calls"] == 1
+    assert functions["create_router_work_centers"]["calls"] == 1
+
+    routers = fetch_all("SELECT RouterPK, ItemFK, PartNumber FROM Router ORDER BY RouterPK")
+    assert [row[1:] for row in routers] == [(pk, pn) for _, pk, pn in finishes]
+
+    passivate = item.get_or_create_item(**controller.finish_code_item("Passivate"))
+    work_centers = fetch_all(
+        "SELECT ItemFK, OrderBy FROM RouterWorkCenter WHERE RouterFK = ? ORDER BY OrderBy",
+        (routers[3][0],),
+    )
+    anodize = item.get_or_create_item(**controller.finish_code_item("Anodize 3"))
+    assert work_centers == [(passivate, 1), (anodize, 2)]
+    assert len(fetch_all("SELECT * FROM RouterWorkCenter")) == 20 * 2 + 1
+
+
+def test_finish_routers_keep_blank_lines(offline_db):
+    controller.create_finish_routers([("Passivate\n\nAnodize\n", 100, "P001 - OP Finish")])
+
+    blank = item.get_or_create_item(**controller.finish_code_item(""))
+    passivate = item.get_or_create_item(**controller.finish_code_item("Passivate"))
+    anodize = item.get_or_create_item(**controller.finish_code_item("Anodize"))
+    assert fetch_all("SELECT ItemFK, OrderBy FROM RouterWorkCenter ORDER BY OrderBy") == [
+        (passivate, 1),
+        (blank, 2),
+        (anodize, 3),
+        (blank, 4),
+    ]
+
+
+def test_finish_routers_reuse_shared_items(offline_db):
+    bom_tree = BomTree(
+        {
+            "P001": {"part_number": "P001", "finish_code": "Passivate\nAnodize"},
+            "P002": {"part_number": "P002", "finish_code": "Anodize"},
+        }
+    )
+
+    with item.memoized_items():
+        finish_pks = controller.resolve_shared_items(bom_tree)
+        with instrumentation.query_report("routers", write=False) as report:
+            controller.create_finish_routers(
+                [
+                    ("Passivate\nAnodize", 100, "P001 - OP Finish"),
+                    ("Anodize", 101, "P002 - OP Finish"),
+                ],
+                finish_pks,
+            )
+
+    assert "resolve_items" not in report.summary()["functions"]
+    assert fetch_all("SELECT ItemFK FROM RouterWorkCenter ORDER BY RouterWorkCenterPK") == [
+        (finish_pks["Passivate"],),
+        (finish_pks["Anodize"],),
+        (finish_pks["Anodize"],),
+    ]
+
+
+def test_create_routers_keeps_order(offline_db):
+    pks = router.create_routers([(5, "A"), (6, "B"), (5, "C")])
+    assert fetch_all("SELECT RouterPK, ItemFK, PartNumber FROM Router ORDER BY RouterPK") == [
+        (pks[0], 5, "A"),
+        (pks[1], 6, "B"),
+        (pks[2], 5, "C"),
+    ]
+
+
+def test_create_rfq_follows_node_parents(offline_db):
+    bom_tree = BomTree(
+        {
+            "P001": {"part_number": "P001", "assy_for": "", "quantity_required": 2},
+            "A001": {"part_number": "A001", "assy_for": "P001"},
+            "S001": {"part_number": "S001", "assy_for": "A001"},
+            "A001_____1": {"part_number": "A001", "assy_for": "P001"},
+            "H001": {
+                "part_number": "H001",
+                "assy_for": "A001",
+                "hardware_or_supplies": "Hardware",
+            },
+        }
+    )
+    parts = [node for node in bom_tree if not node.data.get("hardware_or_supplies")]
+    item_pks = {node.key: item.get_or_create_item(PartNumber=node.part_number) for node in parts}
+    quote_pks = {
+        node.key: quote.create_quote_new(1, item_pks[node.key], 0, node.part_number)
+        for node in parts
+    }
+
+    controller.create_rfq(quote_pks, item_pks, 7, bom_tree)
+
+    assert fetch_all("SELECT ItemFK, QuoteFK, Quantity FROM RequestForQuoteLine") == [
+        (item_pks["P001"], quote_pks["P001"], 2)
+    ]
+    assemblies = fetch_all(
+        """
+        SELECT QuoteAssemblyPK, ItemQuoteFK, QuoteFK, ParentQuoteFK, ParentQuoteAssemblyFK
+        FROM QuoteAssembly WHERE ItemQuoteFK IS NOT NULL ORDER BY QuoteAssemblyPK
+        """
+    )
+    # each A001 row keeps its own quote; S001 hangs under the first one
+    a001, s001, a001_dup = assemblies
+    assert a001[1:] == (quote_pks["A001"], quote_pks["P001"], None, None)
+    assert s001[1:] == (quote_pks["S001"], quote_pks["P001"], quote_pks["A001"], a001[0])
+    assert a001_dup[1:] == (quote_pks["A001_____1"], quote_pks["P001"], None, None)
+
+
+def test_create_rfq_rejects_assembly_cycles(offline_db):
+    bom_tree = BomTree(
+        {
+            "P001": {"part_number": "P001", "assy_for": ""},
+            "A001": {"part_number": "A001", "assy_for": "A002"},
+            "A002": {"part_number": "A002", "assy_for": "A001"},
+        }
+    )
+
+    with pytest.raises(ValueError):
+        controller.create_rfq({}, {}, 7, bom_tree)
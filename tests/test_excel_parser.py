@@ -2,7 +2,14 @@ import pandas as pd
 import pytest
 from pprint import pprint
 from pathlib import Path
-from src.rfq_gen.app.excel_parser import create_dict_from_excel_new
+from app import excel_parser
+from app.excel_parser import (
+    create_bom_tree_from_excel,
+    create_dict_from_excel_cached,
+    create_dict_from_excel_new,
+    iter_parts_from_excel,
+    _validate_parts,
+)
 
 
 # Helper function: write a DataFrame to a temporary Excel file.
@@ -226,3 +233,174 @@ def test_stop_on_blank_row(tmp_path: Path):
     # P003 and P004 should not be present because they come after the stopping point.
     assert "P003" not in result
     assert "P004" not in result
+
+
+def test_validation_errors_name_each_failing_row():
+    """
+    Test that a batch validation failure still reports every failing row
+    with its 1-based row number, like row by row validation did.
+    """
+    valid = {
+        "part_number": "P001",
+        "description": None,
+        "material": None,
+        "finish_code": None,
+        "heat_treat": None,
+        "drawing_number": None,
+        "drawing_revision": None,
+        "quantity_required": 1,
+        "pl_revision": None,
+        "assy_for": "",
+        "hardware_or_supplies": None,
+    }
+    invalid = {**valid, "quantity_required": "many"}
+
+    assert _validate_parts([valid])[0]["part_number"] == "P001"
+
+    with pytest.raises(ValueError) as excinfo:
+        _validate_parts([valid, invalid, valid, invalid])
+
+    message = str(excinfo.value)
+    assert message.startswith("Data validation failed:\nRow 2: 1 validation error for PartData")
+    assert "Row 4:" in message
+    assert "Row 1:" not in message
+
+
+def test_stream_matches_batch(tmp_path: Path):
+    """
+    Test that streaming mode returns the same dictionary as the default mode,
+    including numeric cells, missing values, duplicates and the blank-row cutoff.
+    """
+    row = {
+        "Part": "P001",
+        "DESCRIPTION": " Part ",
+        "PartLength": 5,
+        "Thickness": 0.5,
+        "PartWidth": "3",
+        "Weight": "N/A",
+        "Material": "Steel",
+        "FinishCode": None,
+        "HeatTreat": "",
+        "DrawingNumber": 1001,
+        "DrawingRevision": "A",
+        "QuantityRequired": 2.0,
+        "PLRevision": None,
+        "AssyFor": None,
+        "Hardware/Tooling": None,
+        "StockLength": "abc",
+        "StockWidth": "1e2",
+        "StockThickness": None,
+    }
+    blank_row = {key: None for key in row}
+    assembly = {**row, "Part": "A001", "AssyFor": "P001"}
+    rows = [row, {**row, "Part": None}, assembly, row, blank_row, row]
+    file_path = create_excel_file(tmp_path, pd.DataFrame(rows, columns=list(row)))
+
+    result = create_dict_from_excel_new(file_path, stream=True)
+
+    assert result == create_dict_from_excel_new(file_path)
+    assert list(result) == ["P001", "Tool-2", "A001", "P001_____1"]
+
+
+def test_stream_reports_missing_columns_on_first_read(tmp_path: Path):
+    """
+    Test that streaming mode checks the header as soon as iteration starts.
+    """
+    file_path = create_excel_file(tmp_path, pd.DataFrame({"Part": ["P001"]}))
+
+    parts = iter_parts_from_excel(file_path)
+
+    with pytest.raises(ValueError, match="Missing required columns: DESCRIPTION"):
+        next(parts)
+
+
+def test_parse_cache_skips_excel_decoding(tmp_path: Path, monkeypatch):
+    """
+    Test that a second parse of the same workbook comes from the cache, and that
+    changing the parser version misses it.
+    """
+    monkeypatch.setattr("mie_trak_api.utils.CACHE_DIR", str(tmp_path / "cache"))
+    data = {column: ["1"] for column in excel_parser.REQUIRED_COLUMNS}
+    data["AssyFor"] = [""]
+    file_path = create_excel_file(tmp_path, pd.DataFrame(data))
+
+    first = create_dict_from_excel_cached(file_path)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("workbook was parsed again")
+
+    monkeypatch.setattr(excel_parser, "create_dict_from_excel_new", fail)
+    assert create_dict_from_excel_cached(file_path) == first
+
+    monkeypatch.setattr(excel_parser, "PARSER_VERSION", excel_parser.PARSER_VERSION + 1)
+    excel_parser._parse_cache_salt.cache_clear()
+    try:
+        with pytest.raises(AssertionError):
+            create_dict_from_excel_cached(file_path)
+    finally:
+        excel_parser._parse_cache_salt.cache_clear()
+
+
+def test_parse_cache_evicts_least_recently_used(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr("mie_trak_api.utils.CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(excel_parser, "PARSE_CACHE_SIZE", 2)
+
+    for part in ["P001", "P002", "P003"]:
+        data = {column: ["1"] for column in excel_parser.REQUIRED_COLUMNS}
+        data.update({"Part": [part], "AssyFor": [""]})
+        file = tmp_path / f"{part}.xlsx"
+        pd.DataFrame(data).to_excel(file, index=False)
+        create_dict_from_excel_cached(str(file))
+
+    cached = list((tmp_path / "cache" / "parsed_excel").glob("*.bin"))
+    assert len(cached) == 2
+
+
+def test_bom_tree_from_excel(tmp_path: Path, monkeypatch):
+    """
+    Test that the parser links each row to its parent assembly, keeping repeated
+    part numbers as separate nodes.
+    """
+    monkeypatch.setattr("mie_trak_api.utils.CACHE_DIR", str(tmp_path / "cache"))
+    data = {column: ["1"] * 4 for column in excel_parser.REQUIRED_COLUMNS}
+    data["Part"] = ["P001", "A001", "S001", "A001"]
+    data["AssyFor"] = ["", "P001", "A001", "P001"]
+    data["Hardware/Tooling"] = [""] * 4
+    file_path = create_excel_file(tmp_path, pd.DataFrame(data))
+
+    tree = create_bom_tree_from_excel(file_path)
+    p001, a001, s001, a001_dup = tree.nodes
+
+    assert [node.key for node in tree] == ["P001", "A001", "S001", "A001_____1"]
+    assert a001_dup.part_number == "A001"
+    assert s001.parent is a001
+    assert p001.children == [a001, a001_dup]
+    assert tree.roots == [p001]
+
+
+def test_bom_tree_streams_large_files(tmp_path: Path, monkeypatch):
+    """
+    Test that workbooks over `STREAM_ABOVE_BYTES` are read row by row.
+    """
+    monkeypatch.setattr("mie_trak_api.utils.CACHE_DIR", str(tmp_path / "cache"))
+    data = {column: ["1"] for column in excel_parser.REQUIRED_COLUMNS}
+    data["Part"] = ["P001"]
+    data["AssyFor"] = [""]
+    data["Hardware/Tooling"] = [""]
+    file_path = create_excel_file(tmp_path, pd.DataFrame(data))
+
+    streamed = []
+    stream_parts = excel_parser.iter_parts_from_excel
+
+    def iter_parts(filepath):
+        for part in stream_parts(filepath):
+            streamed.append(part.part_number)
+            yield part
+
+    monkeypatch.setattr(excel_parser, "iter_parts_from_excel", iter_parts)
+    monkeypatch.setattr(excel_parser, "STREAM_ABOVE_BYTES", 0)
+
+    tree = create_bom_tree_from_excel(file_path)
+
+    assert streamed == ["P001"]
+    assert [node.key for node in tree] == ["P001"]
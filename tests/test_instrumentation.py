@@ -0,0 +1,103 @@
+import json
+import time
+from pathlib import Path
+from mie_trak_api import instrumentation
+
+
+class FakeCursor:
+    def __init__(self):
+        self.fast_executemany = False
+
+    def execute(self, *args):
+        return self
+
+    def fetchall(self):
+        return [(1,), (2,), (3,)]
+
+    def fetchone(self):
+        return (1,)
+
+
+def run_call(name, statements=1):
+    with instrumentation.track_call(name) as call:
+        call.connected()
+        cursor = call.wrap(FakeCursor())
+        for _ in range(statements):
+            cursor.execute("SELECT 1").fetchall()
+        return cursor
+
+
+def test_no_report_leaves_cursor_untouched():
+    cursor = FakeCursor()
+    with instrumentation.track_call("get_item") as call:
+        assert call.wrap(cursor) is cursor
+
+
+def test_report_aggregates_calls(tmp_path: Path):
+    with instrumentation.query_report("RFQ_1", write=False) as report:
+        run_call("get_or_create_item", statements=2)
+        run_call("get_or_create_item")
+        cursor = run_call("create_quote_new")
+        cursor.fast_executemany = True
+
+    summary = report.summary()
+
+    assert summary["status"] == "ok"
+    assert summary["calls"] == 3
+    assert summary["total_round_trips"] == 4
+    assert summary["rows_fetched"] == 12
+    assert summary["functions"]["get_or_create_item"]["calls"] == 2
+    assert summary["functions"]["get_or_create_item"]["statements"] == 3
+    assert summary["p50_ms"] <= summary["p95_ms"]
+
+    path = report.write(str(tmp_path))
+    assert json.loads(Path(path).read_text())["label"] == "RFQ_1"
+
+
+def test_calls_outside_report_are_not_recorded():
+    with instrumentation.query_report("RFQ_2", write=False) as report:
+        pass
+    run_call("get_item")
+
+    assert report.summary()["calls"] == 0
+
+
+class FakeConnection:
+    def __init__(self):
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_nested_calls_are_not_counted_twice():
+    with instrumentation.query_report("RFQ_3", write=False) as report:
+        with instrumentation.track_call("get_or_create_item"):
+            time.sleep(0.02)
+            run_call("get_item")
+            with instrumentation.track_call("insert_item"):
+                time.sleep(0.02)
+
+    summary = report.summary()
+    assert summary["calls"] == 3
+    assert summary["nested_calls"] == 2
+    assert summary["functions"]["get_or_create_item"]["nested_calls"] == 0
+    # self times of the three calls add up to no more than the time the block took
+    assert 40 <= summary["total_ms"] <= summary["wall_ms"]
+    assert summary["functions"]["insert_item"]["total_ms"] >= 20
+    assert summary["functions"]["get_or_create_item"]["total_ms"] < 40
+
+
+def test_commits_are_round_trips():
+    conn = FakeConnection()
+    with instrumentation.query_report("RFQ_4", write=False) as report:
+        with instrumentation.track_call("create_quote_new"):
+            run_call("get_item")
+            instrumentation.commit(conn)
+        instrumentation.commit(conn)  # e.g. the end of a unit of work
+
+    summary = report.summary()
+    assert conn.commits == 2
+    assert summary["functions"]["commit"]["calls"] == 2
+    assert summary["functions"]["commit"]["nested_calls"] == 1
+    assert summary["total_round_trips"] == 3
@@ -0,0 +1,164 @@
+import threading
+
+import pytest
+from mie_trak_api import backends, instrumentation, item, utils
+
+
+MATERIAL = {"PartNumber": "6061-T6 Aluminum", "ItemTypeFK": 2, "Purchase": 1}
+
+
+def test_memo_skips_repeated_lookups(offline_db):
+    with instrumentation.query_report("memo", write=False) as report:
+        with item.memoized_items():
+            first = item.get_or_create_item(**MATERIAL)
+            again = item.get_or_create_item(
+                **{**MATERIAL, "PartNumber": "6061-t6 aluminum "}
+            )
+            tooling = item.check_and_create_tooling("Drill jig")
+            assert item.check_and_create_tooling("Drill jig") == tooling
+
+    assert first == again
+    functions = report.summary()["functions"]
+    assert functions["get_or_create_item"]["calls"] == 1
+    assert functions["check_and_create_tooling"]["calls"] == 1
+
+
+def test_memo_ignores_none_and_ends_with_block(offline_db):
+    with item.memoized_items():
+        first = item.get_or_create_item(PartNumber="P001", ItemTypeFK=None)
+        second = item.get_or_create_item(PartNumber="P001", ItemTypeFK=None)
+    assert first != second  # `ItemTypeFK = NULL` never matches
+
+    with instrumentation.query_report("memo", write=False) as report:
+        item.get_or_create_item(**MATERIAL)
+        item.get_or_create_item(**MATERIAL)
+    assert report.summary()["functions"]["get_or_create_item"]["calls"] == 2
+
+
+def test_memo_forgets_changed_items(offline_db):
+    with instrumentation.query_report("memo", write=False) as report:
+        with item.memoized_items():
+            item_pk = item.get_or_create_item(**MATERIAL)
+            item.insert_part_details_in_item(item_pk, "P001", {}, item_type="Material")
+            item.get_or_create_item(**MATERIAL)  # Purchase is still 1: remembered
+            item.update_item(item_pk, Purchase=0)
+            item.get_or_create_item(**MATERIAL)
+
+    assert report.summary()["functions"]["get_or_create_item"]["calls"] == 2
+
+
+def test_memo_shares_items_only_once_committed(offline_db):
+    key = ("get_or_create_item", item._normalized(MATERIAL))
+
+    def seen_by_another_thread(memo):
+        seen = []
+        other = threading.Thread(target=lambda: seen.append(memo.get(key)))
+        other.start()
+        other.join()
+        return seen[0]
+
+    with item.memoized_items() as memo:
+        with pytest.raises(RuntimeError):
+            with utils.unit_of_work():
+                item.get_or_create_item(**MATERIAL)
+                assert memo.get(key) is not None
+                assert seen_by_another_thread(memo) is None
+                raise RuntimeError("abort")
+        assert memo.get(key) is None  # the insert was rolled back
+
+        with utils.unit_of_work():
+            item_pk = item.get_or_create_item(**MATERIAL)
+        assert seen_by_another_thread(memo) == item_pk
+
+
+def test_resolve_items_matches_and_inserts_in_bulk(offline_db):
+    existing = item.get_or_create_item(**MATERIAL)
+    finish = {"PartNumber": "P001 - OP Finish", "ItemTypeFK": 5, "Comment": "Anodize"}
+    other_finish = {**finish, "Comment": "Passivate"}
+
+    with instrumentation.query_report("bulk", write=False) as report:
+        resolved = item.resolve_items(
+            [
+                {**MATERIAL, "PartNumber": "6061-T6 ALUMINUM"},
+                finish,
+                finish,
+                other_finish,
+                {"PartNumber": "P002", "ItemTypeFK": None},
+            ]
+        )
+
+    assert resolved["6061-T6 ALUMINUM"] == existing
+    assert report.summary()["calls"] == 2  # resolve_items and its commit
+    assert item.get_or_create_item(**finish) == resolved["P001 - OP Finish"]
+    assert item.get_or_create_item(**other_finish) not in resolved.values()
+
+
+@utils.with_db_conn()
+def _part_number(cursor, item_pk):
+    cursor.execute("SELECT PartNumber FROM Item WHERE ItemPK = ?", (item_pk,))
+    return cursor.fetchone()[0]
+
+
+def test_tooling_numbers_follow_the_server_max(offline_db):
+    for part_number in ("05-7", "05-3", "05-12A", "05-"):
+        item.get_or_create_item(PartNumber=part_number, ItemTypeFK=3)
+
+    with instrumentation.query_report("tooling", write=False) as report:
+        first = item.check_and_create_tooling("Drill jig")
+        second = item.check_and_create_tooling("Bending fixture")
+    assert _part_number(first) == "05-8"
+    assert _part_number(second) == "05-9"
+    # a lookup, a MAX query and a guarded insert per tooling
+    assert report.summary()["functions"]["check_and_create_tooling"]["statements"] == 6
+
+
+class LockingSQLiteBackend(backends.SQLiteBackend):
+    """Records the resources locked, and refuses the ones in `refused`."""
+
+    def __init__(self):
+        super().__init__()
+        self.locked = []
+        self.refused = set()
+
+    def lock_resource_sql(self):
+        return "SELECT lock_result(?)"
+
+    def connect(self):
+        conn = super().connect()
+        conn.create_function("lock_result", 1, self._lock_result)
+        return conn
+
+    def _lock_result(self, resource):
+        self.locked.append(resource)
+        return -1 if resource in self.refused else 0
+
+
+@pytest.fixture
+def locking_backend(offline_db):
+    backend = LockingSQLiteBackend()
+    utils.use_backend(backend)
+    return backend
+
+
+def test_tooling_numbers_are_taken_under_a_server_lock(locking_backend):
+    with instrumentation.query_report("tooling", write=False) as report:
+        tooling = item.check_and_create_tooling("Drill jig")
+    assert _part_number(tooling) == "05-1"
+    assert locking_backend.locked == [item.TOOLING_LOCK]
+    assert report.summary()["functions"]["check_and_create_tooling"]["statements"] == 4
+
+    locking_backend.refused.add(item.TOOLING_LOCK)
+    with pytest.raises(RuntimeError, match="not granted"):
+        item.check_and_create_tooling("Bending fixture")
+
+
+def test_tooling_numbers_skip_numbers_taken_elsewhere(offline_db):
+    first = item.check_and_create_tooling("Drill jig")
+    assert _part_number(first) == "05-1"
+
+    # another process creates tooling numbers in the meantime
+    item.get_or_create_item(PartNumber="05-2", ItemTypeFK=3)
+    item.get_or_create_item(PartNumber="05-5", ItemTypeFK=3)
+
+    second = item.check_and_create_tooling("Bending fixture")
+    assert _part_number(second) == "05-6"
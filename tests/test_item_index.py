@@ -0,0 +1,95 @@
+import pytest
+from mie_trak_api import instrumentation, item, item_index, utils
+
+
+@pytest.fixture
+def index(offline_db, tmp_path):
+    item_index.ITEM_INDEX.open(str(tmp_path / "item_index.sqlite3"))
+    yield item_index.ITEM_INDEX
+    item_index.ITEM_INDEX.close()
+
+
+BRACKET = {"PartNumber": "BRK-100", "ItemTypeFK": 1, "Description": "Bracket"}
+
+
+def test_synced_items_are_found_with_one_item_pk_lookup(index):
+    bracket = item.get_or_create_item(**BRACKET)
+    assert item_index.ITEM_INDEX.sync() == 1
+
+    with instrumentation.query_report("item_index", write=False) as report:
+        found = item.get_or_create_item(**{**BRACKET, "PartNumber": "brk-100 "})
+        assert item.resolve_items([BRACKET]) == {"BRK-100": bracket}
+    assert found == bracket
+    functions = report.summary()["functions"]
+    assert functions["get_or_create_item"]["statements"] == 1
+    assert functions["resolve_items"]["statements"] == 1
+
+    # a column the index does not hold, or a different value, goes to the database
+    assert item_index.find_item({**BRACKET, "Comment": "x"}) is None
+    assert item_index.find_item({**BRACKET, "ItemTypeFK": 2}) is None
+
+
+def test_new_items_are_remembered_only_once_committed(index):
+    item_index.ITEM_INDEX.sync()
+
+    bracket = item.get_or_create_item(**BRACKET)
+    assert item_index.find_item(BRACKET) == bracket
+
+    with pytest.raises(RuntimeError):
+        with utils.unit_of_work():
+            item.get_or_create_item(PartNumber="ROLLED-BACK", ItemTypeFK=1)
+            raise RuntimeError("abort")
+    assert item_index.find_item({"PartNumber": "ROLLED-BACK", "ItemTypeFK": 1}) is None
+
+
+def test_sync_fetches_only_the_delta(index):
+    item.get_or_create_item(**BRACKET)
+    assert item_index.ITEM_INDEX.sync() == 1
+    assert item_index.ITEM_INDEX.sync() == 0
+
+    item_index.ITEM_INDEX.close()
+    plate = item.get_or_create_item(PartNumber="PLT-200", ItemTypeFK=1)
+    item_index.ITEM_INDEX.open(item_index.ITEM_INDEX.path)
+    assert item_index.ITEM_INDEX.sync() == 1
+    assert item_index.find_item({"PartNumber": "PLT-200", "ItemTypeFK": 1}) == plate
+
+
+def test_updated_items_are_forgotten(index):
+    bracket = item.get_or_create_item(**BRACKET)
+    item_index.ITEM_INDEX.sync()
+
+    item.update_item(bracket, Description="Angle bracket")
+    assert item_index.find_item(BRACKET) is None
+
+
+def test_items_updated_in_the_same_transaction_stay_forgotten(index):
+    item_index.ITEM_INDEX.sync()
+
+    with utils.unit_of_work():
+        bracket = item.get_or_create_item(PartNumber="BRK-100", Description="Bracket")
+        item.update_item(bracket, Description="Angle bracket")
+
+    assert item_index.find_item({"PartNumber": "BRK-100", "Description": "Bracket"}) is None
+
+
+@utils.with_db_conn(commit=True)
+def execute(cursor, query, params=()):
+    cursor.execute(query, params)
+
+
+def test_stale_items_are_dropped(index):
+    bracket = item.get_or_create_item(**BRACKET)
+    plate = item.get_or_create_item(PartNumber="PLT-200", ItemTypeFK=1)
+    item_index.ITEM_INDEX.sync()
+
+    # neither change bumps LastAccess, so sync cannot see them
+    execute("DELETE FROM Item WHERE ItemPK = ?", (bracket,))
+    execute("UPDATE Item SET ItemTypeFK = 2 WHERE ItemPK = ?", (plate,))
+    assert item_index.ITEM_INDEX.sync() == 0
+
+    new_bracket = item.get_or_create_item(**BRACKET)
+    resolved = item.resolve_items([{"PartNumber": "PLT-200", "ItemTypeFK": 1}])
+    assert new_bracket != bracket
+    assert resolved["PLT-200"] != plate
+    assert item_index.find_item(BRACKET) == new_bracket
+    assert item_index.find_item({"PartNumber": "PLT-200", "ItemTypeFK": 1}) == resolved["PLT-200"]
@@ -0,0 +1,149 @@
+import threading
+import pytest
+from mie_trak_api.pool import ConnectionPool
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, *args):
+        if not self.conn.alive:
+            raise RuntimeError("connection is dead")
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    opened = []
+
+    def connect():
+        conn = FakeConnection()
+        opened.append(conn)
+        return conn
+
+    return ConnectionPool(connect, **kwargs), opened
+
+
+def test_connection_is_reused():
+    pool, opened = make_pool()
+
+    for _ in range(3):
+        with pool.connection():
+            pass
+
+    assert len(opened) == 1
+
+
+def test_nested_checkout_shares_connection_and_commits_once():
+    pool, opened = make_pool()
+
+    with pool.connection(commit=True) as outer:
+        with pool.connection() as inner:
+            assert inner is outer
+
+    assert len(opened) == 1
+    assert opened[0].commits == 1
+    assert opened[0].rollbacks == 0
+
+
+def test_error_rolls_back():
+    pool, opened = make_pool()
+
+    with pytest.raises(ValueError):
+        with pool.connection(commit=True):
+            raise ValueError("boom")
+
+    assert opened[0].commits == 0
+    assert opened[0].rollbacks == 1
+
+
+def test_dead_connection_is_replaced_on_checkout():
+    pool, opened = make_pool(ping_after=0)
+
+    with pool.connection():
+        pass
+    opened[0].alive = False
+
+    with pool.connection() as conn:
+        assert conn is opened[1]
+
+    assert opened[0].closed
+
+
+def test_idle_connections_are_evicted():
+    pool, opened = make_pool(idle_timeout=0)
+
+    with pool.connection():
+        pass
+    with pool.connection():
+        pass
+
+    assert len(opened) == 2
+    assert opened[0].closed
+
+
+def test_threads_get_their_own_connection():
+    pool, opened = make_pool(size=2)
+    barrier = threading.Barrier(2)
+    seen = []
+
+    def work():
+        with pool.connection() as conn:
+            seen.append(conn)
+            barrier.wait(timeout=5)
+
+    threads = [threading.Thread(target=work) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(opened) == 2
+    assert seen[0] is not seen[1]
+
+
+def test_checkout_times_out_when_pool_is_exhausted():
+    pool, _ = make_pool(size=1, checkout_timeout=0.05)
+    held = threading.Event()
+    done = threading.Event()
+
+    def hold():
+        with pool.connection():
+            held.set()
+            done.wait(timeout=5)
+
+    t = threading.Thread(target=hold)
+    t.start()
+    held.wait(timeout=5)
+    try:
+        with pytest.raises(RuntimeError, match="Timed out"):
+            with pool.connection():
+                pass
+    finally:
+        done.set()
+        t.join()
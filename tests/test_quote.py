@@ -0,0 +1,85 @@
+import pytest
+from mie_trak_api import item, quote, request_for_quote, utils
+
+
+@utils.with_db_conn()
+def fetch_all(cursor, query, params=()):
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+
+def test_new_quote_gets_source_operations(offline_db):
+    item_pk = item.get_or_create_item(PartNumber="P001", Description="Test part")
+    quote_pk = quote.create_quote_new(1, item_pk, 0, "P001")
+    quote_assembly_pks = quote.copy_operations_to_quote(quote_pk)
+
+    rows = fetch_all(
+        "SELECT SequenceNumber FROM QuoteAssembly WHERE QuoteFK = ? ORDER BY OrderBy",
+        (quote_pk,),
+    )
+
+    assert [row[0] for row in rows] == [1, 6, 8, 10, 21, 22, 24, 30]
+    assert quote.get_quote_assembly_pk(QuoteFK=quote_pk, SequenceNumber=6)
+    assert sorted(quote_assembly_pks) == [1, 6, 8, 10, 21, 22, 24, 30]
+    for sequence_number in (6, 21, 22, 24, 8):
+        assert quote_assembly_pks[sequence_number] == quote.get_quote_assembly_pk(
+            QuoteFK=quote_pk, SequenceNumber=sequence_number
+        )
+
+
+def test_existing_item_is_reused(offline_db):
+    first = item.get_or_create_item(PartNumber="P001", Description="Test part")
+    second = item.get_or_create_item(PartNumber="P001", Description="Test part")
+
+    assert first == second
+
+
+def test_unit_of_work_rolls_back_on_error(offline_db):
+    with pytest.raises(ValueError):
+        with utils.unit_of_work():
+            item.get_or_create_item(PartNumber="P001", Description="Test part")
+            raise ValueError("boom")
+
+    assert fetch_all("SELECT ItemPK FROM Item") == []
+
+
+def test_reset_rfq_removes_quotes(offline_db):
+    address = {"address_pk": 1, "address1": "1 Test Street"}
+    rfq_pk = request_for_quote.insert_into_rfq(1, address)
+    item_pk = item.get_or_create_item(PartNumber="P001", Description="Test part")
+    quote_pk = quote.create_quote_new(1, item_pk, 0, "P001")
+    quote.copy_operations_to_quote(quote_pk)
+    request_for_quote.create_rfq_line_item(item_pk, rfq_pk, 1, quote_pk)
+
+    request_for_quote.reset_rfq(rfq_pk)
+
+    assert fetch_all("SELECT QuotePK FROM Quote WHERE QuotePK = ?", (quote_pk,)) == []
+    assert fetch_all("SELECT * FROM QuoteAssembly WHERE QuoteFK = ?", (quote_pk,)) == []
+
+
+def test_formula_variables_for_many_quotes(offline_db):
+    item_pk = item.get_or_create_item(PartNumber="P001", Description="Test part")
+    quote_pks = []
+    for _ in range(3):
+        quote_pk = quote.create_quote_new(1, item_pk, 0, "P001")
+        quote.copy_operations_to_quote(quote_pk)
+        quote_pks.append(quote_pk)
+
+    quote.create_quote_assembly_formula_variables(quote_pks + quote_pks[:1])
+    batched = fetch_all(
+        "SELECT QuoteAssemblyFK, OperationFormulaVariableFK, FormulaType, VariableValue "
+        "FROM QuoteAssemblyFormulaVariable ORDER BY 1, 3"
+    )
+
+    utils.with_db_conn(commit=True)(
+        lambda cursor: cursor.execute("DELETE FROM QuoteAssemblyFormulaVariable")
+    )()
+    for quote_pk in quote_pks:
+        quote.create_quote_assembly_formula_variable(quote_pk)
+    one_by_one = fetch_all(
+        "SELECT QuoteAssemblyFK, OperationFormulaVariableFK, FormulaType, VariableValue "
+        "FROM QuoteAssemblyFormulaVariable ORDER BY 1, 3"
+    )
+
+    assert len(batched) == 3 * 8 * 2  # setup and run time of 8 operations per quote
+    assert batched == one_by_one
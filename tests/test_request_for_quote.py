@@ -0,0 +1,36 @@
+from mie_trak_api import instrumentation, request_for_quote, utils
+
+
+def test_register_documents_skips_existing(offline_db):
+    documents = [
+        {"document_path": rf"y:\PDM\P{n:03}.pdf", "item_fk": n, "document_type_fk": 2}
+        for n in range(1, 1201)
+    ]
+    estimation = {"document_path": r"y:\Estimating\parts.xlsx", "rfq_fk": 7}
+
+    with instrumentation.query_report("docs", write=False) as report:
+        assert request_for_quote.register_documents(documents + [estimation]) == 1201
+    # one connection, one lookup per 500 URLs, one insert per 124 rows on SQLite, one commit
+    assert report.summary()["total_round_trips"] == 1 + 3 + 10 + 1
+
+    again = [
+        {**documents[0], "document_path": documents[0]["document_path"].upper()},
+        {**documents[1], "item_fk": 99},  # same file on another item
+        {**estimation, "item_fk": 5},  # linked to the RFQ already
+        {**estimation, "rfq_fk": 8},
+        {**estimation, "rfq_fk": 8},
+    ]
+    assert request_for_quote.register_documents(again) == 2
+
+
+@utils.with_db_conn()
+def _count_documents(cursor):
+    cursor.execute("SELECT COUNT(*), SUM(Active) FROM Document;")
+    return tuple(cursor.fetchone())
+
+
+def test_register_documents_inserts_active_rows(offline_db):
+    request_for_quote.register_documents(
+        [{"document_path": "a.step", "item_fk": 1, "document_group_pk": 30}]
+    )
+    assert _count_documents() == (1, 1)
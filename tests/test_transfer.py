@@ -0,0 +1,67 @@
+import os
+
+from app.gui import utils
+
+
+def test_transfer_skips_identical_files(tmp_path, monkeypatch):
+    source = tmp_path / "P001.step"
+    source.write_bytes(b"solid" * 1000)
+    folder = tmp_path / "PDM" / "P001"
+
+    copies = []
+    copy_file = utils._copy_file
+    monkeypatch.setattr(
+        utils, "_copy_file", lambda src, dest: copies.append(src) or copy_file(src, dest)
+    )
+
+    destination = utils.transfer_file_to_folder(str(folder), str(source))
+    assert open(destination, "rb").read() == source.read_bytes()
+    assert utils.transfer_file_to_folder(str(folder), str(source)) == destination
+    assert utils.transfer_file_to_folder(str(folder), str(source), verify_hash=True)
+    assert len(copies) == 1
+
+    source.write_bytes(b"solid" * 1001)
+    utils.transfer_file_to_folder(str(folder), str(source))
+    assert len(copies) == 2
+
+    # same size and mtime but different contents is only caught by the hash.
+    with open(destination, "r+b") as file:
+        file.write(b"S")
+    stat = source.stat()
+    os.utime(destination, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    utils.transfer_file_to_folder(str(folder), str(source))
+    assert len(copies) == 2
+    utils.transfer_file_to_folder(str(folder), str(source), verify_hash=True)
+    assert len(copies) == 3
+    assert open(destination, "rb").read() == source.read_bytes()
+
+
+def test_transfer_files_keeps_order(tmp_path):
+    sources = []
+    for n in range(6):
+        source = tmp_path / f"P00{n}.pdf"
+        source.write_text(str(n))
+        sources.append(str(source))
+
+    copies = [(source, str(tmp_path / "out" / str(n % 2))) for n, source in enumerate(sources)]
+    destinations = utils.transfer_files(copies, workers=3)
+
+    assert destinations == [
+        os.path.join(folder, os.path.basename(source)) for source, folder in copies
+    ]
+    assert all(open(path).read() == str(n) for n, path in enumerate(destinations))
+
+
+def test_same_named_files_to_one_folder_last_wins(tmp_path):
+    copies = []
+    for n in range(3):
+        source = tmp_path / f"rev{n}" / "P001.pdf"
+        source.parent.mkdir()
+        source.write_text(f"revision {n}" * (1000 + n))
+        copies.append((str(source), str(tmp_path / "out")))
+    copies.append((str(tmp_path / "rev0" / "P001.pdf"), str(tmp_path / "other")))
+
+    for _ in range(5):
+        destinations = utils.transfer_files(copies, workers=4)
+        assert open(destinations[0]).read() == "revision 2" * 1002
+        assert open(destinations[3]).read() == "revision 0" * 1000